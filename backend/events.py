@@ -0,0 +1,111 @@
+"""
+Feed of data changes for Server-Sent Events clients.
+
+Mutation endpoints publish a compact event (a kind such as "batch.created"
+plus a small JSON payload) once their write has succeeded, and
+GET /api/events streams the events to every connected client, which patches
+its state instead of reloading whole lists.
+
+Events carry ids. A reconnecting EventSource sends the last id it saw
+(Last-Event-ID) and the events it missed are replayed from a short history.
+When they are no longer there, or a client falls too far behind to catch up
+event by event, it gets a "resync" event and should reload everything.
+
+The feed lives in the server process: only changes made through this
+process are published.
+"""
+from collections import deque
+from typing import AsyncIterator, Optional
+import asyncio
+import uuid
+
+import serialization
+
+HISTORY_SIZE = 256
+SUBSCRIBER_QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+# Reconnect delay suggested to EventSource clients
+RETRY_MILLISECONDS = 3000
+
+RESYNC = "resync"
+
+
+def _frame(event_id: str, kind: str, data) -> bytes:
+    return f"id: {event_id}\nevent: {kind}\ndata: ".encode() + serialization.dumps(data) + b"\n\n"
+
+
+class ChangeFeed:
+    def __init__(self, history_size: int = HISTORY_SIZE, queue_size: int = SUBSCRIBER_QUEUE_SIZE,
+                 heartbeat_seconds: float = HEARTBEAT_SECONDS):
+        # Ids are "<epoch>-<sequence>"; a new epoch per process means ids from
+        # before a restart are recognised as unknown rather than replayed against
+        self._epoch = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._history = deque(maxlen=history_size)  # (sequence, frame)
+        self._subscribers = set()
+        self._queue_size = queue_size
+        self._heartbeat_seconds = heartbeat_seconds
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, kind: str, data: dict):
+        """
+        Send an event to every connected client
+        """
+        self._sequence += 1
+        frame = _frame(f"{self._epoch}-{self._sequence}", kind, data)
+        self._history.append((self._sequence, frame))
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Too far behind to catch up event by event
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._resync_frame())
+
+    def _resync_frame(self) -> bytes:
+        return _frame(f"{self._epoch}-{self._sequence}", RESYNC, {})
+
+    def _missed(self, last_event_id: str) -> list:
+        """
+        Frames published after last_event_id, or a resync when they are gone
+        """
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self._epoch or not sequence.isdigit() or int(sequence) > self._sequence:
+            return [self._resync_frame()]
+        sequence = int(sequence)
+        if sequence == self._sequence:
+            return []
+        if not self._history or self._history[0][0] > sequence + 1:
+            return [self._resync_frame()]
+        return [frame for number, frame in self._history if number > sequence]
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        The text/event-stream body for one client, until it disconnects
+        """
+        queue = asyncio.Queue(self._queue_size)
+        # Subscribe and collect the backlog without yielding in between, so no
+        # event is both replayed and queued
+        self._subscribers.add(queue)
+        backlog = self._missed(last_event_id) if last_event_id else []
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+            for frame in backlog:
+                yield frame
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), self._heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    # Comment line keeping proxies and idle connections open
+                    frame = b": keep-alive\n\n"
+                yield frame
+        finally:
+            self._subscribers.discard(queue)
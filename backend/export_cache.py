@@ -0,0 +1,152 @@
+"""
+Content-addressed batch report exports.
+
+Export filenames carry a digest of the calculation, so saving a batch that did
+not change maps to the files it already has. Nothing is written on save:
+artifacts are generated on their first download. index.jsonl in the exports
+directory records each batch's current digest and filenames, so lookups never
+scan the directory. It is an append-only log (one line per change, compacted
+once mostly outdated), so registering a batch costs the same however many
+batches exist.
+"""
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.jsonl"
+
+# Compact the index log once it holds this many lines beyond the live entries
+COMPACT_SLACK = 1000
+
+# Fields that change on every save, or mark storage details, without changing the report contents
+VOLATILE_FIELDS = ("_id", "id", "created_at", "updated_at", "schema_version")
+
+
+def calculation_digest(calculation: dict) -> str:
+    """
+    Stable hash of a calculation's report-relevant contents
+    """
+    content = {key: value for key, value in calculation.items() if key not in VOLATILE_FIELDS}
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ExportCache:
+    """
+    Index of the current export filenames per batch, persisted as index.jsonl
+    """
+    def __init__(self, exports_dir: Path):
+        self.exports_dir = exports_dir
+        self.index_path = exports_dir / INDEX_FILENAME
+        self._batches: Dict[str, dict] = {}
+        self._filenames: Dict[str, Tuple[str, str]] = {}
+        self._log_lines = 0
+        self._load()
+
+    def _load(self):
+        torn = False
+        try:
+            with open(self.index_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        torn = True  # Last line of an interrupted append
+                        continue
+                    self._log_lines += 1
+                    if record["entry"] is None:
+                        self._batches.pop(record["batch_id"], None)
+                    else:
+                        self._batches[record["batch_id"]] = record["entry"]
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Ignoring unreadable export index {self.index_path}: {e}")
+        for batch_id, entry in self._batches.items():
+            self._filenames[entry["json"]] = (batch_id, "json")
+            self._filenames[entry["pdf"]] = (batch_id, "pdf")
+        if torn:
+            # Rewrite without the fragment so later appends start on a fresh line
+            self._compact()
+
+    def _append(self, batch_id: str, entry: Optional[dict]):
+        """
+        Log a batch's new entry (None once deleted), compacting the log when it
+        is mostly outdated lines
+        """
+        with open(self.index_path, "a") as f:
+            f.write(json.dumps({"batch_id": batch_id, "entry": entry}) + "\n")
+        self._log_lines += 1
+        if self._log_lines > len(self._batches) + COMPACT_SLACK:
+            self._compact()
+
+    def _compact(self):
+        partial_path = self.index_path.with_suffix(".tmp")
+        with open(partial_path, "w") as f:
+            for batch_id, entry in self._batches.items():
+                f.write(json.dumps({"batch_id": batch_id, "entry": entry}) + "\n")
+        os.replace(partial_path, self.index_path)
+        self._log_lines = len(self._batches)
+
+    def _discard_artifacts(self, entry: dict):
+        for kind in ("json", "pdf"):
+            self._filenames.pop(entry[kind], None)
+            try:
+                (self.exports_dir / entry[kind]).unlink()
+            except FileNotFoundError:
+                pass
+
+    def register(self, calculation: dict) -> dict:
+        """
+        Return the export entry for a saved calculation. Unchanged contents reuse
+        the existing entry without touching the disk; changed contents replace it
+        and drop the outdated artifacts.
+        """
+        input_data = calculation["input_data"]
+        batch_id = input_data["batch_id"]
+        digest = calculation_digest(calculation)
+        entry = self._batches.get(batch_id)
+        if entry and entry["digest"] == digest:
+            return entry
+
+        if entry:
+            self._discard_artifacts(entry)
+        stem = f"{batch_id}_{input_data['shed_number']}_{digest[:16]}"
+        entry = {
+            "digest": digest,
+            "calculation_id": calculation["id"],
+            "json": f"batch_{stem}.json",
+            "pdf": f"batch_report_{stem}.pdf",
+        }
+        self._batches[batch_id] = entry
+        self._filenames[entry["json"]] = (batch_id, "json")
+        self._filenames[entry["pdf"]] = (batch_id, "pdf")
+        self._append(batch_id, entry)
+        return entry
+
+    def entry_for(self, batch_id: str) -> Optional[dict]:
+        return self._batches.get(batch_id)
+
+    def lookup(self, filename: str) -> Optional[Tuple[dict, str]]:
+        """
+        Return (entry, "json" or "pdf") when filename is a batch's current export
+        """
+        found = self._filenames.get(filename)
+        if not found:
+            return None
+        batch_id, kind = found
+        return self._batches[batch_id], kind
+
+    def forget(self, batch_id: str):
+        """
+        Drop a deleted batch's entry and its artifacts
+        """
+        entry = self._batches.pop(batch_id, None)
+        if entry:
+            self._discard_artifacts(entry)
+            self._append(batch_id, None)
@@ -0,0 +1,197 @@
+"""
+Incrementally maintained per-handler performance rollup.
+
+The handler_stats collection keeps running sums and counts per handler so the
+handler performance endpoints read O(handlers) documents instead of scanning
+broiler_calculations. Every write to broiler_calculations applies its delta here;
+rebuild() regenerates the rollup from the raw batches and verify() checks it.
+
+Usage:
+    python handler_stats.py rebuild
+    python handler_stats.py verify
+"""
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import asyncio
+import logging
+import math
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Rollup field -> calculation field it accumulates
+SUM_FIELDS = {
+    "sum_fcr": "feed_conversion_ratio",
+    "sum_mortality": "mortality_rate_percent",
+    "sum_daily_gain": "daily_weight_gain",
+    "sum_cost_per_kg": "net_cost_per_kg",
+}
+
+_transactions_supported: Optional[bool] = None
+
+
+async def ensure_indexes(db):
+    """
+    Create the unique handler_name index the rollup upserts rely on
+    """
+    await db.handler_stats.create_index("handler_name", unique=True)
+
+
+@asynccontextmanager
+async def transaction(client):
+    """
+    Yield a session inside a transaction when the deployment supports them
+    (replica set or sharded cluster), otherwise yield None and let writes apply one by one
+    """
+    global _transactions_supported
+    if _transactions_supported is None:
+        hello = await client.admin.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+
+    if not _transactions_supported:
+        yield None
+        return
+
+    async with await client.start_session() as session:
+        async with session.start_transaction():
+            yield session
+
+
+def _delta(calculation: dict, sign: int) -> dict:
+    delta = {"total_batches": sign, "total_chicks": sign * calculation["input_data"]["initial_chicks"]}
+    for rollup_field, calculation_field in SUM_FIELDS.items():
+        delta[rollup_field] = sign * calculation[calculation_field]
+    return delta
+
+
+async def _apply(db, calculation: dict, sign: int, session=None):
+    handler_name = calculation["input_data"]["handler_name"]
+    await db.handler_stats.update_one(
+        {"handler_name": handler_name},
+        {"$inc": _delta(calculation, sign)},
+        upsert=True,
+        session=session
+    )
+    if sign < 0:
+        # Drop emptied rows so floating point residue never lingers
+        await db.handler_stats.delete_one(
+            {"handler_name": handler_name, "total_batches": {"$lte": 0}},
+            session=session
+        )
+
+
+async def record_calculation(db, calculation: dict, session=None):
+    """
+    Add a newly saved calculation to its handler's rollup
+    """
+    await _apply(db, calculation, 1, session=session)
+
+
+async def record_replacement(db, previous: dict, calculation: dict, session=None):
+    """
+    Move a replaced calculation's contribution, including handler reassignment
+    """
+    await _apply(db, previous, -1, session=session)
+    await _apply(db, calculation, 1, session=session)
+
+
+async def record_removal(db, calculation: dict, session=None):
+    """
+    Remove a deleted calculation from its handler's rollup
+    """
+    await _apply(db, calculation, -1, session=session)
+
+
+async def read_totals(db, handler_name: Optional[str] = None) -> List[dict]:
+    """
+    Read per-handler averages and totals from the rollup.
+    Without a handler name only handlers registered in the handlers collection are returned.
+    """
+    pipeline = [{"$match": {"handler_name": handler_name, "total_batches": {"$gt": 0}}}] if handler_name else [
+        {"$match": {"total_batches": {"$gt": 0}}},
+        {"$lookup": {"from": "handlers", "localField": "handler_name", "foreignField": "name", "as": "handler"}},
+        {"$match": {"handler": {"$ne": []}}},
+    ]
+    pipeline.append({"$project": {
+        "_id": "$handler_name",
+        "total_batches": 1,
+        "total_chicks": 1,
+        "avg_fcr": {"$divide": ["$sum_fcr", "$total_batches"]},
+        "avg_mortality": {"$divide": ["$sum_mortality", "$total_batches"]},
+        "avg_daily_gain": {"$divide": ["$sum_daily_gain", "$total_batches"]},
+        "avg_cost_per_kg": {"$divide": ["$sum_cost_per_kg", "$total_batches"]},
+    }})
+    return await db.handler_stats.aggregate(pipeline).to_list(None)
+
+
+def _rollup_pipeline() -> List[dict]:
+    group = {
+        "_id": "$input_data.handler_name",
+        "total_batches": {"$sum": 1},
+        "total_chicks": {"$sum": "$input_data.initial_chicks"},
+    }
+    for rollup_field, calculation_field in SUM_FIELDS.items():
+        group[rollup_field] = {"$sum": f"${calculation_field}"}
+    return [
+        {"$match": {"input_data.handler_name": {"$type": "string"}}},
+        {"$group": group},
+        {"$project": {"_id": 0, "handler_name": "$_id", "total_batches": 1, "total_chicks": 1,
+                      **{field: 1 for field in SUM_FIELDS}}},
+    ]
+
+
+async def rebuild(db) -> int:
+    """
+    Regenerate handler_stats from the raw batches; returns the number of handlers
+    """
+    # $out replaces the collection atomically and keeps its indexes
+    await db.broiler_calculations.aggregate(_rollup_pipeline() + [{"$out": "handler_stats"}]).to_list(None)
+    return await db.handler_stats.count_documents({})
+
+
+async def verify(db, tolerance: float = 1e-6) -> List[str]:
+    """
+    Compare the rollup with a fresh aggregation of the raw batches; returns the differences
+    """
+    expected = {doc["handler_name"]: doc for doc in await db.broiler_calculations.aggregate(_rollup_pipeline()).to_list(None)}
+    stored = {doc["handler_name"]: doc async for doc in db.handler_stats.find({"total_batches": {"$gt": 0}})}
+
+    problems = []
+    for handler_name in sorted(set(expected) | set(stored)):
+        want, have = expected.get(handler_name), stored.get(handler_name)
+        if want is None or have is None:
+            problems.append(f"{handler_name}: {'unexpected' if want is None else 'missing'} rollup row")
+            continue
+        for field in ["total_batches", "total_chicks", *SUM_FIELDS]:
+            if not math.isclose(want[field], have[field], rel_tol=tolerance, abs_tol=tolerance):
+                problems.append(f"{handler_name}: {field} is {have[field]}, expected {want[field]}")
+    return problems
+
+
+async def _main(command: str) -> int:
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if command == "rebuild":
+            await ensure_indexes(db)
+            print(f"Rebuilt rollup for {await rebuild(db)} handlers")
+        problems = await verify(db)
+        for problem in problems:
+            print(problem)
+        print("Rollup matches raw batches" if not problems else f"{len(problems)} differences found")
+        return 1 if problems else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("rebuild", "verify"):
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[1])))
@@ -0,0 +1,178 @@
+"""
+MongoDB indexes behind the API's queries.
+
+ensure_indexes creates them at startup (creating an index that already exists
+is a no-op). explain_hot_queries asks the query planner how each frequent
+query runs, so a missing or unusable index shows up as a COLLSCAN.
+
+Usage:
+    python indexes.py ensure
+    python indexes.py explain
+"""
+from typing import Dict, List
+import asyncio
+import logging
+import os
+import sys
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# (created_at, id) ends every compound index used for the newest-first keyset
+# pages of /api/calculations; their prefixes also serve plain equality lookups
+# and counts on shed_number / handler_name, and sorting on created_at. The
+# entry_date / exit_date indexes serve the date range filters of the same
+# pages: the range narrows the index scan, and the (created_at, id) suffix lets
+# the page be sorted from the index keys without fetching every match first.
+REQUIRED_INDEXES = {
+    "broiler_calculations": [
+        ([("input_data.batch_id", 1)], {"unique": True}),
+        ([("id", 1)], {"unique": True}),
+        ([("created_at", -1), ("id", -1)], {}),
+        ([("input_data.shed_number", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("input_data.handler_name", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("input_data.entry_date", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("input_data.exit_date", 1), ("created_at", -1), ("id", -1)], {}),
+    ],
+    "handlers": [
+        ([("id", 1)], {"unique": True}),
+        ([("name", 1)], {"unique": True}),
+    ],
+    "sheds": [
+        ([("id", 1)], {"unique": True}),
+        ([("number", 1)], {"unique": True}),
+    ],
+}
+
+# name -> explain command body for the queries the API runs most
+HOT_QUERIES = {
+    "batch by batch_id": {"find": "broiler_calculations", "filter": {"input_data.batch_id": ""}, "limit": 1},
+    "calculation by id": {"find": "broiler_calculations", "filter": {"id": ""}, "limit": 1},
+    "recent calculations page": {
+        "find": "broiler_calculations", "filter": {},
+        "sort": {"created_at": -1, "id": -1}, "limit": 51,
+    },
+    "calculations page by shed": {
+        "find": "broiler_calculations", "filter": {"input_data.shed_number": ""},
+        "sort": {"created_at": -1, "id": -1}, "limit": 51,
+    },
+    "calculations page by handler": {
+        "find": "broiler_calculations", "filter": {"input_data.handler_name": ""},
+        "sort": {"created_at": -1, "id": -1}, "limit": 51,
+    },
+    "calculations page by entry date": {
+        "find": "broiler_calculations", "filter": {"input_data.entry_date": {"$gte": "", "$lt": ""}},
+        "sort": {"created_at": -1, "id": -1}, "limit": 51,
+    },
+    "calculations page by exit date": {
+        "find": "broiler_calculations", "filter": {"input_data.exit_date": {"$gte": "", "$lt": ""}},
+        "sort": {"created_at": -1, "id": -1}, "limit": 51,
+    },
+    "batch count by handler": {"count": "broiler_calculations", "query": {"input_data.handler_name": ""}},
+    "batch count by shed": {"count": "broiler_calculations", "query": {"input_data.shed_number": ""}},
+    "distinct shed numbers": {"distinct": "broiler_calculations", "key": "input_data.shed_number"},
+    "handler by id": {"find": "handlers", "filter": {"id": ""}, "limit": 1},
+    "handler by name": {"find": "handlers", "filter": {"name": ""}, "limit": 1},
+    "handlers by name": {"find": "handlers", "filter": {}, "sort": {"name": 1}},
+    "shed by id": {"find": "sheds", "filter": {"id": ""}, "limit": 1},
+    "shed by number": {"find": "sheds", "filter": {"number": ""}, "limit": 1},
+    "sheds by number": {"find": "sheds", "filter": {}, "sort": {"number": 1}},
+}
+
+
+async def ensure_indexes(db):
+    """
+    Create every index in REQUIRED_INDEXES. A unique index that cannot be built
+    (e.g. over existing duplicates) raises: the write paths rely on it alone to
+    reject duplicate batch IDs, handler names and shed numbers, so the API must
+    not start without it. Any other index that fails is logged and skipped so
+    startup continues; explain_hot_queries will then report the affected queries.
+    """
+    for collection, specs in REQUIRED_INDEXES.items():
+        for keys, options in specs:
+            try:
+                await db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                if options.get("unique"):
+                    raise RuntimeError(
+                        f"Could not create unique index {keys} on {collection}, which duplicate "
+                        f"checks rely on; remove the duplicates and restart: {e}"
+                    ) from e
+                logger.error(f"Could not create index {keys} on {collection}: {e}")
+
+
+def _plan_stages(plan: dict) -> List[dict]:
+    """
+    Flatten an explain plan tree into its stages, outermost first
+    """
+    if "queryPlan" in plan:
+        # Slot-based execution engine wraps the classic plan tree
+        plan = plan["queryPlan"]
+    stages = [plan]
+    children = list(plan.get("inputStages", []))
+    if "inputStage" in plan:
+        children.insert(0, plan["inputStage"])
+    for child in children:
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def summarize_plan(explain: dict) -> dict:
+    """
+    Stage names and index names of an explain result's winning plan
+    """
+    stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+    names = [stage.get("stage") for stage in stages]
+    return {
+        "index_backed": "COLLSCAN" not in names,
+        "stages": names,
+        "indexes": [stage["indexName"] for stage in stages if "indexName" in stage],
+    }
+
+
+async def explain_hot_queries(db) -> List[Dict]:
+    """
+    Explain each of HOT_QUERIES and report whether an index backs it
+    """
+    report = []
+    for name, command in HOT_QUERIES.items():
+        collection = command.get("find") or command.get("count") or command.get("distinct")
+        try:
+            explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+            report.append({"query": name, "collection": collection, **summarize_plan(explain)})
+        except OperationFailure as e:
+            report.append({"query": name, "collection": collection, "index_backed": False, "error": str(e)})
+    return report
+
+
+async def _main(command: str) -> int:
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if command == "ensure":
+            try:
+                await ensure_indexes(db)
+            except RuntimeError as e:
+                print(e)
+                return 1
+        report = await explain_hot_queries(db)
+        for entry in report:
+            status = "ok  " if entry["index_backed"] else "SCAN"
+            detail = entry.get("error") or f"{' <- '.join(entry['stages'])} {entry['indexes']}"
+            print(f"{status} {entry['query']:32} {detail}")
+        return 0 if all(entry["index_backed"] for entry in report) else 1
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("ensure", "explain"):
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[1])))
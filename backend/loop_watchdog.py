@@ -0,0 +1,153 @@
+"""
+Event loop blocking detector.
+
+A heartbeat task on the event loop records how late each of its wakeups is
+(broiler_event_loop_lag_seconds). A watcher thread checks the heartbeat;
+once the loop has not come back for longer than the threshold, something is
+blocking it, and the watcher logs the loop thread's stack at that moment
+together with the route of the request being run, and counts the block in
+broiler_event_loop_blocks_total by route.
+
+The watchdog is opt-in: it runs only when LOOP_BLOCK_THRESHOLD_MS is set in
+the environment to a threshold above 0 (100 is a good start). Unset or 0, no
+thread is started and nothing is logged.
+"""
+from typing import Dict, Optional
+import asyncio
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+THRESHOLD_SETTING = "LOOP_BLOCK_THRESHOLD_MS"
+# Innermost frames of the blocking stack that are logged
+STACK_LIMIT = 25
+
+# Blocks outside a request (startup, background jobs) are counted under this route
+NO_ROUTE = "none"
+
+LAG_SECONDS = metrics.registry.histogram(
+    "broiler_event_loop_lag_seconds",
+    "How late the event loop ran a callback scheduled for a given time",
+    (),
+)
+
+
+def threshold_from_environment() -> float:
+    """
+    The configured threshold in seconds, 0 when the watchdog is off (the
+    default, when the setting is unset or empty). A value that is not a number
+    of milliseconds is logged and leaves the watchdog off rather than stopping
+    the server from starting.
+    """
+    setting = os.environ.get(THRESHOLD_SETTING, "").strip()
+    if not setting:
+        return 0
+    try:
+        threshold_ms = float(setting)
+    except ValueError:
+        threshold_ms = math.nan
+    if not math.isfinite(threshold_ms):
+        logger.warning(f"Ignoring {THRESHOLD_SETTING}={setting!r}, expected milliseconds; event loop watchdog is off")
+        return 0
+    return max(0.0, threshold_ms) / 1000
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        # Heartbeat often enough that a block is noticed soon after the threshold
+        self.interval = threshold / 4
+        self.blocks: Dict[str, int] = {}
+        # Request scopes by the task running them, so a block can be put down to a route
+        self._requests: Dict[asyncio.Task, dict] = {}
+        self._beat = time.monotonic()
+        self._reported_beat = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        metrics.registry.counter(
+            "broiler_event_loop_blocks_total",
+            "Times a callback held the event loop longer than the watchdog threshold",
+            lambda: {(route,): count for route, count in self.blocks.items()},
+            ("route",),
+        )
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._heartbeat = asyncio.create_task(self._beat_forever())
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watcher.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+
+    def request_started(self, task: asyncio.Task, scope: dict):
+        self._requests[task] = scope
+
+    def request_finished(self, task: asyncio.Task):
+        self._requests.pop(task, None)
+
+    async def _beat_forever(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self._beat = now = time.monotonic()
+            LAG_SECONDS.observe((), max(0.0, now - expected))
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            if time.monotonic() - beat > self.threshold and beat != self._reported_beat:
+                # Report each block once, while it is still going on
+                self._reported_beat = beat
+                self._report()
+
+    def _report(self):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, STACK_LIMIT)) if frame else ""
+        # Reading another thread's current task is a dictionary lookup
+        scope = self._requests.get(asyncio.current_task(self._loop))
+        if scope is None:
+            route, request = NO_ROUTE, "outside a request"
+        else:
+            route = getattr(scope.get("route"), "path", metrics.UNMATCHED_ROUTE)
+            request = f"in {scope['method']} {scope['path']} (route {route})"
+        self.blocks[route] = self.blocks.get(route, 0) + 1
+        logger.warning(f"Event loop blocked for over {self.threshold * 1000:.0f} ms {request}:\n{stack}")
+
+
+class WatchdogMiddleware:
+    """
+    ASGI middleware telling the watchdog which request each task is running
+    """
+    def __init__(self, app, watchdog: LoopWatchdog):
+        self.app = app
+        self.watchdog = watchdog
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        self.watchdog.request_started(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.watchdog.request_finished(task)
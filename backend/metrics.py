@@ -0,0 +1,213 @@
+"""
+Request latency and subsystem timings in Prometheus text format.
+
+Recording is a few integer increments under a lock: per-route latency
+histograms (MetricsMiddleware) and per-phase timers (timed / timed_function)
+around database calls, calculations, validation, JSON exports and PDF renders.
+Everything else, cache and queue figures included, is read from its owner only
+when GET /metrics is scraped, so nothing is spent on it in between.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Tuple
+import functools
+import inspect
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; the finer low end resolves sub-millisecond phases such as cached reads
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Requests that matched no route share one label instead of one per path
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...], buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (the last one past the largest bound), sum]
+        self._series: Dict[tuple, list] = {}
+        # Database timings are also recorded from driver threads
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        names = self.labelnames + ("le",)
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class CollectedMetric:
+    """
+    A gauge or counter whose value is read when metrics are scraped. collect()
+    returns a number, or a dict of label values tuple -> number.
+    """
+    def __init__(self, name: str, kind: str, help: str, collect: Callable, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.collect = collect
+        self.labelnames = labelnames
+
+    def samples(self) -> Iterable[str]:
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...], buckets=BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, collect: Callable, labelnames: Tuple[str, ...] = ()):
+        self._register(CollectedMetric(name, "gauge", help, collect, labelnames))
+
+    def counter(self, name: str, help: str, collect: Callable, labelnames: Tuple[str, ...] = ()):
+        self._register(CollectedMetric(name, "counter", help, collect, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            kind = metric.kind if isinstance(metric, CollectedMetric) else "histogram"
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "broiler_http_request_duration_seconds",
+    "Time from receiving a request to sending the end of its response",
+    ("method", "route", "status"),
+)
+PHASE_SECONDS = registry.histogram(
+    "broiler_phase_duration_seconds",
+    "Time spent in each subsystem: db, calculation, validation, json_export, pdf_render",
+    ("phase", "operation"),
+)
+
+
+class timed:
+    """
+    Context manager recording the time spent in its block under phase and operation
+    """
+    __slots__ = ("labels", "start")
+
+    def __init__(self, phase: str, operation: str = ""):
+        self.labels = (phase, operation)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        PHASE_SECONDS.observe(self.labels, time.perf_counter() - self.start)
+
+
+def timed_function(phase: str, operation: str = None):
+    """
+    Decorator timing every call of a function or coroutine function; the
+    operation label defaults to the function's name
+    """
+    def decorator(function):
+        labels = (phase, operation or function.__name__)
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def run(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    PHASE_SECONDS.observe(labels, time.perf_counter() - start)
+        else:
+            @functools.wraps(function)
+            def run(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    PHASE_SECONDS.observe(labels, time.perf_counter() - start)
+        return run
+    return decorator
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording each HTTP request's latency by route template
+    (e.g. /api/batches/{batch_id}), method and status. Event streams are left
+    out: their duration is how long the client stayed connected.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        response = {"status": 500, "streaming": False}
+
+        async def send_and_watch(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"content-type" and value.startswith(b"text/event-stream"):
+                        response["streaming"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_watch)
+        finally:
+            if not response["streaming"]:
+                # The router leaves the matched route in the scope
+                route = scope.get("route")
+                REQUEST_SECONDS.observe(
+                    (scope["method"], getattr(route, "path", UNMATCHED_ROUTE), str(response["status"])),
+                    time.perf_counter() - start,
+                )
@@ -0,0 +1,252 @@
+"""
+PDF batch closure reports.
+
+Rendering runs in report job worker processes (see report_jobs.py), so this
+module only depends on reportlab and takes plain calculation dicts, never the
+server's models or database.
+"""
+from datetime import datetime
+from types import SimpleNamespace
+import os
+import uuid
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+
+
+def _as_attributes(value):
+    """Give a calculation dict the attribute access the report layout uses"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _as_attributes(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_as_attributes(item) for item in value]
+    return value
+
+
+def render_pdf_report(calculation: dict, filepath: str) -> str:
+    """
+    Worker entry point: render the report for a calculation dict to filepath.
+    The file only appears under its final name once it is complete.
+    """
+    partial_path = f"{filepath}.{uuid.uuid4().hex}.part"
+    generate_pdf_report(_as_attributes(calculation), partial_path)
+    os.replace(partial_path, filepath)
+    return filepath
+
+
+def generate_pdf_report(calculation, filepath: str):
+    """
+    Generate a professional PDF report for batch closure
+    """
+    # Create PDF document
+    doc = SimpleDocTemplate(str(filepath), pagesize=A4)
+    story = []
+    styles = getSampleStyleSheet()
+    
+    # Custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        textColor=colors.darkblue
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        textColor=colors.darkgreen
+    )
+    
+    # Title and Header
+    story.append(Paragraph("BROILER BATCH CLOSURE REPORT", title_style))
+    story.append(Spacer(1, 10))
+    story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Batch Information
+    story.append(Paragraph("BATCH IDENTIFICATION", heading_style))
+    batch_data = [
+        ['Batch ID:', calculation.input_data.batch_id],
+        ['Shed Number:', calculation.input_data.shed_number],
+        ['Handler:', calculation.input_data.handler_name],
+        ['Entry Date:', calculation.input_data.entry_date.strftime('%Y-%m-%d')],
+        ['Exit Date:', calculation.input_data.exit_date.strftime('%Y-%m-%d')],
+        ['Batch Duration:', f"{(calculation.input_data.exit_date - calculation.input_data.entry_date).days} days"],
+        ['Report Generated:', datetime.now().strftime('%Y-%m-%d %H:%M')],
+    ]
+    
+    batch_table = Table(batch_data, colWidths=[2*inch, 3*inch])
+    batch_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+    ]))
+    story.append(batch_table)
+    story.append(Spacer(1, 20))
+    
+    # Performance Summary
+    story.append(Paragraph("PERFORMANCE SUMMARY", heading_style))
+    performance_data = [
+        ['Metric', 'Value', 'Status'],
+        ['Feed Conversion Ratio', f"{calculation.feed_conversion_ratio}", 
+         'Excellent' if calculation.feed_conversion_ratio <= 1.8 else 'Good' if calculation.feed_conversion_ratio <= 2.2 else 'Average'],
+        ['Mortality Rate', f"{calculation.mortality_rate_percent}%",
+         'Excellent' if calculation.mortality_rate_percent <= 3 else 'Good' if calculation.mortality_rate_percent <= 7 else 'Needs Attention'],
+        ['Weighted Average Age', f"{calculation.weighted_average_age} days", 'Optimal'],
+        ['Daily Weight Gain', f"{calculation.daily_weight_gain} kg", 
+         'Excellent' if calculation.daily_weight_gain >= 0.065 else 'Good' if calculation.daily_weight_gain >= 0.055 else 'Average'],
+        ['Net Cost per kg', f"${calculation.net_cost_per_kg:.2f}", 'Calculated']
+    ]
+    
+    perf_table = Table(performance_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch])
+    perf_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
+    ]))
+    story.append(perf_table)
+    story.append(Spacer(1, 20))
+    
+    # Production Data
+    story.append(Paragraph("PRODUCTION DATA", heading_style))
+    production_data = [
+        ['Parameter', 'Count/Amount'],
+        ['Initial Chicks', f"{calculation.input_data.initial_chicks:,}"],
+        ['Chicks Died', f"{calculation.input_data.chicks_died:,}"],
+        ['Surviving Chicks', f"{calculation.surviving_chicks:,}"],
+        ['Viability (Caught)', f"{calculation.viability:,}"],
+        ['Missing Chicks', f"{calculation.missing_chicks:,}"],
+        ['Total Weight Produced', f"{calculation.total_weight_produced_kg:,} kg"],
+        ['Total Feed Consumed', f"{calculation.total_feed_consumed_kg:,} kg"],
+        ['Average Weight per Chick', f"{calculation.average_weight_per_chick:.2f} kg"],
+        ['Viability Rate', f"{(calculation.viability / calculation.input_data.initial_chicks * 100):.1f}%"],
+    ]
+    
+    prod_table = Table(production_data, colWidths=[3*inch, 2*inch])
+    prod_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
+    ]))
+    story.append(prod_table)
+    story.append(Spacer(1, 20))
+    
+    # Financial Summary - Enhanced with all cost details
+    story.append(Paragraph("COMPLETE FINANCIAL BREAKDOWN", heading_style))
+    
+    # Detailed cost breakdown
+    financial_data = [
+        ['Cost Category', 'Consumption/Qty', 'Unit Cost', 'Total Amount', 'Percentage'],
+        ['Initial Chicks', f"{calculation.input_data.initial_chicks:,}", f"${calculation.input_data.chick_cost_per_unit:.2f}/chick", f"${calculation.cost_breakdown.chick_cost:.2f}", f"{calculation.cost_breakdown.chick_cost_percent}%"],
+        ['Pre-starter Feed', f"{calculation.input_data.pre_starter_feed.consumption_kg:.1f} kg", f"${calculation.input_data.pre_starter_feed.cost_per_kg:.2f}/kg", f"${calculation.cost_breakdown.pre_starter_cost:.2f}", f"{calculation.cost_breakdown.pre_starter_cost_percent}%"],
+        ['Starter Feed', f"{calculation.input_data.starter_feed.consumption_kg:.1f} kg", f"${calculation.input_data.starter_feed.cost_per_kg:.2f}/kg", f"${calculation.cost_breakdown.starter_cost:.2f}", f"{calculation.cost_breakdown.starter_cost_percent}%"],
+        ['Growth Feed', f"{calculation.input_data.growth_feed.consumption_kg:.1f} kg", f"${calculation.input_data.growth_feed.cost_per_kg:.2f}/kg", f"${calculation.cost_breakdown.growth_cost:.2f}", f"{calculation.cost_breakdown.growth_cost_percent}%"],
+        ['Final Feed', f"{calculation.input_data.final_feed.consumption_kg:.1f} kg", f"${calculation.input_data.final_feed.cost_per_kg:.2f}/kg", f"${calculation.cost_breakdown.final_cost:.2f}", f"{calculation.cost_breakdown.final_cost_percent}%"],
+        ['Medicine & Vaccines', 'Lump Sum', 'N/A', f"${calculation.cost_breakdown.medicine_cost:.2f}", f"{calculation.cost_breakdown.medicine_cost_percent}%"],
+        ['Miscellaneous Costs', 'Lump Sum', 'N/A', f"${calculation.cost_breakdown.miscellaneous_cost:.2f}", f"{calculation.cost_breakdown.miscellaneous_cost_percent}%"],
+        ['Sawdust Bedding', 'Lump Sum', 'N/A', f"${calculation.cost_breakdown.sawdust_bedding_cost:.2f}", f"{calculation.cost_breakdown.sawdust_bedding_cost_percent}%"],
+        ['Cost Variations', 'Lump Sum', 'N/A', f"${calculation.cost_breakdown.cost_variations:.2f}", f"{calculation.cost_breakdown.cost_variations_percent}%"],
+        ['', '', '', '', ''],
+        ['TOTAL GROSS COST', '', '', f"${calculation.total_cost:.2f}", '100.0%'],
+    ]
+    
+    # Add revenue if exists
+    if calculation.total_revenue > 0:
+        financial_data.extend([
+            ['Chicken Bedding Sale', f"{calculation.total_weight_produced_kg:.1f} kg equiv.", 'Revenue', f"-${calculation.total_revenue:.2f}", 'Revenue'],
+            ['NET TOTAL COST', '', '', f"${calculation.total_cost - calculation.total_revenue:.2f}", 'Final'],
+        ])
+    
+    fin_table = Table(financial_data, colWidths=[2.2*inch, 1.3*inch, 1.0*inch, 1.0*inch, 0.8*inch])
+    fin_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, -3), (-1, -1), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -4), 1, colors.black),
+        ('GRID', (0, -3), (-1, -1), 2, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.orange),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('BACKGROUND', (0, 1), (-1, -4), colors.lightyellow),
+        ('BACKGROUND', (0, -3), (-1, -1), colors.lightcoral),
+    ]))
+    story.append(fin_table)
+    story.append(Spacer(1, 20))
+    
+    # Handler Performance Section
+    story.append(Paragraph("HANDLER PERFORMANCE SUMMARY", heading_style))
+    
+    handler_summary = f"""
+    Handler: {calculation.input_data.handler_name}
+    
+    This batch performance contributed to the handler's overall metrics:
+    • Feed Conversion Ratio: {calculation.feed_conversion_ratio} (Target: <1.8 excellent, <2.2 good)
+    • Mortality Rate: {calculation.mortality_rate_percent}% (Target: <3% excellent, <7% good)  
+    • Daily Weight Gain: {calculation.daily_weight_gain} kg/day (Target: >0.065 excellent, >0.055 good)
+    • Cost Management: ${calculation.net_cost_per_kg:.2f} per kg net cost
+    
+    Handler's responsibility included feed management, health monitoring, environmental control, 
+    and daily care of {calculation.input_data.initial_chicks:,} chicks over {calculation.weighted_average_age:.0f} days average.
+    """
+    
+    story.append(Paragraph(handler_summary, styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Removal Batches Detail
+    if calculation.input_data.removal_batches:
+        story.append(Paragraph("REMOVAL BATCHES DETAIL", heading_style))
+        removal_data = [['Batch #', 'Quantity', 'Weight (kg)', 'Age (days)', 'Avg Weight/Bird (kg)']]
+        
+        for i, batch in enumerate(calculation.input_data.removal_batches, 1):
+            avg_weight = batch.total_weight_kg / batch.quantity if batch.quantity > 0 else 0
+            removal_data.append([
+                str(i),
+                f"{batch.quantity:,}",
+                f"{batch.total_weight_kg:,.1f}",
+                str(batch.age_days),
+                f"{avg_weight:.2f}"
+            ])
+        
+        removal_table = Table(removal_data, colWidths=[0.8*inch, 1.2*inch, 1.2*inch, 1*inch, 1.3*inch])
+        removal_table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.purple),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lavender),
+        ]))
+        story.append(removal_table)
+    
+    # Generate PDF
+    doc.build(story)
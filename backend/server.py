@@ -1,25 +1,37 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.responses import FileResponse, Response
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
+import functools
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from typing import List, Optional, Dict
 import uuid
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 import json
-import statistics
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+import base64
+import hashlib
 import io
 
+import documents
+import ids
+import serialization
+import handler_stats
+import indexes
+import loop_watchdog
+import metrics
+import profiling
+import report_jobs
+from export_cache import ExportCache
+from events import ChangeFeed
+from read_cache import ReadCache, WriteCounter
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -27,13 +39,29 @@ load_dotenv(ROOT_DIR / '.env')
 EXPORTS_DIR = ROOT_DIR / "exports"
 EXPORTS_DIR.mkdir(exist_ok=True)
 
+# Reports of requests profiled on demand (see profiling.py)
+profile_store = profiling.ProfileStore(ROOT_DIR / "profiles")
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+class MongoCommandTimer(monitoring.CommandListener):
+    """
+    Record the duration of every MongoDB command in the db phase metrics
+    """
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        metrics.PHASE_SECONDS.observe(("db", event.command_name), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        metrics.PHASE_SECONDS.observe(("db", event.command_name), event.duration_micros / 1e6)
+
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandTimer()])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=serialization.FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -103,7 +131,7 @@ class CostBreakdown(BaseModel):
     sawdust_bedding_cost_percent: float
 
 class BroilerCalculation(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=ids.new_id)
     input_data: BroilerCalculationInput
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -131,7 +159,7 @@ class BroilerCalculation(BaseModel):
     daily_weight_gain: float
 
 class Handler(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=ids.new_id)
     name: str
     email: Optional[str] = None
     phone: Optional[str] = None
@@ -154,7 +182,7 @@ class HandlerUpdate(BaseModel):
     notes: Optional[str] = None
 
 class Shed(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=ids.new_id)
     number: str
     capacity: Optional[int] = None
     location: Optional[str] = None
@@ -193,6 +221,20 @@ class CalculationResult(BaseModel):
     calculation: BroilerCalculation
     insights: List[str]
 
+class ReportJob(BaseModel):
+    id: str
+    kind: str
+    batch_id: str
+    filename: str
+    status: str  # pending, running, done or failed
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+class BulkCalculationResult(BaseModel):
+    calculations: List[BroilerCalculation]
+
 class BatchSummary(BaseModel):
     batch_id: str
     shed_number: str
@@ -204,6 +246,7 @@ class BatchSummary(BaseModel):
     cost_per_kg: float
 
 # Business Logic Functions
+@metrics.timed_function("calculation")
 def calculate_enhanced_broiler_metrics(input_data: BroilerCalculationInput) -> BroilerCalculation:
     """
     Calculate enhanced broiler chicken production metrics with detailed tracking
@@ -303,6 +346,23 @@ def calculate_enhanced_broiler_metrics(input_data: BroilerCalculationInput) -> B
     
     return calculation
 
+_calculation_inputs_adapter = TypeAdapter(List[BroilerCalculationInput])
+
+@metrics.timed_function("calculation")
+def calculate_enhanced_broiler_metrics_bulk(inputs: List[BroilerCalculationInput]) -> List[dict]:
+    """
+    Vectorized calculate_enhanced_broiler_metrics for many batches at once, returning
+    calculation dicts. Every operation is applied in the same order as the scalar path,
+    so the values are identical to calculate_enhanced_broiler_metrics(...).dict().
+    """
+    if not inputs:
+        return []
+
+    # Imported on first use, which keeps numpy off startup
+    import bulk_metrics
+
+    return bulk_metrics.calculate(inputs, _calculation_inputs_adapter.dump_python(inputs))
+
 def generate_enhanced_insights(calculation: BroilerCalculation) -> List[str]:
     """
     Generate enhanced business insights based on the calculation results
@@ -366,27 +426,13 @@ def generate_enhanced_insights(calculation: BroilerCalculation) -> List[str]:
     
     return insights
 
-async def calculate_handler_performance(handler_name: str) -> Optional[HandlerPerformance]:
+def _handler_performance_from_totals(totals: dict) -> HandlerPerformance:
     """
-    Calculate performance metrics for a specific handler based on all their batches
+    Build a HandlerPerformance (including the performance score) from aggregated totals
     """
-    # Get all calculations for this handler
-    calculations = await db.broiler_calculations.find({"input_data.handler_name": handler_name}).to_list(1000)
-    
-    if not calculations:
-        return None
-    
-    # Calculate averages
-    fcr_values = [calc["feed_conversion_ratio"] for calc in calculations]
-    mortality_values = [calc["mortality_rate_percent"] for calc in calculations]
-    daily_gain_values = [calc["daily_weight_gain"] for calc in calculations]
-    cost_per_kg_values = [calc["net_cost_per_kg"] for calc in calculations]
-    total_chicks = sum(calc["input_data"]["initial_chicks"] for calc in calculations)
-    
-    avg_fcr = statistics.mean(fcr_values)
-    avg_mortality = statistics.mean(mortality_values)
-    avg_daily_gain = statistics.mean(daily_gain_values)
-    avg_cost_per_kg = statistics.mean(cost_per_kg_values)
+    avg_fcr = totals["avg_fcr"]
+    avg_mortality = totals["avg_mortality"]
+    avg_daily_gain = totals["avg_daily_gain"]
     
     # Calculate performance score (0-100, higher is better)
     # FCR: lower is better (excellent: 1.6, poor: 2.8)
@@ -402,21 +448,39 @@ async def calculate_handler_performance(handler_name: str) -> Optional[HandlerPe
     performance_score = (fcr_score * 0.35 + mortality_score * 0.35 + gain_score * 0.30)
     
     return HandlerPerformance(
-        handler_name=handler_name,
-        total_batches=len(calculations),
+        handler_name=totals["_id"],
+        total_batches=totals["total_batches"],
         avg_feed_conversion_ratio=round(avg_fcr, 2),
         avg_mortality_rate=round(avg_mortality, 2),
         avg_daily_weight_gain=round(avg_daily_gain, 3),
-        avg_cost_per_kg=round(avg_cost_per_kg, 2),
-        total_chicks_processed=total_chicks,
+        avg_cost_per_kg=round(totals["avg_cost_per_kg"], 2),
+        total_chicks_processed=totals["total_chicks"],
         performance_score=round(performance_score, 1)
     )
 
-async def export_batch_report(calculation: BroilerCalculation) -> str:
+async def calculate_handler_performance(handler_name: str) -> Optional[HandlerPerformance]:
+    """
+    Calculate performance metrics for a specific handler based on all their batches
+    """
+    results = await handler_stats.read_totals(db, handler_name)
+    
+    if not results:
+        return None
+    
+    return _handler_performance_from_totals(results[0])
+
+async def calculate_all_handlers_performance() -> List[HandlerPerformance]:
+    """
+    Calculate performance metrics for every registered handler from the rollup
+    """
+    results = await handler_stats.read_totals(db)
+    return [_handler_performance_from_totals(totals) for totals in results]
+
+@metrics.timed_function("json_export")
+async def export_batch_report(calculation: BroilerCalculation, filename: str) -> str:
     """
     Export batch calculation to a JSON file
     """
-    filename = f"batch_{calculation.input_data.batch_id}_{calculation.input_data.shed_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     filepath = EXPORTS_DIR / filename
     
     # Create export data
@@ -451,266 +515,163 @@ async def export_batch_report(calculation: BroilerCalculation) -> str:
         "removal_batches": [batch.dict() for batch in calculation.input_data.removal_batches]
     }
     
-    # Write to file
-    with open(filepath, 'w') as f:
-        json.dump(export_data, f, indent=2, default=str)
+    # Write to file, replacing it only once complete
+    partial_path = EXPORTS_DIR / f"{filename}.{uuid.uuid4().hex}.part"
+    serialization.dump_file(export_data, partial_path)
+    os.replace(partial_path, filepath)
     
     return filename
 
-def generate_pdf_report(calculation: BroilerCalculation) -> str:
+async def _load_report_calculation(calculation_id: str) -> Optional[dict]:
+    calculation = await db.broiler_calculations.find_one({"id": calculation_id})
+    return documents.response_dict(BroilerCalculation, calculation) if calculation else None
+
+# PDF reports render in worker processes; downloads wait this long for a pending render
+report_queue = report_jobs.ReportJobQueue(report_jobs.MongoReportJobStore(db), EXPORTS_DIR, _load_report_calculation)
+EXPORT_WAIT_SECONDS = 30
+
+# Export filenames per batch; the files themselves are generated on first download
+export_cache = ExportCache(EXPORTS_DIR)
+
+# Serialized read responses, valid until the next write through this server
+data_version = WriteCounter()
+response_cache = ReadCache(data_version.current)
+
+def _changes_data(endpoint):
     """
-    Generate a professional PDF report for batch closure
+    Mark an endpoint as writing stored data: once it finishes, successfully
+    or not, cached read responses are out of date
     """
-    filename = f"batch_report_{calculation.input_data.batch_id}_{calculation.input_data.shed_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    filepath = EXPORTS_DIR / filename
-    
-    # Create PDF document
-    doc = SimpleDocTemplate(str(filepath), pagesize=A4)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.darkblue
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.darkgreen
-    )
-    
-    # Title and Header
-    story.append(Paragraph("BROILER BATCH CLOSURE REPORT", title_style))
-    story.append(Spacer(1, 10))
-    story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Batch Information
-    story.append(Paragraph("BATCH IDENTIFICATION", heading_style))
-    batch_data = [
-        ['Batch ID:', calculation.input_data.batch_id],
-        ['Shed Number:', calculation.input_data.shed_number],
-        ['Handler:', calculation.input_data.handler_name],
-        ['Entry Date:', calculation.input_data.entry_date.strftime('%Y-%m-%d')],
-        ['Exit Date:', calculation.input_data.exit_date.strftime('%Y-%m-%d')],
-        ['Batch Duration:', f"{(calculation.input_data.exit_date - calculation.input_data.entry_date).days} days"],
-        ['Report Generated:', datetime.now().strftime('%Y-%m-%d %H:%M')],
-    ]
-    
-    batch_table = Table(batch_data, colWidths=[2*inch, 3*inch])
-    batch_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-    ]))
-    story.append(batch_table)
-    story.append(Spacer(1, 20))
-    
-    # Performance Summary
-    story.append(Paragraph("PERFORMANCE SUMMARY", heading_style))
-    performance_data = [
-        ['Metric', 'Value', 'Status'],
-        ['Feed Conversion Ratio', f"{calculation.feed_conversion_ratio}", 
-         'Excellent' if calculation.feed_conversion_ratio <= 1.8 else 'Good' if calculation.feed_conversion_ratio <= 2.2 else 'Average'],
-        ['Mortality Rate', f"{calculation.mortality_rate_percent}%",
-         'Excellent' if calculation.mortality_rate_percent <= 3 else 'Good' if calculation.mortality_rate_percent <= 7 else 'Needs Attention'],
-        ['Weighted Average Age', f"{calculation.weighted_average_age} days", 'Optimal'],
-        ['Daily Weight Gain', f"{calculation.daily_weight_gain} kg", 
-         'Excellent' if calculation.daily_weight_gain >= 0.065 else 'Good' if calculation.daily_weight_gain >= 0.055 else 'Average'],
-        ['Net Cost per kg', f"${calculation.net_cost_per_kg:.2f}", 'Calculated']
-    ]
-    
-    perf_table = Table(performance_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch])
-    perf_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
-    ]))
-    story.append(perf_table)
-    story.append(Spacer(1, 20))
-    
-    # Production Data
-    story.append(Paragraph("PRODUCTION DATA", heading_style))
-    production_data = [
-        ['Parameter', 'Count/Amount'],
-        ['Initial Chicks', f"{calculation.input_data.initial_chicks:,}"],
-        ['Chicks Died', f"{calculation.input_data.chicks_died:,}"],
-        ['Surviving Chicks', f"{calculation.surviving_chicks:,}"],
-        ['Viability (Caught)', f"{calculation.viability:,}"],
-        ['Missing Chicks', f"{calculation.missing_chicks:,}"],
-        ['Total Weight Produced', f"{calculation.total_weight_produced_kg:,} kg"],
-        ['Total Feed Consumed', f"{calculation.total_feed_consumed_kg:,} kg"],
-        ['Average Weight per Chick', f"{calculation.average_weight_per_chick:.2f} kg"],
-        ['Viability Rate', f"{(calculation.viability / calculation.input_data.initial_chicks * 100):.1f}%"],
-    ]
-    
-    prod_table = Table(production_data, colWidths=[3*inch, 2*inch])
-    prod_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
-    ]))
-    story.append(prod_table)
-    story.append(Spacer(1, 20))
-    
-    # Financial Summary - Enhanced with all cost details
-    story.append(Paragraph("COMPLETE FINANCIAL BREAKDOWN", heading_style))
-    
-    # Detailed cost breakdown
-    financial_data = [
-        ['Cost Category', 'Consumption/Qty', 'Unit Cost', 'Total Amount', 'Percentage'],
-        ['Initial Chicks', f"{calculation.input_data.initial_chicks:,}", f"${calculation.input_data.chick_cost_per_unit:.2f}/chick", f"${calculation.cost_breakdown.chick_cost:.2f}", f"{calculation.cost_breakdown.chick_cost_percent}%"],
-        ['Pre-starter Feed', f"{calculation.input_data.pre_starter_feed.consumption_kg:.1f} kg", f"${calculation.input_data.pre_starter_feed.cost_per_kg:.2f}/kg", f"${calculation.cost_breakdown.pre_starter_cost:.2f}", f"{calculation.cost_breakdown.pre_starter_cost_percent}%"],
-        ['Starter Feed', f"{calculation.input_data.starter_feed.consumption_kg:.1f} kg", f"${calculation.input_data.starter_feed.cost_per_kg:.2f}/kg", f"${calculation.cost_breakdown.starter_cost:.2f}", f"{calculation.cost_breakdown.starter_cost_percent}%"],
-        ['Growth Feed', f"{calculation.input_data.growth_feed.consumption_kg:.1f} kg", f"${calculation.input_data.growth_feed.cost_per_kg:.2f}/kg", f"${calculation.cost_breakdown.growth_cost:.2f}", f"{calculation.cost_breakdown.growth_cost_percent}%"],
-        ['Final Feed', f"{calculation.input_data.final_feed.consumption_kg:.1f} kg", f"${calculation.input_data.final_feed.cost_per_kg:.2f}/kg", f"${calculation.cost_breakdown.final_cost:.2f}", f"{calculation.cost_breakdown.final_cost_percent}%"],
-        ['Medicine & Vaccines', 'Lump Sum', 'N/A', f"${calculation.cost_breakdown.medicine_cost:.2f}", f"{calculation.cost_breakdown.medicine_cost_percent}%"],
-        ['Miscellaneous Costs', 'Lump Sum', 'N/A', f"${calculation.cost_breakdown.miscellaneous_cost:.2f}", f"{calculation.cost_breakdown.miscellaneous_cost_percent}%"],
-        ['Sawdust Bedding', 'Lump Sum', 'N/A', f"${calculation.cost_breakdown.sawdust_bedding_cost:.2f}", f"{calculation.cost_breakdown.sawdust_bedding_cost_percent}%"],
-        ['Cost Variations', 'Lump Sum', 'N/A', f"${calculation.cost_breakdown.cost_variations:.2f}", f"{calculation.cost_breakdown.cost_variations_percent}%"],
-        ['', '', '', '', ''],
-        ['TOTAL GROSS COST', '', '', f"${calculation.total_cost:.2f}", '100.0%'],
-    ]
-    
-    # Add revenue if exists
-    if calculation.total_revenue > 0:
-        financial_data.extend([
-            ['Chicken Bedding Sale', f"{calculation.total_weight_produced_kg:.1f} kg equiv.", 'Revenue', f"-${calculation.total_revenue:.2f}", 'Revenue'],
-            ['NET TOTAL COST', '', '', f"${calculation.total_cost - calculation.total_revenue:.2f}", 'Final'],
-        ])
-    
-    fin_table = Table(financial_data, colWidths=[2.2*inch, 1.3*inch, 1.0*inch, 1.0*inch, 0.8*inch])
-    fin_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, -3), (-1, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -4), 1, colors.black),
-        ('GRID', (0, -3), (-1, -1), 2, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.orange),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('BACKGROUND', (0, 1), (-1, -4), colors.lightyellow),
-        ('BACKGROUND', (0, -3), (-1, -1), colors.lightcoral),
-    ]))
-    story.append(fin_table)
-    story.append(Spacer(1, 20))
-    
-    # Handler Performance Section
-    story.append(Paragraph("HANDLER PERFORMANCE SUMMARY", heading_style))
-    
-    handler_summary = f"""
-    Handler: {calculation.input_data.handler_name}
-    
-    This batch performance contributed to the handler's overall metrics:
-    • Feed Conversion Ratio: {calculation.feed_conversion_ratio} (Target: <1.8 excellent, <2.2 good)
-    • Mortality Rate: {calculation.mortality_rate_percent}% (Target: <3% excellent, <7% good)  
-    • Daily Weight Gain: {calculation.daily_weight_gain} kg/day (Target: >0.065 excellent, >0.055 good)
-    • Cost Management: ${calculation.net_cost_per_kg:.2f} per kg net cost
-    
-    Handler's responsibility included feed management, health monitoring, environmental control, 
-    and daily care of {calculation.input_data.initial_chicks:,} chicks over {calculation.weighted_average_age:.0f} days average.
-    """
-    
-    story.append(Paragraph(handler_summary, styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Removal Batches Detail
-    if calculation.input_data.removal_batches:
-        story.append(Paragraph("REMOVAL BATCHES DETAIL", heading_style))
-        removal_data = [['Batch #', 'Quantity', 'Weight (kg)', 'Age (days)', 'Avg Weight/Bird (kg)']]
-        
-        for i, batch in enumerate(calculation.input_data.removal_batches, 1):
-            avg_weight = batch.total_weight_kg / batch.quantity if batch.quantity > 0 else 0
-            removal_data.append([
-                str(i),
-                f"{batch.quantity:,}",
-                f"{batch.total_weight_kg:,.1f}",
-                str(batch.age_days),
-                f"{avg_weight:.2f}"
-            ])
-        
-        removal_table = Table(removal_data, colWidths=[0.8*inch, 1.2*inch, 1.2*inch, 1*inch, 1.3*inch])
-        removal_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.purple),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lavender),
-        ]))
-        story.append(removal_table)
-    
-    # Generate PDF
-    doc.build(story)
-    
-    return filename
+    @functools.wraps(endpoint)
+    async def run(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            data_version.bump()
+    return run
+
+# Change events for clients connected to /api/events
+change_feed = ChangeFeed()
+
+# Figures read from their owners only when /metrics is scraped
+metrics.registry.counter("broiler_read_cache_lookups_total", "Read cache lookups by result",
+                         lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses}, ("result",))
+metrics.registry.counter("broiler_read_cache_evictions_total", "Read cache entries evicted to stay within its limits",
+                         lambda: response_cache.evictions)
+metrics.registry.counter("broiler_read_cache_invalidations_total", "Times a data change emptied the read cache",
+                         lambda: response_cache.invalidations)
+metrics.registry.gauge("broiler_read_cache_bytes", "Size of the cached response bodies",
+                       lambda: response_cache.stats()["bytes"])
+metrics.registry.gauge("broiler_report_jobs_queued", "PDF report jobs waiting for or being rendered",
+                       lambda: report_queue.depth)
+metrics.registry.gauge("broiler_event_subscribers", "Clients connected to /api/events",
+                       lambda: change_feed.subscriber_count)
+
+def _batch_summary(calculation_doc: dict) -> dict:
+    """
+    A saved calculation as /api/calculations lists it
+    """
+    input_data = calculation_doc["input_data"]
+    return {
+        "batch_id": input_data["batch_id"],
+        "shed_number": input_data["shed_number"],
+        "handler_name": input_data["handler_name"],
+        "date": calculation_doc["created_at"],
+        "initial_chicks": input_data["initial_chicks"],
+        "fcr": calculation_doc["feed_conversion_ratio"],
+        "mortality_percent": calculation_doc["mortality_rate_percent"],
+        "cost_per_kg": calculation_doc["net_cost_per_kg"],
+    }
+
+async def _publish_batch_change(kind: str, batch_id: str, handler_names: List[str],
+                                calculation_doc: Optional[dict] = None):
+    """
+    Publish a batch event, then the new performance of each handler it affects
+    """
+    if not change_feed.has_subscribers:
+        # Nobody is listening: skip building the payload and the handler performance
+        return
+    data = {"batch_id": batch_id}
+    if calculation_doc is not None:
+        data["batch"] = _batch_summary(calculation_doc)
+    change_feed.publish(kind, data)
+    for handler_name in dict.fromkeys(handler_names):
+        performance = await calculate_handler_performance(handler_name)
+        change_feed.publish("handler_performance.updated", {"handler_name": handler_name, "performance": performance})
+
+async def _cached_json(key, render) -> Response:
+    """
+    JSON response for key from the read cache; render() produces the body on a miss
+    """
+    async def entry():
+        return await render(), {}
+    body, headers = await response_cache.get(key, entry)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _generate_export(filename: str) -> Optional[dict]:
+    """
+    Generate a batch's current export that has not been downloaded yet. JSON is
+    written straight away; a PDF is rendered by a report job, which is returned.
+    """
+    found = export_cache.lookup(filename)
+    if not found:
+        return None
+    entry, kind = found
+    calculation = await db.broiler_calculations.find_one({"id": entry["calculation_id"]})
+    if not calculation:
+        return None
+    calculation = BroilerCalculation(**calculation)
+    if kind == "json":
+        await export_batch_report(calculation, filename)
+        return None
+    return await report_queue.submit(calculation.dict(), filename)
+
+async def ensure_handler(name: str):
+    """
+    Register a handler by name unless one exists, in a single upsert
+    """
+    handler = documents.stamp(Handler(name=name).dict())
+    del handler["name"]
+    try:
+        await db.handlers.update_one({"name": name}, {"$setOnInsert": handler}, upsert=True)
+    except DuplicateKeyError:
+        pass  # A concurrent upsert registered the same name first
 
 # API Routes
 @api_router.get("/")
 async def root():
     return {"message": "Enhanced Broiler Farm Management System API"}
 
-@api_router.post("/calculate", response_model=CalculationResult)
-async def calculate_broiler_costs(input_data: BroilerCalculationInput):
+def _input_validation_error(input_data: BroilerCalculationInput) -> Optional[str]:
     """
-    Calculate enhanced broiler chicken production costs and metrics
+    Return the validation message for an invalid calculation input, or None
     """
-    # Validate input
     if input_data.initial_chicks <= 0:
-        raise HTTPException(status_code=400, detail="Initial chicks must be greater than 0")
+        return "Initial chicks must be greater than 0"
     if input_data.chicks_died > input_data.initial_chicks:
-        raise HTTPException(status_code=400, detail="Chicks died cannot be more than initial chicks")
+        return "Chicks died cannot be more than initial chicks"
     if not input_data.removal_batches:
-        raise HTTPException(status_code=400, detail="At least one removal batch is required")
-    
-    # Check if batch ID already exists
-    existing_batch = await db.broiler_calculations.find_one({"input_data.batch_id": input_data.batch_id})
-    if existing_batch:
-        raise HTTPException(status_code=400, detail=f"Batch ID '{input_data.batch_id}' already exists")
-    
-    # Validate removal batches
+        return "At least one removal batch is required"
     total_removed = sum(batch.quantity for batch in input_data.removal_batches)
-    surviving_chicks = input_data.initial_chicks - input_data.chicks_died
-    if total_removed > surviving_chicks:
-        raise HTTPException(status_code=400, detail="Total removed chicks cannot exceed surviving chicks")
-    
-    # Validate removal batches
+    if total_removed > input_data.initial_chicks - input_data.chicks_died:
+        return "Total removed chicks cannot exceed surviving chicks"
     for i, batch in enumerate(input_data.removal_batches):
         if batch.quantity <= 0:
-            raise HTTPException(status_code=400, detail=f"Batch {i+1}: Quantity must be greater than 0")
+            return f"Batch {i+1}: Quantity must be greater than 0"
         if batch.total_weight_kg <= 0:
-            raise HTTPException(status_code=400, detail=f"Batch {i+1}: Weight must be greater than 0")
+            return f"Batch {i+1}: Weight must be greater than 0"
+    return None
+
+@api_router.post("/calculate", response_model=CalculationResult)
+@_changes_data
+async def calculate_broiler_costs(input_data: BroilerCalculationInput):
+    """
+    Calculate enhanced broiler chicken production costs and metrics
+    """
+    # Validate input
+    error = _input_validation_error(input_data)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
     try:
         # Calculate metrics
@@ -719,56 +680,163 @@ async def calculate_broiler_costs(input_data: BroilerCalculationInput):
         # Generate insights
         insights = generate_enhanced_insights(calculation)
         
-        # Add handler to database if not exists
-        existing_handler = await db.handlers.find_one({"name": input_data.handler_name})
-        if not existing_handler:
-            handler = Handler(name=input_data.handler_name)
-            await db.handlers.insert_one(handler.dict())
+        # Save calculation to database together with its handler rollup; the unique
+        # input_data.batch_id index rejects a batch ID that is already saved
+        calculation_doc = documents.stamp(calculation.dict())
+        async def save_calculation():
+            async with handler_stats.transaction(client) as session:
+                await db.broiler_calculations.insert_one(calculation_doc, session=session)
+                await handler_stats.record_calculation(db, calculation_doc, session=session)
         
-        # Save calculation to database
-        await db.broiler_calculations.insert_one(calculation.dict())
+        await save_calculation()
+        # Add handler to database if not exists, only once the batch is saved
+        await ensure_handler(input_data.handler_name)
         
-        # Export batch report (JSON and PDF)
-        json_filename = await export_batch_report(calculation)
-        pdf_filename = generate_pdf_report(calculation)
+        # Name the batch reports; they are generated on first download
+        export = export_cache.register(calculation_doc)
+        await _publish_batch_change("batch.created", input_data.batch_id, [input_data.handler_name], calculation_doc)
         
         # Add export info to insights
-        insights.append(f"📄 JSON report exported as: {json_filename}")
-        insights.append(f"📄 PDF report exported as: {pdf_filename}")
+        insights.append(f"📄 JSON report exported as: {export['json']}")
+        insights.append(f"📄 PDF report exported as: {export['pdf']}")
         
         return CalculationResult(calculation=calculation, insights=insights)
         
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail=f"Batch ID '{input_data.batch_id}' already exists")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
 
-@api_router.get("/calculations", response_model=List[BatchSummary])
-async def get_calculations():
+@api_router.post("/calculate/bulk", response_model=BulkCalculationResult)
+async def calculate_broiler_costs_bulk(inputs: List[BroilerCalculationInput]):
+    """
+    Calculate metrics for many batches in one request (results are not saved)
+    """
+    for index, input_data in enumerate(inputs, 1):
+        error = _input_validation_error(input_data)
+        if error:
+            raise HTTPException(status_code=400, detail=f"Input {index} ('{input_data.batch_id}'): {error}")
+
+    try:
+        calculations = calculate_enhanced_broiler_metrics_bulk(inputs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+
+    # Serialize the rows in one pass; the response_model path would re-validate every row
+    content = serialization.dumps({"calculations": calculations})
+    return Response(content=content, media_type="application/json")
+
+# Only the fields BatchSummary needs, plus the (created_at, id) page key
+BATCH_SUMMARY_PROJECTION = {
+    "_id": 0, "id": 1, "created_at": 1,
+    "input_data.batch_id": 1, "input_data.shed_number": 1, "input_data.handler_name": 1,
+    "input_data.initial_chicks": 1,
+    "feed_conversion_ratio": 1, "mortality_rate_percent": 1, "net_cost_per_kg": 1,
+}
+
+def _encode_cursor(created_at: datetime, calculation_id: str) -> str:
+    key = json.dumps([created_at.isoformat(), calculation_id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, calculation_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), calculation_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _date_range_filter(start: Optional[date], end: Optional[date]) -> Dict[str, datetime]:
+    """
+    Mongo range for the whole days from start to end (inclusive)
     """
-    Get all saved calculations summary
+    bounds = {}
+    if start:
+        bounds["$gte"] = datetime.combine(start, time.min)
+    if end:
+        bounds["$lt"] = datetime.combine(end + timedelta(days=1), time.min)
+    return bounds
+
+async def _calculation_summaries_page(query: dict, limit: int):
+    """
+    One newest-first page of BatchSummary rows matching query, and the cursor
+    of the page after it (None on the last page)
     """
-    calculations = await db.broiler_calculations.find().sort("created_at", -1).to_list(50)
+    # Fetch one extra document to know whether another page follows
+    calculations = await db.broiler_calculations.find(query, BATCH_SUMMARY_PROJECTION) \
+        .sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(calculations) > limit:
+        calculations = calculations[:limit]
+        last = calculations[-1]
+        next_cursor = _encode_cursor(last["created_at"], last["id"])
     summaries = []
     
     for calc in calculations:
         # Check if the document has the expected structure
         if isinstance(calc, dict) and "input_data" in calc:
             try:
-                summary = BatchSummary(
-                    batch_id=calc["input_data"]["batch_id"],
-                    shed_number=calc["input_data"]["shed_number"],
-                    handler_name=calc["input_data"]["handler_name"],
-                    date=calc["created_at"],
-                    initial_chicks=calc["input_data"]["initial_chicks"],
-                    fcr=calc["feed_conversion_ratio"],
-                    mortality_percent=calc["mortality_rate_percent"],
-                    cost_per_kg=calc["net_cost_per_kg"]
-                )
-                summaries.append(summary)
+                summary = {
+                    "batch_id": calc["input_data"]["batch_id"],
+                    "shed_number": calc["input_data"]["shed_number"],
+                    "handler_name": calc["input_data"]["handler_name"],
+                    "date": calc["created_at"],
+                    "initial_chicks": calc["input_data"]["initial_chicks"],
+                    "fcr": calc["feed_conversion_ratio"],
+                    "mortality_percent": calc["mortality_rate_percent"],
+                    "cost_per_kg": calc["net_cost_per_kg"]
+                }
             except (KeyError, TypeError):
                 # Skip malformed documents
                 continue
+            if None not in summary.values():
+                summaries.append(summary)
     
-    return summaries
+    return summaries, next_cursor
+
+@api_router.get("/calculations", response_model=List[BatchSummary])
+async def get_calculations(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    shed_number: Optional[str] = None,
+    handler_name: Optional[str] = None,
+    entry_from: Optional[date] = None,
+    entry_to: Optional[date] = None,
+    exit_from: Optional[date] = None,
+    exit_to: Optional[date] = None,
+):
+    """
+    Get saved calculation summaries, newest first. Pages are keyed on
+    (created_at, id): pass the X-Next-Cursor header of one page as cursor to
+    get the next, so deep pages cost the same as the first.
+    """
+    query = {}
+    if shed_number:
+        query["input_data.shed_number"] = shed_number
+    if handler_name:
+        query["input_data.handler_name"] = handler_name
+    entry_range = _date_range_filter(entry_from, entry_to)
+    if entry_range:
+        query["input_data.entry_date"] = entry_range
+    exit_range = _date_range_filter(exit_from, exit_to)
+    if exit_range:
+        query["input_data.exit_date"] = exit_range
+    if cursor:
+        created_at, calculation_id = _decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": calculation_id}},
+        ]
+    
+    async def render():
+        summaries, next_cursor = await _calculation_summaries_page(query, limit)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        # The projected fields already have BatchSummary's types, so the rows are
+        # serialized as they are rather than validated into models first
+        return serialization.dumps(summaries), headers
+    
+    key = ("calculations", limit, cursor, shed_number, handler_name, entry_from, entry_to, exit_from, exit_to)
+    body, headers = await response_cache.get(key, render)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 
@@ -777,27 +845,119 @@ async def get_handler_names():
     """
     Get all handler names for dropdown
     """
-    handlers = await db.handlers.find().sort("name", 1).to_list(100)
-    return [handler["name"] for handler in handlers]
+    async def render():
+        handlers = await db.handlers.find({}, {"_id": 0, "name": 1}).sort("name", 1).to_list(None)
+        return serialization.dumps([handler["name"] for handler in handlers])
+    return await _cached_json("handler_names", render)
 
-@api_router.get("/handlers/performance")
-async def get_handlers_performance():
+async def _ranked_handler_performance() -> List[HandlerPerformance]:
     """
-    Get performance analysis for all handlers
+    Performance of every handler, best score first
     """
-    handlers = await db.handlers.find().to_list(100)
-    performances = []
-    
-    for handler in handlers:
-        performance = await calculate_handler_performance(handler["name"])
-        if performance:
-            performances.append(performance)
+    performances = await calculate_all_handlers_performance()
     
     # Sort by performance score (descending)
     performances.sort(key=lambda x: x.performance_score, reverse=True)
     
     return performances
 
+@api_router.get("/handlers/performance")
+async def get_handlers_performance():
+    """
+    Get performance analysis for all handlers
+    """
+    async def render():
+        return serialization.dumps(await _ranked_handler_performance())
+    return await _cached_json("handler_performance", render)
+
+# First page of calculations in the dashboard bootstrap
+DASHBOARD_PAGE_SIZE = 50
+
+def _etag_headers(body: bytes) -> Dict[str, str]:
+    """
+    Headers letting clients revalidate body by a hash of its content
+    """
+    return {"ETag": f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', "Cache-Control": "no-cache"}
+
+def _etag_response(request: Request, body: bytes, headers: Dict[str, str]) -> Response:
+    """
+    JSON response for body, or a 304 when the request's If-None-Match already
+    names its ETag
+    """
+    etag = headers["ETag"]
+    known = {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}
+    if etag in known or f"W/{etag}" in known:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/dashboard")
+async def get_dashboard(request: Request):
+    """
+    Everything the dashboard loads at start in one response: the first page
+    of calculations, handlers and their names, sheds and the shed numbers in
+    use, and handler performance. The queries run concurrently; an unchanged
+    dashboard costs the client a 304.
+    """
+    async def render():
+        (summaries, next_cursor), handlers, sheds, shed_numbers, performances = await asyncio.gather(
+            _calculation_summaries_page({}, DASHBOARD_PAGE_SIZE),
+            db.handlers.find().sort("name", 1).to_list(None),
+            db.sheds.find().sort("number", 1).to_list(None),
+            _shed_numbers(),
+            _ranked_handler_performance(),
+        )
+        handlers = [documents.response_dict(Handler, handler) for handler in handlers]
+        body = serialization.dumps({
+            "calculations": summaries,
+            "calculations_next_cursor": next_cursor,
+            "handlers": handlers,
+            "handler_names": [handler["name"] for handler in handlers],
+            "sheds": [documents.response_dict(Shed, shed) for shed in sheds],
+            "shed_numbers": shed_numbers,
+            "handler_performance": performances,
+        })
+        return body, _etag_headers(body)
+    
+    body, headers = await response_cache.get("dashboard", render)
+    return _etag_response(request, body, headers)
+
+@api_router.get("/admin/cache")
+async def get_cache_stats():
+    """
+    Size and hit/miss counts of the read response cache
+    """
+    return response_cache.stats()
+
+@api_router.get("/admin/profiles")
+async def get_profiles():
+    """
+    Request profiles recorded with PROFILING_ENABLED, newest first
+    """
+    return profile_store.list()
+
+@api_router.get("/admin/profiles/{filename}")
+async def download_profile(filename: str):
+    """
+    Download a profile's text report (.txt) or pstats data (.prof)
+    """
+    path = profile_store.path(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/plain" if filename.endswith(".txt") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=filename)
+
+@api_router.get("/events")
+async def stream_events(request: Request):
+    """
+    Server-Sent Events feed of batch, handler, shed and handler performance
+    changes (see events.py)
+    """
+    return StreamingResponse(
+        change_feed.stream(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @api_router.get("/handlers/{handler_name}/performance")
 async def get_handler_performance(handler_name: str):
     """
@@ -814,10 +974,13 @@ async def get_handlers():
     """
     Get all handlers
     """
-    handlers = await db.handlers.find().sort("name", 1).to_list(100)
-    return [Handler(**handler) for handler in handlers]
+    async def render():
+        handlers = await db.handlers.find().sort("name", 1).to_list(None)
+        return documents.to_json_list_bytes(Handler, handlers)
+    return await _cached_json("handlers", render)
 
 @api_router.post("/handlers", response_model=Handler)
+@_changes_data
 async def create_handler(handler_data: HandlerCreate):
     """
     Create a new handler
@@ -828,7 +991,8 @@ async def create_handler(handler_data: HandlerCreate):
         raise HTTPException(status_code=400, detail=f"Handler '{handler_data.name}' already exists")
     
     handler = Handler(**handler_data.dict())
-    await db.handlers.insert_one(handler.dict())
+    await db.handlers.insert_one(documents.stamp(handler.dict()))
+    change_feed.publish("handler.created", {"handler": handler})
     return handler
 
 @api_router.get("/handlers/{handler_id}", response_model=Handler)
@@ -839,9 +1003,10 @@ async def get_handler(handler_id: str):
     handler = await db.handlers.find_one({"id": handler_id})
     if not handler:
         raise HTTPException(status_code=404, detail="Handler not found")
-    return Handler(**handler)
+    return Response(content=documents.to_json_bytes(Handler, handler), media_type="application/json")
 
 @api_router.put("/handlers/{handler_id}", response_model=Handler)
+@_changes_data
 async def update_handler(handler_id: str, handler_data: HandlerUpdate):
     """
     Update a handler
@@ -865,10 +1030,12 @@ async def update_handler(handler_id: str, handler_data: HandlerUpdate):
     await db.handlers.update_one({"id": handler_id}, {"$set": update_data})
     
     # Return updated handler
-    updated_handler = await db.handlers.find_one({"id": handler_id})
-    return Handler(**updated_handler)
+    updated_handler = Handler(**await db.handlers.find_one({"id": handler_id}))
+    change_feed.publish("handler.updated", {"handler": updated_handler})
+    return updated_handler
 
 @api_router.delete("/handlers/{handler_id}")
+@_changes_data
 async def delete_handler(handler_id: str):
     """
     Delete a handler
@@ -885,6 +1052,7 @@ async def delete_handler(handler_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Handler not found")
     
+    change_feed.publish("handler.deleted", {"id": handler_id})
     return {"message": "Handler deleted successfully"}
 
 # Shed Management Endpoints
@@ -893,10 +1061,13 @@ async def get_all_sheds():
     """
     Get all sheds with full details
     """
-    sheds = await db.sheds.find().sort("number", 1).to_list(100)
-    return [Shed(**shed) for shed in sheds]
+    async def render():
+        sheds = await db.sheds.find().sort("number", 1).to_list(None)
+        return documents.to_json_list_bytes(Shed, sheds)
+    return await _cached_json("admin_sheds", render)
 
 @api_router.post("/admin/sheds", response_model=Shed)
+@_changes_data
 async def create_shed(shed_data: ShedCreate):
     """
     Create a new shed
@@ -907,7 +1078,8 @@ async def create_shed(shed_data: ShedCreate):
         raise HTTPException(status_code=400, detail=f"Shed '{shed_data.number}' already exists")
     
     shed = Shed(**shed_data.dict())
-    await db.sheds.insert_one(shed.dict())
+    await db.sheds.insert_one(documents.stamp(shed.dict()))
+    change_feed.publish("shed.created", {"shed": shed})
     return shed
 
 @api_router.get("/admin/sheds/{shed_id}", response_model=Shed)
@@ -918,9 +1090,10 @@ async def get_shed(shed_id: str):
     shed = await db.sheds.find_one({"id": shed_id})
     if not shed:
         raise HTTPException(status_code=404, detail="Shed not found")
-    return Shed(**shed)
+    return Response(content=documents.to_json_bytes(Shed, shed), media_type="application/json")
 
 @api_router.put("/admin/sheds/{shed_id}", response_model=Shed)
+@_changes_data
 async def update_shed(shed_id: str, shed_data: ShedUpdate):
     """
     Update a shed
@@ -944,10 +1117,12 @@ async def update_shed(shed_id: str, shed_data: ShedUpdate):
     await db.sheds.update_one({"id": shed_id}, {"$set": update_data})
     
     # Return updated shed
-    updated_shed = await db.sheds.find_one({"id": shed_id})
-    return Shed(**updated_shed)
+    updated_shed = Shed(**await db.sheds.find_one({"id": shed_id}))
+    change_feed.publish("shed.updated", {"shed": updated_shed})
+    return updated_shed
 
 @api_router.delete("/admin/sheds/{shed_id}")
+@_changes_data
 async def delete_shed(shed_id: str):
     """
     Delete a shed
@@ -964,45 +1139,22 @@ async def delete_shed(shed_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Shed not found")
     
+    change_feed.publish("shed.deleted", {"id": shed_id})
     return {"message": "Shed deleted successfully"}
 
-@api_router.get("/handlers/names")
-async def get_handler_names():
-    """
-    Get all handler names for dropdown
-    """
-    handlers = await db.handlers.find().sort("name", 1).to_list(100)
-    return [handler["name"] for handler in handlers]
-@api_router.get("/handlers/performance")
-async def get_handlers_performance():
-    """
-    Get performance analysis for all handlers
-    """
-    handlers = await db.handlers.find().to_list(100)
-    performances = []
-    
-    for handler in handlers:
-        performance = await calculate_handler_performance(handler["name"])
-        if performance:
-            performances.append(performance)
-    
-    # Sort by performance score (descending)
-    performances.sort(key=lambda x: x.performance_score, reverse=True)
-    
-    return performances
-
-@api_router.get("/handlers/{handler_name}/performance")
-async def get_handler_performance(handler_name: str):
+@api_router.get("/admin/indexes")
+async def get_index_report():
     """
-    Get performance analysis for a specific handler
+    Explain the hot queries and report any that no index backs
     """
-    performance = await calculate_handler_performance(handler_name)
-    if not performance:
-        raise HTTPException(status_code=404, detail="Handler not found or no batches recorded")
-    
-    return performance
+    report = await indexes.explain_hot_queries(db)
+    return {
+        "not_index_backed": [entry["query"] for entry in report if not entry["index_backed"]],
+        "queries": report,
+    }
 
 @api_router.put("/batches/{batch_id}")
+@_changes_data
 async def update_batch(batch_id: str, input_data: BroilerCalculationInput):
     """
     Update an existing batch calculation
@@ -1013,25 +1165,9 @@ async def update_batch(batch_id: str, input_data: BroilerCalculationInput):
         raise HTTPException(status_code=404, detail=f"Batch ID '{batch_id}' not found")
     
     # Validate input
-    if input_data.initial_chicks <= 0:
-        raise HTTPException(status_code=400, detail="Initial chicks must be greater than 0")
-    if input_data.chicks_died > input_data.initial_chicks:
-        raise HTTPException(status_code=400, detail="Chicks died cannot be more than initial chicks")
-    if not input_data.removal_batches:
-        raise HTTPException(status_code=400, detail="At least one removal batch is required")
-    
-    # Validate removal batches
-    total_removed = sum(batch.quantity for batch in input_data.removal_batches)
-    surviving_chicks = input_data.initial_chicks - input_data.chicks_died
-    if total_removed > surviving_chicks:
-        raise HTTPException(status_code=400, detail="Total removed chicks cannot exceed surviving chicks")
-    
-    # Validate removal batches
-    for i, batch in enumerate(input_data.removal_batches):
-        if batch.quantity <= 0:
-            raise HTTPException(status_code=400, detail=f"Batch {i+1}: Quantity must be greater than 0")
-        if batch.total_weight_kg <= 0:
-            raise HTTPException(status_code=400, detail=f"Batch {i+1}: Weight must be greater than 0")
+    error = _input_validation_error(input_data)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
     try:
         # Calculate metrics
@@ -1044,24 +1180,30 @@ async def update_batch(batch_id: str, input_data: BroilerCalculationInput):
         
         # Update handler if name changed
         if input_data.handler_name != existing_batch["input_data"]["handler_name"]:
-            existing_handler = await db.handlers.find_one({"name": input_data.handler_name})
-            if not existing_handler:
-                handler = Handler(name=input_data.handler_name)
-                await db.handlers.insert_one(handler.dict())
+            await ensure_handler(input_data.handler_name)
         
-        # Update the batch in database
-        await db.broiler_calculations.replace_one(
-            {"input_data.batch_id": batch_id}, 
-            calculation.dict()
-        )
+        # Update the batch in database and move its contribution in the handler rollup
+        calculation_doc = documents.stamp(calculation.dict())
+        async with handler_stats.transaction(client) as session:
+            previous_doc = await db.broiler_calculations.find_one_and_replace(
+                {"input_data.batch_id": batch_id}, 
+                calculation_doc,
+                session=session
+            )
+            if previous_doc:
+                await handler_stats.record_replacement(db, previous_doc, calculation_doc, session=session)
         
-        # Export updated batch report
-        json_filename = await export_batch_report(calculation)
-        pdf_filename = generate_pdf_report(calculation)
+        # Unchanged batches keep their existing reports
+        export = export_cache.register(calculation_doc)
+        await _publish_batch_change(
+            "batch.updated", batch_id,
+            [existing_batch["input_data"]["handler_name"], input_data.handler_name],
+            calculation_doc,
+        )
         
         # Add export info to insights
-        insights.append(f"📄 Updated JSON report exported as: {json_filename}")
-        insights.append(f"📄 Updated PDF report exported as: {pdf_filename}")
+        insights.append(f"📄 Updated JSON report exported as: {export['json']}")
+        insights.append(f"📄 Updated PDF report exported as: {export['pdf']}")
         
         return CalculationResult(calculation=calculation, insights=insights)
         
@@ -1077,7 +1219,8 @@ async def get_batch_details(batch_id: str):
     if not calculation:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    return BroilerCalculation(**calculation)
+    # Stored batches are served as written unless they predate the current schema
+    return Response(content=documents.to_json_bytes(BroilerCalculation, calculation), media_type="application/json")
 
 @api_router.get("/batches/{batch_id}/export-pdf")
 async def regenerate_batch_pdf(batch_id: str):
@@ -1088,22 +1231,47 @@ async def regenerate_batch_pdf(batch_id: str):
     if not calculation:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    # Convert back to calculation object
-    calc_obj = BroilerCalculation(**calculation)
-    
-    # Generate new PDF
-    pdf_filename = generate_pdf_report(calc_obj)
+    # Reuse the batch's current report; it is rendered on first download
+    export = export_cache.entry_for(batch_id) or export_cache.register(documents.response_dict(BroilerCalculation, calculation))
     
-    return {"message": "PDF regenerated successfully", "filename": pdf_filename}
+    return {"message": "PDF report ready", "filename": export["pdf"]}
+
+@api_router.get("/jobs/{job_id}", response_model=ReportJob)
+async def get_report_job(job_id: str):
+    """
+    Get the status of a background report job
+    """
+    job = await report_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @api_router.get("/export/{filename}")
 async def download_export(filename: str):
     """
     Download exported batch report (JSON or PDF)
     """
+    if filename == export_cache.index_path.name:
+        raise HTTPException(status_code=404, detail="Export file not found")
     filepath = EXPORTS_DIR / filename
     if not filepath.exists():
-        raise HTTPException(status_code=404, detail="Export file not found")
+        # Generate the export on first download; wait for a PDF render, or
+        # report the job if it takes too long
+        job = await report_queue.find_by_filename(filename)
+        if not (job and job["status"] in report_jobs.UNFINISHED):
+            job = await _generate_export(filename) or job
+        if job and job["status"] in report_jobs.UNFINISHED:
+            job = await report_queue.wait(job["id"], EXPORT_WAIT_SECONDS)
+        if job and job["status"] in report_jobs.UNFINISHED:
+            return JSONResponse(
+                status_code=202,
+                content={"detail": "Report is still being generated", "job": ReportJob(**job).model_dump(mode="json")},
+                headers={"Retry-After": "5"}
+            )
+        if not filepath.exists():
+            if job and job["status"] == report_jobs.FAILED:
+                raise HTTPException(status_code=500, detail=f"Report generation failed: {job['error']}")
+            raise HTTPException(status_code=404, detail="Export file not found")
     
     # Determine content type based on file extension
     if filename.endswith('.pdf'):
@@ -1113,52 +1281,87 @@ async def download_export(filename: str):
     
     return FileResponse(filepath, filename=filename, media_type=media_type)
 
+async def _shed_numbers() -> List[str]:
+    """
+    Shed numbers that have batches, sorted
+    """
+    # Served from the shed_number index instead of reading every batch
+    sheds = await db.broiler_calculations.distinct("input_data.shed_number")
+    return sorted(shed for shed in sheds if isinstance(shed, str))
+
 @api_router.get("/sheds")
 async def get_sheds():
     """
     Get all shed numbers
     """
-    calculations = await db.broiler_calculations.find().to_list(1000)
-    sheds = []
-    
-    for calc in calculations:
-        # Check if the document has the expected structure
-        if isinstance(calc, dict) and "input_data" in calc and "shed_number" in calc["input_data"]:
-            sheds.append(calc["input_data"]["shed_number"])
-    
-    return sorted(list(set(sheds)))
+    async def render():
+        return serialization.dumps(await _shed_numbers())
+    return await _cached_json("shed_numbers", render)
 
 @api_router.delete("/batches/{batch_id}")
+@_changes_data
 async def delete_batch_by_id(batch_id: str):
     """
     Delete a batch by batch ID
     """
-    result = await db.broiler_calculations.delete_one({"input_data.batch_id": batch_id})
-    if result.deleted_count == 0:
+    async with handler_stats.transaction(client) as session:
+        deleted = await db.broiler_calculations.find_one_and_delete({"input_data.batch_id": batch_id}, session=session)
+        if deleted:
+            await handler_stats.record_removal(db, deleted, session=session)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Batch not found")
+    export_cache.forget(batch_id)
+    await _publish_batch_change("batch.deleted", batch_id, [deleted["input_data"]["handler_name"]])
     return {"message": "Batch deleted successfully"}
 
 @api_router.delete("/calculations/{calculation_id}")
+@_changes_data
 async def delete_calculation(calculation_id: str):
     """
     Delete a specific calculation
     """
-    result = await db.broiler_calculations.delete_one({"id": calculation_id})
-    if result.deleted_count == 0:
+    async with handler_stats.transaction(client) as session:
+        deleted = await db.broiler_calculations.find_one_and_delete({"id": calculation_id}, session=session)
+        if deleted:
+            await handler_stats.record_removal(db, deleted, session=session)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Calculation not found")
+    export_cache.forget(deleted["input_data"]["batch_id"])
+    await _publish_batch_change("batch.deleted", deleted["input_data"]["batch_id"], [deleted["input_data"]["handler_name"]])
     return {"message": "Calculation deleted successfully"}
 
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Request latencies, subsystem timings and cache and queue figures in
+    Prometheus text format
+    """
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Logs and counts callbacks that block the event loop (see loop_watchdog.py)
+loop_block_threshold = loop_watchdog.threshold_from_environment()
+watchdog = loop_watchdog.LoopWatchdog(loop_block_threshold) if loop_block_threshold else None
+if watchdog:
+    app.add_middleware(loop_watchdog.WatchdogMiddleware, watchdog=watchdog)
+
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware, store=profile_store)
+
+# Outermost, so request latency includes the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1166,6 +1369,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def prepare_handler_stats():
+    await handler_stats.ensure_indexes(db)
+    # First start after upgrading: build the rollup from the existing batches
+    if await db.handler_stats.estimated_document_count() == 0 and \
+            await db.broiler_calculations.estimated_document_count() > 0:
+        handlers = await handler_stats.rebuild(db)
+        logger.info(f"Built handler_stats rollup for {handlers} handlers")
+
+@app.on_event("startup")
+async def ensure_indexes():
+    await indexes.ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_report_jobs():
+    await report_queue.store.ensure_indexes()
+    await report_queue.start()
+
+@app.on_event("startup")
+async def start_watchdog():
+    if watchdog:
+        await watchdog.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if watchdog:
+        await watchdog.stop()
+    await report_queue.stop()
     client.close()
\ No newline at end of file
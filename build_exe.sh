@@ -76,6 +76,7 @@ a = Analysis(
         'pydantic',
         'sqlite3',
         'json',
+        'orjson',
         'pathlib',
         'reportlab',
         'reportlab.pdfgen',
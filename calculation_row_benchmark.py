@@ -0,0 +1,156 @@
+"""
+Memory and CPU cost of listing stored calculations as CalculationRow views versus
+the eager dicts the offline SQLiteDatabase built before.
+
+Seeds a copy of the bundled offline_backend/broiler_data.db (the shipped
+database is never modified) with batches shaped like real ones, then reads all
+of them with the same query both ways:
+
+- eager dict: the old conversion, a 20-key dict per row with input_data and
+  cost_breakdown parsed up front
+- CalculationRow: the row view database.py now returns
+
+Each is timed for a listing that reads only summary fields (batch, handler,
+shed, FCR, cost per kg) and for one that reads every field through items(), as
+documents.response_dict does when serving whole batches. Memory is what the
+10k results retain once built, measured with tracemalloc.
+
+Usage:
+    python calculation_row_benchmark.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from sqlite_pool_benchmark import OFFLINE_BACKEND, make_calculation
+from trusted_read_benchmark import make_input
+
+SUMMARY_FIELDS = ('feed_conversion_ratio', 'net_cost_per_kg')
+
+
+def make_full_calculation(index):
+    calculation = make_calculation(index)
+    calculation['input_data'] = make_input(index)
+    calculation['cost_breakdown'] = {
+        'chick_cost': 10000.0, 'pre_starter_feed_cost': 1200.0, 'starter_feed_cost': 4400.0,
+        'growth_feed_cost': 20000.0, 'final_feed_cost': 27000.0, 'total_feed_cost': 52600.0,
+        'total_cost': 62600.0, 'cost_per_chick': 3.13,
+    }
+    return calculation
+
+
+def eager_dict(row, serialization):
+    # What _row_to_calculation_dict returned
+    return {
+        'id': row['id'],
+        'input_data': serialization.loads(row['input_data']),
+        'feed_conversion_ratio': row['feed_conversion_ratio'],
+        'mortality_rate_percent': row['mortality_rate_percent'],
+        'weighted_average_age': row['weighted_average_age'],
+        'daily_weight_gain': row['daily_weight_gain'],
+        'total_cost': row['total_cost'],
+        'total_revenue': row['total_revenue'],
+        'net_cost_per_kg': row['net_cost_per_kg'],
+        'total_weight_produced_kg': row['total_weight_produced_kg'],
+        'total_feed_consumed_kg': row['total_feed_consumed_kg'],
+        'surviving_chicks': row['surviving_chicks'],
+        'removed_chicks': row['removed_chicks'],
+        'missing_chicks': row['missing_chicks'],
+        'viability': row['viability'],
+        'average_weight_per_chick': row['average_weight_per_chick'],
+        'cost_breakdown': serialization.loads(row['cost_breakdown']),
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+        'schema_version': row['schema_version']
+    }
+
+
+def eager_summary(calculation):
+    input_data = calculation['input_data']
+    return (input_data['batch_id'], input_data['handler_name'], input_data['shed_number'],
+            *(calculation[field] for field in SUMMARY_FIELDS))
+
+
+def lazy_summary(row):
+    return (row.batch_id, row.handler_name, row.shed_number, *(row[field] for field in SUMMARY_FIELDS))
+
+
+def timed(operation, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return size
+
+
+async def run(rows, repeat):
+    sys.path.insert(0, str(OFFLINE_BACKEND))
+    workdir = tempfile.mkdtemp(prefix="calculation_row_benchmark_")
+    os.chdir(workdir)  # database.py opens broiler_data.db in the working directory on import
+    try:
+        shutil.copy(OFFLINE_BACKEND / "broiler_data.db", "broiler_data.db")
+        import serialization
+        from database import CalculationRow, db
+
+        await asyncio.gather(*(db.insert_calculation(make_full_calculation(index)) for index in range(rows)))
+
+        def fetch(convert):
+            with db.get_connection() as conn:
+                return [convert(row) for row in conn.execute(
+                    'SELECT * FROM broiler_calculations ORDER BY created_at DESC LIMIT ?', (rows,))]
+
+        eager = lambda: fetch(lambda row: eager_dict(row, serialization))
+        lazy = lambda: fetch(CalculationRow)
+
+        results = {
+            'summary fields (ms)': (
+                timed(lambda: [eager_summary(calculation) for calculation in eager()], repeat),
+                timed(lambda: [lazy_summary(row) for row in lazy()], repeat),
+            ),
+            'every field (ms)': (
+                timed(lambda: [dict(calculation.items()) for calculation in eager()], repeat),
+                timed(lambda: [dict(row.items()) for row in lazy()], repeat),
+            ),
+            'retained by the list (MiB)': (
+                retained_bytes(eager) / 2**20,
+                retained_bytes(lazy) / 2**20,
+            ),
+        }
+
+        print(f"Listing {rows} stored calculations (median of {repeat})")
+        print(f"{'':28} {'eager dict':>12} {'CalculationRow':>15} {'ratio':>7}")
+        for name, (before, after) in results.items():
+            print(f"{name:28} {before:12.2f} {after:15.2f} {before / after:6.1f}x")
+        db.close()
+    finally:
+        os.chdir(Path(__file__).parent)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
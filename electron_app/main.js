@@ -11,6 +11,9 @@ let backendProcess;
 // Backend server configuration
 const BACKEND_PORT = 8001;
 const BACKEND_HOST = '127.0.0.1';
+// How often and how long to poll the backend for readiness on startup
+const BACKEND_POLL_INTERVAL_MS = 50;
+const BACKEND_START_TIMEOUT_MS = 30000;
 
 // Function to find available port
 function findAvailablePort(startPort) {
@@ -29,6 +32,35 @@ function findAvailablePort(startPort) {
   });
 }
 
+// Resolve once GET /api/ answers 200, polling until the timeout
+function waitForBackend(port) {
+  const http = require('http');
+  const deadline = Date.now() + BACKEND_START_TIMEOUT_MS;
+  
+  return new Promise((resolve, reject) => {
+    const poll = () => {
+      const retry = () => {
+        if (Date.now() > deadline) {
+          reject(new Error(`Backend did not respond within ${BACKEND_START_TIMEOUT_MS / 1000} seconds`));
+        } else {
+          setTimeout(poll, BACKEND_POLL_INTERVAL_MS);
+        }
+      };
+      const request = http.get({ host: BACKEND_HOST, port, path: '/api/', timeout: 1000 }, (response) => {
+        response.resume();
+        if (response.statusCode === 200) {
+          resolve();
+        } else {
+          retry();
+        }
+      });
+      request.on('timeout', () => request.destroy());
+      request.on('error', retry);
+    };
+    poll();
+  });
+}
+
 // Function to start Python backend
 async function startBackend() {
   try {
@@ -57,12 +89,13 @@ async function startBackend() {
     // Start Python server
     const pythonExecutable = isDev ? 'python' : 'python';
     
+    // --reload runs the app in a second, watched process: development only
     backendProcess = spawn(pythonExecutable, [
       '-m', 'uvicorn',
       'server:app',
       '--host', BACKEND_HOST,
       '--port', port.toString(),
-      '--reload' // Remove in production
+      ...(isDev ? ['--reload'] : [])
     ], {
       cwd: backendPath,
       stdio: ['pipe', 'pipe', 'pipe']
@@ -89,8 +122,8 @@ async function startBackend() {
       }
     });
     
-    // Wait for server to start
-    await new Promise(resolve => setTimeout(resolve, 3000));
+    // Wait until the server answers instead of a fixed delay
+    await waitForBackend(port);
     
     console.log('Backend started successfully');
     return port;
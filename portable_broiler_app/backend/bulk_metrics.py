@@ -0,0 +1,195 @@
+"""
+Vectorized broiler metrics for bulk imports.
+
+Kept apart from server.py so numpy is only imported by the first bulk import,
+not at startup.
+"""
+from datetime import datetime
+from operator import attrgetter
+from typing import List
+import sys
+
+import numpy as np
+
+import ids
+
+# Python 3.12+ sums floats with Neumaier compensation; the bulk path mirrors whichever
+# algorithm the builtin sum() uses so results stay identical to the scalar path
+_COMPENSATED_SUM = sys.version_info >= (3, 12)
+
+def _columns(items: list, attributes: tuple, dtype=np.float64) -> tuple:
+    """
+    Extract one array per (dotted) attribute from a list of models
+    """
+    values = np.array(list(map(attrgetter(*attributes), items)), dtype=dtype).reshape(len(items), len(attributes))
+    return tuple(values.T)
+
+def _sequential_row_sum(matrix: np.ndarray) -> np.ndarray:
+    """
+    Sum each row left to right exactly like the builtin sum() over a list of floats
+    """
+    total = np.zeros(matrix.shape[0])
+    compensation = np.zeros(matrix.shape[0])
+    for j in range(matrix.shape[1]):
+        value = matrix[:, j]
+        partial = total + value
+        if _COMPENSATED_SUM:
+            compensation += np.where(
+                np.abs(total) >= np.abs(value),
+                (total - partial) + value,
+                (value - partial) + total
+            )
+        total = partial
+    if _COMPENSATED_SUM:
+        total = np.where((compensation != 0) & np.isfinite(compensation), total + compensation, total)
+    return total
+
+def _round_column(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Round a column with the same result as the builtin round(value, ndigits)
+    """
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+    # Away from a tie the nearest integer is unambiguous; ties (and huge values) are
+    # handed to the builtin, which rounds the exact decimal value half-to-even
+    distance_to_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+    ambiguous = (distance_to_tie <= np.maximum(np.abs(scaled), 1.0) * 1e-12) | ~(np.abs(scaled) < 2.0 ** 52)
+    for i in np.flatnonzero(ambiguous):
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """
+    numerator / denominator where denominator > 0, otherwise 0
+    """
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0)
+
+def calculate(inputs: list, input_rows: List[dict]) -> List[dict]:
+    """
+    Calculation dicts for inputs whose dates are already parsed; input_rows are
+    the inputs dumped to dicts, used as each calculation's input_data
+    """
+    count = len(inputs)
+    
+    # Removal batches as zero-padded (batch x removal) matrices
+    lengths = np.fromiter((len(item.removal_batches) for item in inputs), dtype=np.int64, count=count)
+    width = int(lengths.max())
+    rows = np.repeat(np.arange(count), lengths)
+    cols = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    removals = [batch for item in inputs for batch in item.removal_batches]
+    quantities = np.zeros((count, width), dtype=np.int64)
+    weights = np.zeros((count, width))
+    ages = np.zeros((count, width), dtype=np.int64)
+    quantities[rows, cols], ages[rows, cols] = _columns(removals, ("quantity", "age_days"), np.int64)
+    weights[rows, cols] = _columns(removals, ("total_weight_kg",))[0]
+    
+    initial_chicks, chicks_died = _columns(inputs, ("initial_chicks", "chicks_died"), np.int64)
+    (
+        chick_cost_per_unit,
+        pre_starter_kg, pre_starter_cost_per_kg,
+        starter_kg, starter_cost_per_kg,
+        growth_kg, growth_cost_per_kg,
+        final_kg, final_cost_per_kg,
+        medicine_costs, miscellaneous_costs, cost_variations, sawdust_bedding_cost,
+        total_revenue
+    ) = _columns(inputs, (
+        "chick_cost_per_unit",
+        "pre_starter_feed.consumption_kg", "pre_starter_feed.cost_per_kg",
+        "starter_feed.consumption_kg", "starter_feed.cost_per_kg",
+        "growth_feed.consumption_kg", "growth_feed.cost_per_kg",
+        "final_feed.consumption_kg", "final_feed.cost_per_kg",
+        "medicine_costs", "miscellaneous_costs", "cost_variations", "sawdust_bedding_cost",
+        "chicken_bedding_sale_revenue"
+    ))
+    
+    # Basic calculations
+    surviving_chicks = initial_chicks - chicks_died
+    removed_chicks = quantities.sum(axis=1)
+    missing_chicks = np.maximum(0, surviving_chicks - removed_chicks)
+    
+    # Production metrics
+    total_weight_produced_kg = _sequential_row_sum(weights)
+    average_weight_per_chick = _safe_divide(total_weight_produced_kg, removed_chicks.astype(np.float64))
+    
+    # Feed calculations
+    total_feed_consumed_kg = pre_starter_kg + starter_kg + growth_kg + final_kg
+    feed_conversion_ratio = _safe_divide(total_feed_consumed_kg, total_weight_produced_kg)
+    
+    mortality_rate_percent = (chicks_died / initial_chicks) * 100
+    
+    # Weighted average age and daily weight gain
+    total_age_weight = (quantities * ages).sum(axis=1)
+    weighted_average_age = _safe_divide(total_age_weight.astype(np.float64), removed_chicks.astype(np.float64))
+    daily_weight_gain = _safe_divide(average_weight_per_chick, weighted_average_age)
+    
+    # Cost calculations
+    chick_cost = initial_chicks * chick_cost_per_unit
+    pre_starter_cost = pre_starter_kg * pre_starter_cost_per_kg
+    starter_cost = starter_kg * starter_cost_per_kg
+    growth_cost = growth_kg * growth_cost_per_kg
+    final_cost = final_kg * final_cost_per_kg
+    
+    total_cost = (
+        chick_cost + pre_starter_cost + starter_cost + growth_cost + final_cost +
+        medicine_costs + miscellaneous_costs + 
+        cost_variations + sawdust_bedding_cost
+    )
+    net_cost_per_kg = _safe_divide(total_cost - total_revenue, total_weight_produced_kg)
+    
+    def percent_of_total(cost: np.ndarray) -> list:
+        return _round_column(_safe_divide(cost, total_cost) * 100, 1).tolist()
+    
+    cost_columns = {
+        "chick_cost": chick_cost.tolist(),
+        "chick_cost_percent": percent_of_total(chick_cost),
+        "pre_starter_cost": pre_starter_cost.tolist(),
+        "pre_starter_cost_percent": percent_of_total(pre_starter_cost),
+        "starter_cost": starter_cost.tolist(),
+        "starter_cost_percent": percent_of_total(starter_cost),
+        "growth_cost": growth_cost.tolist(),
+        "growth_cost_percent": percent_of_total(growth_cost),
+        "final_cost": final_cost.tolist(),
+        "final_cost_percent": percent_of_total(final_cost),
+        "medicine_cost": medicine_costs.tolist(),
+        "medicine_cost_percent": percent_of_total(medicine_costs),
+        "miscellaneous_cost": miscellaneous_costs.tolist(),
+        "miscellaneous_cost_percent": percent_of_total(miscellaneous_costs),
+        "sawdust_bedding_cost": sawdust_bedding_cost.tolist(),
+        "sawdust_bedding_cost_percent": percent_of_total(sawdust_bedding_cost),
+        "cost_variations": cost_variations.tolist(),
+        "cost_variations_percent": percent_of_total(cost_variations),
+    }
+    
+    metric_columns = {
+        "feed_conversion_ratio": _round_column(feed_conversion_ratio, 2).tolist(),
+        "mortality_rate_percent": _round_column(mortality_rate_percent, 2).tolist(),
+        "weighted_average_age": _round_column(weighted_average_age, 1).tolist(),
+        "daily_weight_gain": _round_column(daily_weight_gain, 3).tolist(),
+        "total_cost": _round_column(total_cost, 2).tolist(),
+        "total_revenue": _round_column(total_revenue, 2).tolist(),
+        "net_cost_per_kg": _round_column(net_cost_per_kg, 3).tolist(),
+        "total_weight_produced_kg": _round_column(total_weight_produced_kg, 1).tolist(),
+        "total_feed_consumed_kg": _round_column(total_feed_consumed_kg, 1).tolist(),
+        "surviving_chicks": surviving_chicks.tolist(),
+        "removed_chicks": removed_chicks.tolist(),
+        "missing_chicks": missing_chicks.tolist(),
+        "viability": removed_chicks.tolist(),
+        "average_weight_per_chick": _round_column(average_weight_per_chick, 3).tolist(),
+    }
+    
+    # Rows are assembled as plain dicts shaped like BroilerCalculation.dict();
+    # building 10k pydantic models would cost more than the arithmetic itself
+    created_at = datetime.now()
+    calculations = []
+    metric_rows = zip(*metric_columns.values())
+    cost_rows = zip(*cost_columns.values())
+    for calculation_id, input_row, metrics, costs in zip(ids.new_ids(count), input_rows, metric_rows, cost_rows):
+        calculation = {"id": calculation_id, "input_data": input_row}
+        calculation.update(zip(metric_columns, metrics))
+        calculation["cost_breakdown"] = dict(zip(cost_columns, costs))
+        calculation["created_at"] = created_at
+        calculation["updated_at"] = None
+        calculations.append(calculation)
+    
+    return calculations
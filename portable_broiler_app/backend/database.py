@@ -1,15 +1,431 @@
 import sqlite3
-import json
-import uuid
-from datetime import datetime
+import asyncio
+import calendar
+import functools
+import logging
+import math
+import queue
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
 import os
 
+from documents import SCHEMA_VERSION as DOCUMENT_SCHEMA_VERSION
+import ids
+import metrics
+import serialization
+
+logger = logging.getLogger(__name__)
+
 # Database file path - will be relative to exe location
 DB_FILE = "broiler_data.db"
 
+# Prepared statements kept per pooled connection (sqlite3 default is 128)
+STATEMENT_CACHE_SIZE = 256
+
+# Threads serving concurrent reads; writes are serialized on a single writer thread
+READ_THREADS = 4
+
+# Most queued writes the writer thread commits in one transaction
+MAX_GROUP_COMMIT = 64
+
+# Journal mode and fsync policy by durability profile, chosen with the
+# BROILER_DB_DURABILITY environment variable:
+# - normal: WAL; commits are atomic, but the last ones may be lost on power failure
+# - full: WAL, fsync on every commit
+# - legacy: SQLite's defaults (rollback journal, fsync on every commit), for a
+#   database file on a network share, where WAL cannot work
+DURABILITY_SETTING = 'BROILER_DB_DURABILITY'
+DEFAULT_DURABILITY = 'normal'
+DURABILITY_PROFILES = {
+    'normal': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+    'full': {'journal_mode': 'WAL', 'synchronous': 'FULL'},
+    'legacy': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+}
+
+# Applied to every pooled connection, whatever the profile
+CONNECTION_PRAGMAS = {
+    'busy_timeout': 5000,  # ms to wait for another process's lock instead of "database is locked"
+    'cache_size': -16384,  # KiB of page cache per connection
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+# Bumped whenever init_database gains a migration step (stored in PRAGMA user_version)
+SCHEMA_VERSION = 7
+
+# Tables whose rows carry the documents.py schema_version marker
+DOCUMENT_TABLES = ('broiler_calculations', 'handlers', 'sheds')
+
+# input_data fields copied into their own indexed broiler_calculations columns
+INDEXED_INPUT_FIELDS = ('handler_name', 'shed_number', 'entry_date', 'exit_date')
+
+def _indexed_input_values(input_data):
+    """Column values for INDEXED_INPUT_FIELDS, matching their text in the input_data JSON"""
+    return tuple(
+        None if input_data.get(field) is None else str(input_data[field])
+        for field in INDEXED_INPUT_FIELDS
+    )
+
+# Cost components of a CostBreakdown; each is stored next to its share of the
+# batch's total cost, <component>_percent
+COST_COMPONENTS = ('chick_cost', 'pre_starter_cost', 'starter_cost', 'growth_cost', 'final_cost',
+                   'medicine_cost', 'miscellaneous_cost', 'sawdust_bedding_cost', 'cost_variations')
+
+# cost_breakdown fields copied into REAL broiler_calculations columns of the same name
+COST_BREAKDOWN_COLUMNS = tuple(column for component in COST_COMPONENTS
+                               for column in (component, f'{component}_percent'))
+
+def _cost_breakdown_values(cost_breakdown):
+    """Column values for COST_BREAKDOWN_COLUMNS"""
+    cost_breakdown = cost_breakdown or {}
+    return tuple(cost_breakdown.get(column) for column in COST_BREAKDOWN_COLUMNS)
+
+# Text date column -> INTEGER column holding it as epoch seconds. These are naive
+# wall-clock seconds, not UTC: the stored time is read as if it were UTC and any
+# offset is dropped, so '2024-01-01 00:00:00+02:00' and '2024-01-01T00:00:00Z'
+# both become 1704067200. Filter them with bounds built the same way.
+EPOCH_COLUMNS = {
+    'created_at': 'created_epoch',
+    'updated_at': 'updated_epoch',
+    'entry_date': 'entry_epoch',
+    'exit_date': 'exit_epoch',
+}
+
+# SQLite twin of _epoch_seconds, for backfilling the epoch columns
+_EPOCH_SQL = "CAST(strftime('%s', substr({column}, 1, 19)) AS INTEGER)"
+
+def _epoch_seconds(value):
+    """Naive epoch seconds of a date, datetime or ISO text, taken at its wall-clock time
+    
+    This is not a UTC conversion: any offset is dropped and the local time is counted
+    as if it were UTC, so day bounds match dates as they were entered, as the text
+    comparisons did before. The result only compares with other values made this way.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value[:19])
+        except ValueError:
+            return None
+    return calendar.timegm(value.timetuple())
+
+def _replace_removal_batches(cursor, calculation_id, removal_batches):
+    """Rewrite the removal_batches rows of a calculation, in the caller's transaction"""
+    cursor.execute('DELETE FROM removal_batches WHERE calculation_id = ?', (calculation_id,))
+    cursor.executemany('''
+        INSERT INTO removal_batches (calculation_id, position, quantity, total_weight_kg, age_days)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (calculation_id, position, batch.get('quantity'), batch.get('total_weight_kg'), batch.get('age_days'))
+        for position, batch in enumerate(removal_batches or ())
+    ])
+
+# Columns of a report_jobs row, in insert order
+REPORT_JOB_COLUMNS = ('id', 'kind', 'calculation_id', 'batch_id', 'filename', 'status',
+                      'attempts', 'error', 'created_at', 'updated_at')
+
+# handler_stats column -> broiler_calculations column it accumulates
+HANDLER_STATS_SUMS = {
+    'sum_fcr': 'feed_conversion_ratio',
+    'sum_mortality': 'mortality_rate_percent',
+    'sum_daily_gain': 'daily_weight_gain',
+    'sum_cost_per_kg': 'net_cost_per_kg',
+}
+
+def _handler_stats_delta_sql(row, sign, typed_columns):
+    """Statements applying one calculation row (NEW or OLD) to handler_stats
+    
+    With typed_columns the handler and chick count come from the row's own
+    columns; before schema version 6 they were read from its input_data JSON.
+    """
+    if typed_columns:
+        handler, chicks = f"{row}.handler_name", f"{row}.initial_chicks"
+    else:
+        handler = f"json_extract({row}.input_data, '$.handler_name')"
+        chicks = f"json_extract({row}.input_data, '$.initial_chicks')"
+    sums = ', '.join(f"{column} = {column} {sign} {row}.{source}" for column, source in HANDLER_STATS_SUMS.items())
+    statements = f'''
+        INSERT OR IGNORE INTO handler_stats (handler_name) VALUES ({handler});
+        UPDATE handler_stats SET total_batches = total_batches {sign} 1,
+            total_chicks = total_chicks {sign} {chicks},
+            {sums}
+        WHERE handler_name = {handler};
+    '''
+    if sign == '-':
+        statements += "DELETE FROM handler_stats WHERE handler_name = " + handler + " AND total_batches <= 0;"
+    return statements
+
+def _handler_stats_triggers_sql(typed_columns):
+    """The triggers keeping handler_stats in step with broiler_calculations"""
+    def delta(row, sign):
+        return _handler_stats_delta_sql(row, sign, typed_columns)
+    return f'''
+        CREATE TRIGGER IF NOT EXISTS handler_stats_insert AFTER INSERT ON broiler_calculations
+        BEGIN {delta('NEW', '+')} END;
+        CREATE TRIGGER IF NOT EXISTS handler_stats_update AFTER UPDATE ON broiler_calculations
+        BEGIN {delta('OLD', '-')} {delta('NEW', '+')} END;
+        CREATE TRIGGER IF NOT EXISTS handler_stats_delete AFTER DELETE ON broiler_calculations
+        BEGIN {delta('OLD', '-')} END;
+    '''
+
+# Columns broiler_calculations can be aggregated by (see get_performance_aggregates)
+AGGREGATE_GROUPS = ('handler_name', 'shed_number')
+
+# Aggregates per group, all over typed columns
+AGGREGATES_SQL = '''COUNT(*) AS total_batches,
+    AVG(feed_conversion_ratio) AS avg_fcr,
+    AVG(mortality_rate_percent) AS avg_mortality,
+    AVG(daily_weight_gain) AS avg_daily_gain,
+    AVG(net_cost_per_kg) AS avg_cost_per_kg,
+    SUM(initial_chicks) AS total_chicks,
+    SUM(total_weight_produced_kg) AS total_weight_kg,
+    SUM(total_cost) AS total_cost,
+    SUM(total_revenue) AS total_revenue'''
+
+# Indexed after the group column, so the aggregates are read from the index alone
+AGGREGATED_COLUMNS = ('feed_conversion_ratio', 'mortality_rate_percent', 'daily_weight_gain', 'net_cost_per_kg',
+                      'initial_chicks', 'total_weight_produced_kg', 'total_cost', 'total_revenue')
+
+def _dispatch_to(executor_attribute):
+    """Turn a blocking method into a coroutine that runs it on one of the database executors"""
+    def decorator(method):
+        labels = ('db', method.__name__)
+
+        @functools.wraps(method)
+        async def run(self, *args, **kwargs):
+            executor = getattr(self, executor_attribute)
+            # Timed from the event loop, so waiting for a free connection counts
+            start = time.perf_counter()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    executor, functools.partial(method, self, *args, **kwargs)
+                )
+            finally:
+                metrics.PHASE_SECONDS.observe(labels, time.perf_counter() - start)
+        return run
+    return decorator
+
+_reads = _dispatch_to('_read_executor')
+# Write methods run inside a transaction the writer commits (see GroupCommitExecutor);
+# they must not commit themselves
+_writes = _dispatch_to('_write_executor')
+
+class GroupCommitExecutor(Executor):
+    """Single writer thread committing queued writes in shared transactions
+    
+    Whatever was queued while the previous transaction committed is run in the
+    next one, up to max_group_size writes, so concurrent writers share a commit
+    (and its fsync) instead of waiting for one each. Every write runs inside its
+    own savepoint: one that raises is rolled back alone and gets its exception,
+    the others still commit. Results are delivered after the commit.
+    
+    If the transaction itself breaks (a savepoint that cannot be rolled back or
+    released, a failed commit, a lost connection) the whole group is rolled back
+    and every write in it fails; the writer thread carries on with the next group.
+    """
+    def __init__(self, get_connection, max_group_size=MAX_GROUP_COMMIT):
+        self._get_connection = get_connection
+        self.max_group_size = max_group_size
+        self._queue = queue.SimpleQueue()
+        self._shutdown = False
+        self._thread = threading.Thread(target=self._run, name='sqlite-write', daemon=True)
+        self._thread.start()
+    
+    def submit(self, fn, *args, **kwargs):
+        if self._shutdown:
+            raise RuntimeError('cannot schedule new writes after shutdown')
+        future = Future()
+        self._queue.put((future, functools.partial(fn, *args, **kwargs)))
+        return future
+    
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        if not self._shutdown:
+            self._shutdown = True
+            self._queue.put(None)
+        if wait:
+            self._thread.join()
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            group = [item]
+            while len(group) < self.max_group_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # stop after this group
+                    break
+                group.append(item)
+            group = [(future, write) for future, write in group if future.set_running_or_notify_cancel()]
+            try:
+                self._commit_group(group)
+            except BaseException as exc:
+                # Never let one group end the only writer thread
+                logger.exception('Write group failed')
+                for future, _ in group:
+                    if not future.done():
+                        future.set_exception(exc)
+    
+    def _commit_group(self, group):
+        outcomes = []
+        conn = None
+        try:
+            with self._get_connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                for future, write in group:
+                    conn.execute('SAVEPOINT write')
+                    try:
+                        result = write()
+                    except BaseException as exc:
+                        outcomes.append((future, None, exc))
+                        conn.execute('ROLLBACK TO write')
+                        conn.execute('RELEASE write')
+                    else:
+                        outcomes.append((future, result, None))
+                        conn.execute('RELEASE write')
+                conn.commit()
+        except BaseException as exc:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except BaseException:
+                    logger.exception('Could not roll back a failed write group')
+            # Nothing was saved, including the writes that succeeded; each failed write
+            # keeps its own error, the rest get the one that broke the transaction
+            errors = {id(future): error for future, _, error in outcomes}
+            outcomes = [(future, None, errors.get(id(future)) or exc) for future, _ in group]
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+class DuplicateBatchError(Exception):
+    """A calculation was inserted with a batch_id that is already saved"""
+    def __init__(self, batch_id):
+        super().__init__(f"Batch ID '{batch_id}' already exists")
+        self.batch_id = batch_id
+
+def _register_handler(cursor, name, now):
+    """Add a handlers row for name unless one exists, in the caller's transaction"""
+    cursor.execute('''
+        INSERT INTO handlers (id, name, created_at, updated_at, schema_version) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(name) DO NOTHING
+    ''', (ids.new_id(), name, now, now, DOCUMENT_SCHEMA_VERSION))
+
+# Keys of a calculation document, in the order BroilerCalculation.dict() has them
+CALCULATION_FIELDS = (
+    'id', 'input_data', 'feed_conversion_ratio', 'mortality_rate_percent', 'weighted_average_age',
+    'daily_weight_gain', 'total_cost', 'total_revenue', 'net_cost_per_kg', 'total_weight_produced_kg',
+    'total_feed_consumed_kg', 'surviving_chicks', 'removed_chicks', 'missing_chicks', 'viability',
+    'average_weight_per_chick', 'cost_breakdown', 'created_at', 'updated_at', 'schema_version',
+)
+_CALCULATION_FIELD_SET = frozenset(CALCULATION_FIELDS)
+_UNPARSED = object()
+
+def _column(name):
+    return property(lambda self: self._row[name], doc=f"The {name} column")
+
+class CalculationRow(Mapping):
+    """Read-only calculation document over a broiler_calculations row
+    
+    Reads like the dict rows used to be converted to, without building it: typed
+    columns come straight from the row, and the input_data and cost_breakdown JSON is
+    only parsed when first accessed. The table's other columns (batch_id,
+    handler_name, shed_number, ...) are attributes too, so callers needing just
+    those never parse JSON. dict(row) makes a mutable copy.
+    """
+    __slots__ = ('_row', '_input_data', '_cost_breakdown')
+    
+    def __init__(self, row):
+        self._row = row
+        self._input_data = _UNPARSED
+        self._cost_breakdown = _UNPARSED
+    
+    @property
+    def input_data(self):
+        if self._input_data is _UNPARSED:
+            self._input_data = serialization.loads(self._row['input_data'])
+        return self._input_data
+    
+    @property
+    def cost_breakdown(self):
+        if self._cost_breakdown is _UNPARSED:
+            self._cost_breakdown = serialization.loads(self._row['cost_breakdown'])
+        return self._cost_breakdown
+    
+    id = _column('id')
+    batch_id = _column('batch_id')
+    handler_name = _column('handler_name')
+    shed_number = _column('shed_number')
+    entry_date = _column('entry_date')
+    exit_date = _column('exit_date')
+    initial_chicks = _column('initial_chicks')
+    feed_conversion_ratio = _column('feed_conversion_ratio')
+    mortality_rate_percent = _column('mortality_rate_percent')
+    weighted_average_age = _column('weighted_average_age')
+    daily_weight_gain = _column('daily_weight_gain')
+    total_cost = _column('total_cost')
+    total_revenue = _column('total_revenue')
+    net_cost_per_kg = _column('net_cost_per_kg')
+    total_weight_produced_kg = _column('total_weight_produced_kg')
+    total_feed_consumed_kg = _column('total_feed_consumed_kg')
+    surviving_chicks = _column('surviving_chicks')
+    removed_chicks = _column('removed_chicks')
+    missing_chicks = _column('missing_chicks')
+    viability = _column('viability')
+    average_weight_per_chick = _column('average_weight_per_chick')
+    created_at = _column('created_at')
+    updated_at = _column('updated_at')
+    schema_version = _column('schema_version')
+    
+    def __getitem__(self, key):
+        if key == 'input_data':
+            return self.input_data
+        if key == 'cost_breakdown':
+            return self.cost_breakdown
+        if key in _CALCULATION_FIELD_SET:
+            return self._row[key]
+        raise KeyError(key)
+    
+    def __contains__(self, key):
+        return key in _CALCULATION_FIELD_SET
+    
+    # Whole documents are read through items() (documents.response_dict); one pass
+    # over the row costs far less than a __getitem__ call per key
+    def items(self):
+        return self._document().items()
+    
+    def values(self):
+        return self._document().values()
+    
+    def _document(self):
+        row = self._row
+        document = {key: row[key] for key in CALCULATION_FIELDS}
+        document['input_data'] = self.input_data
+        document['cost_breakdown'] = self.cost_breakdown
+        return document
+    
+    def __iter__(self):
+        return iter(CALCULATION_FIELDS)
+    
+    def __len__(self):
+        return len(CALCULATION_FIELDS)
+    
+    def __repr__(self):
+        return f"CalculationRow(id={self.id!r}, batch_id={self.batch_id!r})"
+
 class SQLiteDatabase:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, durability=None, max_group_commit=MAX_GROUP_COMMIT):
         if db_path is None:
             # Use current directory or executable directory
             if hasattr(os, '_MEIPASS'):
@@ -22,11 +438,35 @@ class SQLiteDatabase:
         else:
             self.db_path = db_path
         
+        durability = durability or os.environ.get(DURABILITY_SETTING, DEFAULT_DURABILITY)
+        if durability not in DURABILITY_PROFILES:
+            raise ValueError(f"Unknown durability profile '{durability}', expected one of {', '.join(DURABILITY_PROFILES)}")
+        self.durability = durability
+        
+        # One long-lived connection per thread, tracked so close() can release them all
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        
+        # Connection that only reads PRAGMA data_version; see data_version()
+        self._version_connection = None
+        self._version_generation = 0
+        self._version_lock = threading.Lock()
+        
+        # Keep blocking sqlite3 calls off the event loop
+        self._read_executor = ThreadPoolExecutor(max_workers=READ_THREADS, thread_name_prefix='sqlite-read')
+        self._write_executor = GroupCommitExecutor(self.get_connection, max_group_commit)
+        
         self.init_database()
+        self._set_journal_mode()
     
     def init_database(self):
         """Initialize the SQLite database with required tables"""
         conn = sqlite3.connect(self.db_path)
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            # Already current: skip the DDL, which would still open a write transaction
+            conn.close()
+            return
         cursor = conn.cursor()
         
         # Create broiler_calculations table
@@ -89,431 +529,895 @@ class SQLiteDatabase:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_created_at ON broiler_calculations(created_at)')
         
         conn.commit()
+        
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < 1:
+            self._migrate_handler_stats(conn)
+        if version < 2:
+            self._migrate_indexed_columns(conn)
+        if version < 3:
+            self._migrate_report_jobs(conn)
+        if version < 4:
+            self._migrate_keyset_indexes(conn)
+        if version < 5:
+            self._migrate_document_versions(conn)
+        if version < 6:
+            self._migrate_typed_aggregates(conn)
+        if version < 7:
+            self._migrate_typed_storage(conn)
+        if version < SCHEMA_VERSION:
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.commit()
         conn.close()
     
-    def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable dict-like access
-        return conn
+    def _migrate_handler_stats(self, conn):
+        """Create the handler_stats rollup, the triggers that maintain it and backfill it
+        
+        The triggers run inside the statement that changes broiler_calculations, so the
+        rollup commits or rolls back together with the batch itself.
+        """
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS handler_stats (
+                handler_name TEXT PRIMARY KEY,
+                total_batches INTEGER NOT NULL DEFAULT 0,
+                sum_fcr REAL NOT NULL DEFAULT 0,
+                sum_mortality REAL NOT NULL DEFAULT 0,
+                sum_daily_gain REAL NOT NULL DEFAULT 0,
+                sum_cost_per_kg REAL NOT NULL DEFAULT 0,
+                total_chicks INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        # Migration 6 moves the triggers to typed columns, which do not exist yet here
+        conn.executescript(_handler_stats_triggers_sql(typed_columns=False))
+        self._rebuild_handler_stats(conn, typed_columns=False)
+        conn.commit()
     
-    # Broiler Calculations Operations
-    async def insert_calculation(self, calculation_data):
-        """Insert a new calculation"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def _migrate_indexed_columns(self, conn):
+        """Copy the filtered input_data fields into indexed columns, backfilling existing rows"""
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(broiler_calculations)')}
+        for field in INDEXED_INPUT_FIELDS:
+            if field not in existing:
+                conn.execute(f'ALTER TABLE broiler_calculations ADD COLUMN {field} TEXT')
+        conn.execute('''
+            UPDATE broiler_calculations SET
+                handler_name = json_extract(input_data, '$.handler_name'),
+                shed_number = json_extract(input_data, '$.shed_number'),
+                entry_date = json_extract(input_data, '$.entry_date'),
+                exit_date = json_extract(input_data, '$.exit_date')
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_handler ON broiler_calculations(handler_name, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_shed ON broiler_calculations(shed_number)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_entry_date ON broiler_calculations(entry_date)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_exit_date ON broiler_calculations(exit_date)')
+        conn.commit()
+    
+    def _migrate_report_jobs(self, conn):
+        """Create the table backing the background PDF report jobs"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS report_jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                calculation_id TEXT NOT NULL,
+                batch_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at TEXT,
+                updated_at TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_report_jobs_filename ON report_jobs(filename, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_report_jobs_status ON report_jobs(status)')
+        conn.commit()
+    
+    def _migrate_keyset_indexes(self, conn):
+        """Index (created_at, id), alone and after shed/handler, for paging calculation summaries"""
+        conn.execute('DROP INDEX IF EXISTS idx_calculations_handler')
+        conn.execute('DROP INDEX IF EXISTS idx_calculations_shed')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_recent ON broiler_calculations(created_at, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_handler ON broiler_calculations(handler_name, created_at, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_shed ON broiler_calculations(shed_number, created_at, id)')
+        conn.commit()
+    
+    def _migrate_document_versions(self, conn):
+        """Add the schema_version column marking rows written by the current models
         
-        # Generate ID if not provided
-        if 'id' not in calculation_data:
-            calculation_data['id'] = str(uuid.uuid4())
+        Existing rows keep NULL, so the server keeps validating them (see documents.py).
+        """
+        for table in DOCUMENT_TABLES:
+            existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if 'schema_version' not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN schema_version INTEGER')
+        conn.commit()
+    
+    def _migrate_typed_aggregates(self, conn):
+        """Add a typed initial_chicks column and covering indexes for per-handler and
+        per-shed aggregates, and switch the handler_stats triggers to typed columns
         
-        # Serialize complex fields
-        input_data_json = json.dumps(calculation_data['input_data'], default=str)
-        cost_breakdown_json = json.dumps(calculation_data['cost_breakdown'], default=str)
+        Nothing has to parse input_data JSON to aggregate batches after this.
+        """
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(broiler_calculations)')}
+        for name in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS handler_stats_{name}')
+        if 'initial_chicks' not in existing:
+            conn.execute('ALTER TABLE broiler_calculations ADD COLUMN initial_chicks INTEGER')
+        conn.execute("UPDATE broiler_calculations SET initial_chicks = json_extract(input_data, '$.initial_chicks')")
+        for group in AGGREGATE_GROUPS:
+            conn.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_calculations_{group}_aggregates
+                ON broiler_calculations({group}, {', '.join(AGGREGATED_COLUMNS)})
+            ''')
+        conn.executescript(_handler_stats_triggers_sql(typed_columns=True))
+        conn.commit()
+    
+    def _migrate_typed_storage(self, conn):
+        """Store cost components and percentages as REAL columns, dates as indexed epoch
+        seconds and removal batches as removal_batches rows, backfilling existing batches
         
-        # Current timestamp
-        now = datetime.now().isoformat()
-        calculation_data['created_at'] = now
-        calculation_data['updated_at'] = now
+        input_data and cost_breakdown stay the documents served; these are their
+        queryable copies, written alongside them.
+        """
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(broiler_calculations)')}
+        for column in COST_BREAKDOWN_COLUMNS:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE broiler_calculations ADD COLUMN {column} REAL')
+        for column in EPOCH_COLUMNS.values():
+            if column not in existing:
+                conn.execute(f'ALTER TABLE broiler_calculations ADD COLUMN {column} INTEGER')
         
-        cursor.execute('''
-            INSERT INTO broiler_calculations (
-                id, batch_id, input_data, feed_conversion_ratio, mortality_rate_percent,
-                weighted_average_age, daily_weight_gain, total_cost, total_revenue,
-                net_cost_per_kg, total_weight_produced_kg, total_feed_consumed_kg,
-                surviving_chicks, removed_chicks, missing_chicks, viability,
-                average_weight_per_chick, cost_breakdown, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            calculation_data['id'], calculation_data['input_data']['batch_id'],
-            input_data_json, calculation_data['feed_conversion_ratio'],
-            calculation_data['mortality_rate_percent'], calculation_data['weighted_average_age'],
-            calculation_data['daily_weight_gain'], calculation_data['total_cost'],
-            calculation_data['total_revenue'], calculation_data['net_cost_per_kg'],
-            calculation_data['total_weight_produced_kg'], calculation_data['total_feed_consumed_kg'],
-            calculation_data['surviving_chicks'], calculation_data['removed_chicks'],
-            calculation_data['missing_chicks'], calculation_data['viability'],
-            calculation_data['average_weight_per_chick'], cost_breakdown_json,
-            calculation_data['created_at'], calculation_data['updated_at']
-        ))
+        # The backfill changes no column handler_stats reads; keep its triggers out of it
+        for name in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS handler_stats_{name}')
+        costs = ', '.join(f"{column} = json_extract(cost_breakdown, '$.{column}')" for column in COST_BREAKDOWN_COLUMNS)
+        epochs = ', '.join(f'{epoch} = {_EPOCH_SQL.format(column=text)}' for text, epoch in EPOCH_COLUMNS.items())
+        conn.execute(f'UPDATE broiler_calculations SET {costs}, {epochs}')
+        conn.executescript(_handler_stats_triggers_sql(typed_columns=True))
         
+        conn.execute('DROP INDEX IF EXISTS idx_calculations_entry_date')
+        conn.execute('DROP INDEX IF EXISTS idx_calculations_exit_date')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_entry_epoch ON broiler_calculations(entry_epoch)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_exit_epoch ON broiler_calculations(exit_epoch)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_calculations_created_epoch ON broiler_calculations(created_epoch)')
+        
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS removal_batches (
+                calculation_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                quantity INTEGER,
+                total_weight_kg REAL,
+                age_days INTEGER,
+                PRIMARY KEY (calculation_id, position)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS removal_batches_delete AFTER DELETE ON broiler_calculations
+            BEGIN DELETE FROM removal_batches WHERE calculation_id = OLD.id; END
+        ''')
+        conn.execute('DELETE FROM removal_batches')
+        conn.execute('''
+            INSERT INTO removal_batches (calculation_id, position, quantity, total_weight_kg, age_days)
+            SELECT c.id, r.key, json_extract(r.value, '$.quantity'),
+                   json_extract(r.value, '$.total_weight_kg'), json_extract(r.value, '$.age_days')
+            FROM broiler_calculations c, json_each(c.input_data, '$.removal_batches') r
+        ''')
         conn.commit()
-        conn.close()
+    
+    def _set_journal_mode(self):
+        """Switch the database file to the durability profile's journal mode
+        
+        The journal mode is stored in the file, so it is set once at startup,
+        before any pooled connection is open.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(f"PRAGMA journal_mode = {DURABILITY_PROFILES[self.durability]['journal_mode']}")
+        finally:
+            conn.close()
+    
+    def _connect(self):
+        # check_same_thread=False only so close() can release connections opened by other threads
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row  # Enable dict-like access
+        conn.execute(f"PRAGMA synchronous = {DURABILITY_PROFILES[self.durability]['synchronous']}")
+        for pragma, value in CONNECTION_PRAGMAS.items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+    
+    @contextmanager
+    def get_connection(self):
+        """Borrow this thread's pooled connection
+        
+        The connection stays open between calls so its schema and prepared
+        statements are reused. Write transactions belong to the writer thread
+        (GroupCommitExecutor), which commits or rolls them back.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._connections_lock:
+                self._connections.append(conn)
+        yield conn
+    
+    # Broiler Calculations Operations
+    @_writes
+    def insert_calculation(self, calculation_data):
+        """Insert a new calculation and register its handler if new
+        
+        The UNIQUE batch_id column rejects a batch that is already saved, raising
+        DuplicateBatchError.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Generate ID if not provided
+            if 'id' not in calculation_data:
+                calculation_data['id'] = ids.new_id()
+            
+            # Serialize complex fields
+            input_data_json = serialization.dumps_text(calculation_data['input_data'])
+            cost_breakdown_json = serialization.dumps_text(calculation_data['cost_breakdown'])
+            
+            # Current timestamp
+            now = datetime.now().isoformat()
+            calculation_data['created_at'] = now
+            calculation_data['updated_at'] = now
+            
+            input_data = calculation_data['input_data']
+            try:
+                cursor.execute(f'''
+                    INSERT INTO broiler_calculations (
+                        id, batch_id, input_data, feed_conversion_ratio, mortality_rate_percent,
+                        weighted_average_age, daily_weight_gain, total_cost, total_revenue,
+                        net_cost_per_kg, total_weight_produced_kg, total_feed_consumed_kg,
+                        surviving_chicks, removed_chicks, missing_chicks, viability,
+                        average_weight_per_chick, cost_breakdown, created_at, updated_at,
+                        handler_name, shed_number, entry_date, exit_date, initial_chicks, schema_version,
+                        created_epoch, updated_epoch, entry_epoch, exit_epoch, {', '.join(COST_BREAKDOWN_COLUMNS)}
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                              ?, ?, ?, ?, {', '.join('?' for _ in COST_BREAKDOWN_COLUMNS)})
+                ''', (
+                    calculation_data['id'], calculation_data['input_data']['batch_id'],
+                    input_data_json, calculation_data['feed_conversion_ratio'],
+                    calculation_data['mortality_rate_percent'], calculation_data['weighted_average_age'],
+                    calculation_data['daily_weight_gain'], calculation_data['total_cost'],
+                    calculation_data['total_revenue'], calculation_data['net_cost_per_kg'],
+                    calculation_data['total_weight_produced_kg'], calculation_data['total_feed_consumed_kg'],
+                    calculation_data['surviving_chicks'], calculation_data['removed_chicks'],
+                    calculation_data['missing_chicks'], calculation_data['viability'],
+                    calculation_data['average_weight_per_chick'], cost_breakdown_json,
+                    calculation_data['created_at'], calculation_data['updated_at'],
+                    *_indexed_input_values(input_data),
+                    input_data.get('initial_chicks'), DOCUMENT_SCHEMA_VERSION,
+                    _epoch_seconds(now), _epoch_seconds(now),
+                    _epoch_seconds(input_data.get('entry_date')), _epoch_seconds(input_data.get('exit_date')),
+                    *_cost_breakdown_values(calculation_data['cost_breakdown'])
+                ))
+            except sqlite3.IntegrityError as e:
+                if 'broiler_calculations.batch_id' in str(e):
+                    raise DuplicateBatchError(input_data['batch_id']) from e
+                raise
+            _replace_removal_batches(cursor, calculation_data['id'], input_data.get('removal_batches'))
+            _register_handler(cursor, calculation_data['input_data']['handler_name'], now)
         return calculation_data['id']
     
-    async def find_calculation_by_batch_id(self, batch_id):
+    @_reads
+    def find_calculation_by_batch_id(self, batch_id):
         """Find calculation by batch ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM broiler_calculations WHERE batch_id = ?', (batch_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM broiler_calculations WHERE batch_id = ?', (batch_id,))
+            row = cursor.fetchone()
         
         if row:
-            return self._row_to_calculation_dict(row)
+            return CalculationRow(row)
         return None
     
-    async def find_calculation_by_id(self, calc_id):
+    @_reads
+    def find_calculation_by_id(self, calc_id):
         """Find calculation by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM broiler_calculations WHERE id = ?', (calc_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM broiler_calculations WHERE id = ?', (calc_id,))
+            row = cursor.fetchone()
         
         if row:
-            return self._row_to_calculation_dict(row)
+            return CalculationRow(row)
         return None
     
-    async def get_all_calculations(self, limit=50):
+    @_reads
+    def get_all_calculations(self, limit=50):
         """Get all calculations with limit"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT * FROM broiler_calculations ORDER BY created_at DESC LIMIT ?', 
-            (limit,)
-        )
-        rows = cursor.fetchall()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'SELECT * FROM broiler_calculations ORDER BY created_at DESC LIMIT ?', 
+                (limit,)
+            )
+            rows = cursor.fetchall()
         
-        return [self._row_to_calculation_dict(row) for row in rows]
+        return [CalculationRow(row) for row in rows]
     
-    async def update_calculation(self, batch_id, calculation_data):
-        """Update existing calculation"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    @_reads
+    def get_calculation_summaries(self, limit=50, after=None, shed_number=None, handler_name=None,
+                                  entry_from=None, entry_to=None, exit_from=None, exit_to=None):
+        """Get calculation summary fields, newest first
         
-        # Serialize complex fields
-        input_data_json = json.dumps(calculation_data['input_data'], default=str)
-        cost_breakdown_json = json.dumps(calculation_data['cost_breakdown'], default=str)
+        Pages are keyed on (created_at, id): after is the pair from the last row of the
+        previous page, so every page is an index seek. Date bounds are inclusive days.
+        """
+        conditions = []
+        params = []
+        if shed_number:
+            conditions.append('shed_number = ?')
+            params.append(shed_number)
+        if handler_name:
+            conditions.append('handler_name = ?')
+            params.append(handler_name)
+        for column, start, end in (('entry_epoch', entry_from, entry_to), ('exit_epoch', exit_from, exit_to)):
+            if start:
+                conditions.append(f'{column} >= ?')
+                params.append(_epoch_seconds(start))
+            if end:
+                conditions.append(f'{column} < ?')
+                params.append(_epoch_seconds(end + timedelta(days=1)))
+        if after:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
         
-        # Update timestamp
-        calculation_data['updated_at'] = datetime.now().isoformat()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT id, created_at, batch_id, shed_number, handler_name,
+                       initial_chicks, feed_conversion_ratio, mortality_rate_percent, net_cost_per_kg
+                FROM broiler_calculations {where}
+                ORDER BY created_at DESC, id DESC LIMIT ?
+            ''', (*params, limit))
+            rows = cursor.fetchall()
         
-        cursor.execute('''
-            UPDATE broiler_calculations SET
-                input_data = ?, feed_conversion_ratio = ?, mortality_rate_percent = ?,
-                weighted_average_age = ?, daily_weight_gain = ?, total_cost = ?,
-                total_revenue = ?, net_cost_per_kg = ?, total_weight_produced_kg = ?,
-                total_feed_consumed_kg = ?, surviving_chicks = ?, removed_chicks = ?,
-                missing_chicks = ?, viability = ?, average_weight_per_chick = ?,
-                cost_breakdown = ?, updated_at = ?
-            WHERE batch_id = ?
-        ''', (
-            input_data_json, calculation_data['feed_conversion_ratio'],
-            calculation_data['mortality_rate_percent'], calculation_data['weighted_average_age'],
-            calculation_data['daily_weight_gain'], calculation_data['total_cost'],
-            calculation_data['total_revenue'], calculation_data['net_cost_per_kg'],
-            calculation_data['total_weight_produced_kg'], calculation_data['total_feed_consumed_kg'],
-            calculation_data['surviving_chicks'], calculation_data['removed_chicks'],
-            calculation_data['missing_chicks'], calculation_data['viability'],
-            calculation_data['average_weight_per_chick'], cost_breakdown_json,
-            calculation_data['updated_at'], batch_id
-        ))
-        
-        conn.commit()
-        conn.close()
-        return cursor.rowcount > 0
+        return [dict(row) for row in rows]
     
-    async def delete_calculation_by_batch_id(self, batch_id):
+    @_writes
+    def update_calculation(self, batch_id, calculation_data):
+        """Update existing calculation, registering its handler if new"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Serialize complex fields
+            input_data_json = serialization.dumps_text(calculation_data['input_data'])
+            cost_breakdown_json = serialization.dumps_text(calculation_data['cost_breakdown'])
+            
+            # Update timestamp
+            calculation_data['updated_at'] = datetime.now().isoformat()
+            
+            input_data = calculation_data['input_data']
+            cursor.execute(f'''
+                UPDATE broiler_calculations SET
+                    input_data = ?, feed_conversion_ratio = ?, mortality_rate_percent = ?,
+                    weighted_average_age = ?, daily_weight_gain = ?, total_cost = ?,
+                    total_revenue = ?, net_cost_per_kg = ?, total_weight_produced_kg = ?,
+                    total_feed_consumed_kg = ?, surviving_chicks = ?, removed_chicks = ?,
+                    missing_chicks = ?, viability = ?, average_weight_per_chick = ?,
+                    cost_breakdown = ?, updated_at = ?,
+                    handler_name = ?, shed_number = ?, entry_date = ?, exit_date = ?, initial_chicks = ?,
+                    schema_version = ?, updated_epoch = ?, entry_epoch = ?, exit_epoch = ?,
+                    {', '.join(f'{column} = ?' for column in COST_BREAKDOWN_COLUMNS)}
+                WHERE batch_id = ?
+            ''', (
+                input_data_json, calculation_data['feed_conversion_ratio'],
+                calculation_data['mortality_rate_percent'], calculation_data['weighted_average_age'],
+                calculation_data['daily_weight_gain'], calculation_data['total_cost'],
+                calculation_data['total_revenue'], calculation_data['net_cost_per_kg'],
+                calculation_data['total_weight_produced_kg'], calculation_data['total_feed_consumed_kg'],
+                calculation_data['surviving_chicks'], calculation_data['removed_chicks'],
+                calculation_data['missing_chicks'], calculation_data['viability'],
+                calculation_data['average_weight_per_chick'], cost_breakdown_json,
+                calculation_data['updated_at'],
+                *_indexed_input_values(input_data),
+                input_data.get('initial_chicks'), DOCUMENT_SCHEMA_VERSION,
+                _epoch_seconds(calculation_data['updated_at']),
+                _epoch_seconds(input_data.get('entry_date')), _epoch_seconds(input_data.get('exit_date')),
+                *_cost_breakdown_values(calculation_data['cost_breakdown']), batch_id
+            ))
+            updated = cursor.rowcount > 0
+            if updated:
+                calc_id = cursor.execute('SELECT id FROM broiler_calculations WHERE batch_id = ?',
+                                         (batch_id,)).fetchone()[0]
+                _replace_removal_batches(cursor, calc_id, input_data.get('removal_batches'))
+                _register_handler(cursor, calculation_data['input_data']['handler_name'],
+                                  calculation_data['updated_at'])
+        return updated
+    
+    @_writes
+    def delete_calculation_by_batch_id(self, batch_id):
         """Delete calculation by batch ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM broiler_calculations WHERE batch_id = ?', (batch_id,))
-        deleted_count = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM broiler_calculations WHERE batch_id = ?', (batch_id,))
+            deleted_count = cursor.rowcount
         return deleted_count > 0
     
-    async def delete_calculation_by_id(self, calc_id):
+    @_writes
+    def delete_calculation_by_id(self, calc_id):
         """Delete calculation by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM broiler_calculations WHERE id = ?', (calc_id,))
-        deleted_count = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM broiler_calculations WHERE id = ?', (calc_id,))
+            deleted_count = cursor.rowcount
         return deleted_count > 0
     
-    def _row_to_calculation_dict(self, row):
-        """Convert SQLite row to calculation dictionary"""
-        return {
-            'id': row['id'],
-            'input_data': json.loads(row['input_data']),
-            'feed_conversion_ratio': row['feed_conversion_ratio'],
-            'mortality_rate_percent': row['mortality_rate_percent'],
-            'weighted_average_age': row['weighted_average_age'],
-            'daily_weight_gain': row['daily_weight_gain'],
-            'total_cost': row['total_cost'],
-            'total_revenue': row['total_revenue'],
-            'net_cost_per_kg': row['net_cost_per_kg'],
-            'total_weight_produced_kg': row['total_weight_produced_kg'],
-            'total_feed_consumed_kg': row['total_feed_consumed_kg'],
-            'surviving_chicks': row['surviving_chicks'],
-            'removed_chicks': row['removed_chicks'],
-            'missing_chicks': row['missing_chicks'],
-            'viability': row['viability'],
-            'average_weight_per_chick': row['average_weight_per_chick'],
-            'cost_breakdown': json.loads(row['cost_breakdown']),
-            'created_at': row['created_at'],
-            'updated_at': row['updated_at']
-        }
-    
     # Handler Operations
-    async def insert_handler(self, handler_data):
+    @_writes
+    def insert_handler(self, handler_data):
         """Insert a new handler"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if 'id' not in handler_data:
-            handler_data['id'] = str(uuid.uuid4())
-        
-        now = datetime.now().isoformat()
-        handler_data['created_at'] = now
-        handler_data['updated_at'] = now
-        
-        cursor.execute('''
-            INSERT INTO handlers (id, name, email, phone, notes, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            handler_data['id'], handler_data['name'], handler_data.get('email'),
-            handler_data.get('phone'), handler_data.get('notes'),
-            handler_data['created_at'], handler_data['updated_at']
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            if 'id' not in handler_data:
+                handler_data['id'] = ids.new_id()
+            
+            now = datetime.now().isoformat()
+            handler_data['created_at'] = now
+            handler_data['updated_at'] = now
+            
+            cursor.execute('''
+                INSERT INTO handlers (id, name, email, phone, notes, created_at, updated_at, schema_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                handler_data['id'], handler_data['name'], handler_data.get('email'),
+                handler_data.get('phone'), handler_data.get('notes'),
+                handler_data['created_at'], handler_data['updated_at'], DOCUMENT_SCHEMA_VERSION
+            ))
         return handler_data['id']
     
-    async def find_handler_by_name(self, name):
+    @_reads
+    def find_handler_by_name(self, name):
         """Find handler by name"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM handlers WHERE name = ?', (name,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM handlers WHERE name = ?', (name,))
+            row = cursor.fetchone()
         
         if row:
             return dict(row)
         return None
     
-    async def find_handler_by_id(self, handler_id):
+    @_reads
+    def find_handler_by_id(self, handler_id):
         """Find handler by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM handlers WHERE id = ?', (handler_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM handlers WHERE id = ?', (handler_id,))
+            row = cursor.fetchone()
         
         if row:
             return dict(row)
         return None
     
-    async def get_all_handlers(self):
+    @_reads
+    def get_all_handlers(self):
         """Get all handlers"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM handlers ORDER BY name')
-        rows = cursor.fetchall()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM handlers ORDER BY name')
+            rows = cursor.fetchall()
         
         return [dict(row) for row in rows]
     
-    async def get_handler_names(self):
+    @_reads
+    def get_handler_names(self):
         """Get all handler names"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT name FROM handlers ORDER BY name')
-        rows = cursor.fetchall()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT name FROM handlers ORDER BY name')
+            rows = cursor.fetchall()
         
         return [row['name'] for row in rows]
     
-    async def update_handler(self, handler_id, handler_data):
+    @_writes
+    def update_handler(self, handler_id, handler_data):
         """Update handler"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        handler_data['updated_at'] = datetime.now().isoformat()
-        
-        cursor.execute('''
-            UPDATE handlers SET name = ?, email = ?, phone = ?, notes = ?, updated_at = ?
-            WHERE id = ?
-        ''', (
-            handler_data['name'], handler_data.get('email'), handler_data.get('phone'),
-            handler_data.get('notes'), handler_data['updated_at'], handler_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            handler_data['updated_at'] = datetime.now().isoformat()
+            
+            cursor.execute('''
+                UPDATE handlers SET name = ?, email = ?, phone = ?, notes = ?, updated_at = ?, schema_version = ?
+                WHERE id = ?
+            ''', (
+                handler_data['name'], handler_data.get('email'), handler_data.get('phone'),
+                handler_data.get('notes'), handler_data['updated_at'], DOCUMENT_SCHEMA_VERSION, handler_id
+            ))
         return cursor.rowcount > 0
     
-    async def delete_handler(self, handler_id):
+    @_writes
+    def delete_handler(self, handler_id):
         """Delete handler"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM handlers WHERE id = ?', (handler_id,))
-        deleted_count = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM handlers WHERE id = ?', (handler_id,))
+            deleted_count = cursor.rowcount
         return deleted_count > 0
     
     # Shed Operations
-    async def insert_shed(self, shed_data):
+    @_writes
+    def insert_shed(self, shed_data):
         """Insert a new shed"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if 'id' not in shed_data:
-            shed_data['id'] = str(uuid.uuid4())
-        
-        now = datetime.now().isoformat()
-        shed_data['created_at'] = now
-        shed_data['updated_at'] = now
-        
-        cursor.execute('''
-            INSERT INTO sheds (id, number, capacity, location, status, notes, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            shed_data['id'], shed_data['number'], shed_data.get('capacity'),
-            shed_data.get('location'), shed_data.get('status', 'active'),
-            shed_data.get('notes'), shed_data['created_at'], shed_data['updated_at']
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            if 'id' not in shed_data:
+                shed_data['id'] = ids.new_id()
+            
+            now = datetime.now().isoformat()
+            shed_data['created_at'] = now
+            shed_data['updated_at'] = now
+            
+            cursor.execute('''
+                INSERT INTO sheds (id, number, capacity, location, status, notes, created_at, updated_at, schema_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                shed_data['id'], shed_data['number'], shed_data.get('capacity'),
+                shed_data.get('location'), shed_data.get('status', 'active'),
+                shed_data.get('notes'), shed_data['created_at'], shed_data['updated_at'], DOCUMENT_SCHEMA_VERSION
+            ))
         return shed_data['id']
     
-    async def find_shed_by_number(self, number):
+    @_reads
+    def find_shed_by_number(self, number):
         """Find shed by number"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM sheds WHERE number = ?', (number,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM sheds WHERE number = ?', (number,))
+            row = cursor.fetchone()
         
         if row:
             return dict(row)
         return None
     
-    async def find_shed_by_id(self, shed_id):
+    @_reads
+    def find_shed_by_id(self, shed_id):
         """Find shed by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM sheds WHERE id = ?', (shed_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM sheds WHERE id = ?', (shed_id,))
+            row = cursor.fetchone()
         
         if row:
             return dict(row)
         return None
     
-    async def get_all_sheds(self):
+    @_reads
+    def get_all_sheds(self):
         """Get all sheds"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM sheds ORDER BY number')
-        rows = cursor.fetchall()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM sheds ORDER BY number')
+            rows = cursor.fetchall()
         
         return [dict(row) for row in rows]
     
-    async def get_shed_numbers(self):
+    @_reads
+    def get_shed_numbers(self):
         """Get all shed numbers from calculations"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT DISTINCT json_extract(input_data, '$.shed_number') as shed_number
-            FROM broiler_calculations
-            ORDER BY shed_number
-        ''')
-        rows = cursor.fetchall()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Loose index scan: one index seek per distinct shed instead of reading every row
+            cursor.execute('''
+                WITH RECURSIVE sheds(shed_number) AS (
+                    SELECT MIN(shed_number) FROM broiler_calculations
+                    UNION ALL
+                    SELECT (SELECT MIN(shed_number) FROM broiler_calculations WHERE shed_number > sheds.shed_number)
+                    FROM sheds WHERE sheds.shed_number IS NOT NULL
+                )
+                SELECT shed_number FROM sheds
+            ''')
+            rows = cursor.fetchall()
         
         return [row['shed_number'] for row in rows if row['shed_number']]
     
-    async def update_shed(self, shed_id, shed_data):
+    @_writes
+    def update_shed(self, shed_id, shed_data):
         """Update shed"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        shed_data['updated_at'] = datetime.now().isoformat()
-        
-        cursor.execute('''
-            UPDATE sheds SET number = ?, capacity = ?, location = ?, status = ?, notes = ?, updated_at = ?
-            WHERE id = ?
-        ''', (
-            shed_data['number'], shed_data.get('capacity'), shed_data.get('location'),
-            shed_data.get('status'), shed_data.get('notes'), shed_data['updated_at'], shed_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            shed_data['updated_at'] = datetime.now().isoformat()
+            
+            cursor.execute('''
+                UPDATE sheds SET number = ?, capacity = ?, location = ?, status = ?, notes = ?, updated_at = ?,
+                    schema_version = ?
+                WHERE id = ?
+            ''', (
+                shed_data['number'], shed_data.get('capacity'), shed_data.get('location'),
+                shed_data.get('status'), shed_data.get('notes'), shed_data['updated_at'],
+                DOCUMENT_SCHEMA_VERSION, shed_id
+            ))
         return cursor.rowcount > 0
     
-    async def delete_shed(self, shed_id):
+    @_writes
+    def delete_shed(self, shed_id):
         """Delete shed"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM sheds WHERE id = ?', (shed_id,))
-        deleted_count = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM sheds WHERE id = ?', (shed_id,))
+            deleted_count = cursor.rowcount
         return deleted_count > 0
     
+    # Report Job Operations
+    @_writes
+    def insert_report_job(self, job_data):
+        """Insert a new report job"""
+        with self.get_connection() as conn:
+            conn.execute(f'''
+                INSERT INTO report_jobs ({', '.join(REPORT_JOB_COLUMNS)})
+                VALUES ({', '.join('?' for _ in REPORT_JOB_COLUMNS)})
+            ''', tuple(job_data[column] for column in REPORT_JOB_COLUMNS))
+    
+    @_writes
+    def update_report_job(self, job_id, job_data):
+        """Update the given report job columns"""
+        columns = [column for column in job_data if column in REPORT_JOB_COLUMNS]
+        with self.get_connection() as conn:
+            conn.execute(
+                f"UPDATE report_jobs SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                (*(job_data[column] for column in columns), job_id)
+            )
+    
+    @_reads
+    def find_report_job(self, job_id):
+        """Find report job by ID"""
+        with self.get_connection() as conn:
+            row = conn.execute('SELECT * FROM report_jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    @_reads
+    def find_report_job_by_filename(self, filename):
+        """Find the latest report job rendering the given file"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                'SELECT * FROM report_jobs WHERE filename = ? ORDER BY created_at DESC LIMIT 1', (filename,)
+            ).fetchone()
+        return dict(row) if row else None
+    
+    @_reads
+    def get_unfinished_report_jobs(self):
+        """Get pending and running report jobs, oldest first"""
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM report_jobs WHERE status IN ('pending', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
     # Performance and Analytics
-    async def get_calculations_by_handler(self, handler_name):
+    @_reads
+    def get_calculations_by_handler(self, handler_name):
         """Get all calculations for a specific handler"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM broiler_calculations 
-            WHERE json_extract(input_data, '$.handler_name') = ?
-            ORDER BY created_at DESC
-        ''', (handler_name,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM broiler_calculations 
+                WHERE handler_name = ?
+                ORDER BY created_at DESC
+            ''', (handler_name,))
+            rows = cursor.fetchall()
         
-        return [self._row_to_calculation_dict(row) for row in rows]
+        return [CalculationRow(row) for row in rows]
     
-    async def count_calculations_by_handler(self, handler_name):
+    @_reads
+    def count_calculations_by_handler(self, handler_name):
         """Count calculations by handler"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT COUNT(*) as count FROM broiler_calculations 
-            WHERE json_extract(input_data, '$.handler_name') = ?
-        ''', (handler_name,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # handler_stats keeps the per-handler batch count up to date
+            cursor.execute('''
+                SELECT total_batches as count FROM handler_stats
+                WHERE handler_name = ?
+            ''', (handler_name,))
+            row = cursor.fetchone()
         
         return row['count'] if row else 0
     
+    @_reads
+    def get_handler_performance_totals(self, handler_name=None):
+        """Read per-handler averages and totals from the handler_stats rollup
+        
+        Without a handler name, every handler registered in the handlers table is
+        returned; with one, only that handler's row is.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            columns = '''s.handler_name, s.total_batches,
+                    s.sum_fcr / s.total_batches AS avg_fcr,
+                    s.sum_mortality / s.total_batches AS avg_mortality,
+                    s.sum_daily_gain / s.total_batches AS avg_daily_gain,
+                    s.sum_cost_per_kg / s.total_batches AS avg_cost_per_kg,
+                    s.total_chicks'''
+            if handler_name is None:
+                cursor.execute(f'''
+                    SELECT {columns} FROM handler_stats s
+                    JOIN handlers h ON h.name = s.handler_name
+                    WHERE s.total_batches > 0
+                ''')
+            else:
+                cursor.execute(f'''
+                    SELECT {columns} FROM handler_stats s
+                    WHERE s.handler_name = ? AND s.total_batches > 0
+                ''', (handler_name,))
+            rows = cursor.fetchall()
+        
+        return [dict(row) for row in rows]
+    
+    @_reads
+    def get_performance_aggregates(self, group_by, value=None):
+        """Batch count, averages and totals per handler_name or shed_number, computed in SQL
+        
+        Only the aggregates are returned, one row per group (or just the group
+        equal to value); each is read from a covering index over typed columns.
+        """
+        if group_by not in AGGREGATE_GROUPS:
+            raise ValueError(f"Cannot aggregate by '{group_by}', expected one of {', '.join(AGGREGATE_GROUPS)}")
+        condition, params = (f'{group_by} = ?', (value,)) if value is not None else (f'{group_by} IS NOT NULL', ())
+        with self.get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {group_by}, {AGGREGATES_SQL}
+                FROM broiler_calculations WHERE {condition}
+                GROUP BY {group_by} ORDER BY {group_by}
+            ''', params).fetchall()
+        
+        return [dict(row) for row in rows]
+    
+    @_reads
+    def get_cost_breakdown_totals(self, group_by=None, entry_from=None, entry_to=None):
+        """Each cost component summed over batches, with its percentage of their total cost
+        
+        One row for all batches, or one per handler_name or shed_number with group_by;
+        entry_from and entry_to bound the batches' entry dates (inclusive days).
+        """
+        if group_by is not None and group_by not in AGGREGATE_GROUPS:
+            raise ValueError(f"Cannot aggregate by '{group_by}', expected one of {', '.join(AGGREGATE_GROUPS)}")
+        conditions = [f'{group_by} IS NOT NULL'] if group_by else []
+        params = []
+        if entry_from:
+            conditions.append('entry_epoch >= ?')
+            params.append(_epoch_seconds(entry_from))
+        if entry_to:
+            conditions.append('entry_epoch < ?')
+            params.append(_epoch_seconds(entry_to + timedelta(days=1)))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        sums = ', '.join(
+            f'SUM({component}) AS {component}, '
+            f'100.0 * SUM({component}) / NULLIF(SUM(total_cost), 0) AS {component}_percent'
+            for component in COST_COMPONENTS
+        )
+        grouping = f'{group_by}, ' if group_by else ''
+        with self.get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {grouping}COUNT(*) AS total_batches, SUM(total_cost) AS total_cost, {sums}
+                FROM broiler_calculations {where}
+                {f'GROUP BY {group_by} ORDER BY {group_by}' if group_by else ''}
+            ''', params).fetchall()
+        
+        return [dict(row) for row in rows if row['total_batches']]
+    
+    def _handler_stats_from_calculations(self, conn, typed_columns=True):
+        """Per-handler aggregates of the raw batches
+        
+        As in the triggers, the handler and chick count come from the typed columns;
+        migration 1 runs before they exist and reads them from input_data instead.
+        """
+        if typed_columns:
+            handler, chicks = 'handler_name', 'initial_chicks'
+        else:
+            handler, chicks = "json_extract(input_data, '$.handler_name')", "json_extract(input_data, '$.initial_chicks')"
+        sums = ', '.join(f'SUM({source}) AS {column}' for column, source in HANDLER_STATS_SUMS.items())
+        return conn.execute(f'''
+            SELECT {handler} AS handler_name,
+                COUNT(*) AS total_batches, {sums},
+                SUM({chicks}) AS total_chicks
+            FROM broiler_calculations
+            WHERE {handler} IS NOT NULL
+            GROUP BY {handler}
+        ''').fetchall()
+    
+    def _rebuild_handler_stats(self, conn, typed_columns=True):
+        conn.execute('DELETE FROM handler_stats')
+        conn.executemany('''
+            INSERT INTO handler_stats (handler_name, total_batches, sum_fcr, sum_mortality,
+                sum_daily_gain, sum_cost_per_kg, total_chicks)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', self._handler_stats_from_calculations(conn, typed_columns))
+    
+    def rebuild_handler_stats(self):
+        """Regenerate the handler_stats rollup from the raw batches, returns the number of handlers"""
+        with self.get_connection() as conn:
+            self._rebuild_handler_stats(conn)
+            conn.commit()
+            count = conn.execute('SELECT COUNT(*) FROM handler_stats').fetchone()[0]
+        return count
+    
+    def verify_handler_stats(self, tolerance=1e-6):
+        """Compare the handler_stats rollup with a fresh aggregation, returns the differences"""
+        with self.get_connection() as conn:
+            expected = {row['handler_name']: row for row in self._handler_stats_from_calculations(conn)}
+            stored = {row['handler_name']: row for row in conn.execute('SELECT * FROM handler_stats WHERE total_batches > 0')}
+        
+        problems = []
+        for name in sorted(set(expected) | set(stored)):
+            want, have = expected.get(name), stored.get(name)
+            if want is None or have is None:
+                problems.append(f"{name}: {'unexpected' if want is None else 'missing'} rollup row")
+                continue
+            for field in ['total_batches', 'total_chicks', *HANDLER_STATS_SUMS]:
+                if not math.isclose(want[field], have[field], rel_tol=tolerance, abs_tol=tolerance):
+                    problems.append(f"{name}: {field} is {have[field]}, expected {want[field]}")
+        return problems
+    
+    @_reads
+    def data_version(self):
+        """A value that changes whenever the database is committed to, by this process or another
+        
+        PRAGMA data_version only moves for commits made on other connections, so
+        it is read on a connection of its own that never writes. The value
+        restarts with a new connection, hence the generation alongside it.
+        """
+        with self._version_lock:
+            if self._version_connection is None:
+                self._version_connection = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._version_generation += 1
+            version = self._version_connection.execute('PRAGMA data_version').fetchone()[0]
+            return self._version_generation, version
+    
     def close(self):
-        """Close database connections"""
-        # SQLite connections are closed after each operation
-        pass
+        """Close every pooled connection; later calls transparently reconnect
+        
+        Call it only while no query is in flight, e.g. on application shutdown.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        with self._version_lock:
+            if self._version_connection is not None:
+                connections.append(self._version_connection)
+                self._version_connection = None
+        for conn in connections:
+            conn.close()
 
 # Global database instance
-db = SQLiteDatabase()
\ No newline at end of file
+db = SQLiteDatabase()
+
+if __name__ == "__main__":
+    # python database.py rebuild-handler-stats | verify-handler-stats
+    import sys
+    
+    if len(sys.argv) != 2 or sys.argv[1] not in ("rebuild-handler-stats", "verify-handler-stats"):
+        print("Usage: python database.py rebuild-handler-stats|verify-handler-stats")
+        sys.exit(2)
+    if sys.argv[1] == "rebuild-handler-stats":
+        print(f"Rebuilt handler_stats for {db.rebuild_handler_stats()} handlers")
+    problems = db.verify_handler_stats()
+    for problem in problems:
+        print(problem)
+    print("handler_stats matches raw batches" if not problems else f"{len(problems)} differences found")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,160 @@
+"""
+On-demand profiling of single requests.
+
+With PROFILING_ENABLED=1 in the environment, the server installs
+ProfilingMiddleware. A request sent with an "X-Profile: 1" header or a
+"profile=1" query parameter then runs under cProfile, and two files are
+written to the profiles directory, named after the time, method, route and
+duration of the request:
+
+- <name>.txt: the top functions by cumulative time, readable as is
+- <name>.prof: the raw pstats data, for snakeviz, gprof2dot or pstats
+
+GET /api/admin/profiles lists them and GET /api/admin/profiles/{filename}
+downloads one. Without the setting the middleware is not installed at all.
+
+cProfile follows the event loop thread, so other requests running at the same
+time show up in the profile too, and work done in threads or worker processes
+(database executors, PDF rendering) appears only as the time awaited on it.
+Only one request is profiled at a time; flagged requests arriving meanwhile
+run unprofiled.
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qs
+import cProfile
+import io
+import os
+import pstats
+import re
+import time
+
+ENABLED_SETTING = "PROFILING_ENABLED"
+HEADER = b"x-profile"
+QUERY_FLAG = "profile"
+
+# Oldest profiles are deleted beyond this many
+MAX_PROFILES = 100
+# Functions listed in the text report
+REPORT_LINES = 60
+
+_FILENAME = re.compile(r"^(?P<time>\d{8}T\d{6}\d{3})_(?P<method>[A-Z]+)_(?P<route>[\w.-]*)_(?P<ms>\d+)ms\.(?:txt|prof)$")
+
+
+def enabled() -> bool:
+    return os.environ.get(ENABLED_SETTING, "").lower() in ("1", "true", "yes", "on")
+
+
+def _requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == HEADER:
+            return value not in (b"", b"0", b"false")
+    query = scope.get("query_string", b"")
+    if QUERY_FLAG.encode() in query:
+        values = parse_qs(query.decode("latin-1")).get(QUERY_FLAG, [])
+        return any(value not in ("", "0", "false") for value in values)
+    return False
+
+
+def _route_slug(route_path: str) -> str:
+    # /api/batches/{batch_id} -> api.batches.batch_id
+    return re.sub(r"[^\w-]+", ".", route_path).strip(".")
+
+
+class ProfileStore:
+    def __init__(self, directory: Path, max_profiles: int = MAX_PROFILES):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, profiler: cProfile.Profile, method: str, path: str, route_path: str,
+             status: int, seconds: float) -> str:
+        """
+        Write the text report and raw data of a profiled request, returning the
+        report's filename
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        now = datetime.now()
+        stem = f"{now:%Y%m%dT%H%M%S}{now.microsecond // 1000:03d}_{method}_{_route_slug(route_path)}_{round(seconds * 1000)}ms"
+
+        report = io.StringIO()
+        report.write(f"{method} {path}\nroute: {route_path}\nstatus: {status}\n"
+                     f"duration: {seconds * 1000:.1f} ms\nprofiled at: {now.isoformat()}\n\n")
+        stats = pstats.Stats(profiler, stream=report)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_LINES)
+        stats.dump_stats(self.directory / f"{stem}.prof")
+        (self.directory / f"{stem}.txt").write_text(report.getvalue(), encoding="utf-8")
+
+        self._prune()
+        return f"{stem}.txt"
+
+    def _prune(self):
+        reports = sorted(self.directory.glob("*.txt"))
+        for old in reports[:max(0, len(reports) - self.max_profiles)]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".prof").unlink(missing_ok=True)
+
+    def list(self) -> List[dict]:
+        """
+        Stored profiles, newest first
+        """
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for report in sorted(self.directory.glob("*.txt"), reverse=True):
+            match = _FILENAME.match(report.name)
+            if not match:
+                continue
+            profiles.append({
+                "report": report.name,
+                "data": report.with_suffix(".prof").name,
+                "method": match["method"],
+                "route": match["route"],
+                "duration_ms": int(match["ms"]),
+                "profiled_at": datetime.strptime(match["time"][:15], "%Y%m%dT%H%M%S").isoformat(),
+            })
+        return profiles
+
+    def path(self, filename: str) -> Optional[Path]:
+        """
+        Path of a stored profile file, or None for anything else
+        """
+        if not _FILENAME.match(filename):
+            return None
+        path = self.directory / filename
+        return path if path.is_file() else None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling the requests that ask for it (see the module docstring)
+    """
+    def __init__(self, app, store: ProfileStore):
+        self.app = app
+        self.store = store
+        self._profiling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._profiling or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_and_watch(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        self._profiling = True
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_and_watch)
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            self._profiling = False
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.store.save(profiler, scope["method"], scope["path"], route, status["code"], seconds)
@@ -0,0 +1,107 @@
+"""
+In-process cache of serialized read responses.
+
+Entries are only valid for the data version they were computed at: once the
+version moves on, the next lookup drops every entry. Where the version comes from:
+
+- MongoDB backend: a WriteCounter that every mutating endpoint bumps
+- SQLite backends: PRAGMA data_version, which also moves when another
+  process writes the database file
+
+Beyond max_entries or max_bytes, the least recently used entries are evicted.
+"""
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+MAX_ENTRIES = 512
+MAX_BYTES = 16 * 1024 * 1024
+
+# (body, headers) of a cached response
+CachedResponse = Tuple[bytes, Dict[str, str]]
+
+
+class WriteCounter:
+    """
+    Data version for a store without one of its own, bumped after each write
+    """
+    def __init__(self):
+        self._value = 0
+
+    def bump(self):
+        self._value += 1
+
+    async def current(self) -> int:
+        return self._value
+
+
+class ReadCache:
+    def __init__(self, version: Callable[[], Awaitable[Hashable]],
+                 max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self._version_source = version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._version = None
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[CachedResponse]]) -> CachedResponse:
+        """
+        The cached response for key at the current data version, computing and
+        storing it on a miss
+        """
+        version = await self._version_source()
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+            self._version = version
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = await compute()
+        # A lookup that saw a newer version while this one was computing has
+        # already moved the cache on; the result belongs to the old version
+        if self._version == version:
+            self._store(key, entry)
+        return entry
+
+    def _store(self, key: Hashable, entry: CachedResponse):
+        size = len(entry[0])
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous[0])
+        self._entries[key] = entry
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted[0])
+            self.evictions += 1
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,171 @@
+"""
+Background PDF report jobs.
+
+The first download of a batch's PDF (see export_cache.py) records a report
+job; a bounded process pool renders the PDF with reports.render_pdf_report. Job
+records are persisted in the report_jobs table (see database.py) so unfinished
+renders resume after a restart, and a failing render is retried with a growing
+delay before the job is marked failed.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+
+import ids
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+UNFINISHED = (PENDING, RUNNING)
+
+
+def _render_pdf_report(calculation: dict, filepath: str) -> str:
+    # Runs in a worker process; reportlab is slow to import, so the server
+    # itself never loads it
+    import reports
+    return reports.render_pdf_report(calculation, filepath)
+
+
+class ReportJobQueue:
+    """
+    Renders PDF reports in worker processes and tracks them as persisted jobs.
+
+    load_calculation(calculation_id) returns the calculation dict to render; it is
+    used for jobs recovered after a restart, whose calculation is no longer in memory.
+    """
+    def __init__(self, store, exports_dir: Path,
+                 load_calculation: Callable[[str], Awaitable[Optional[dict]]],
+                 max_workers: int = 2, max_attempts: int = 3, retry_delay: float = 2.0):
+        self.store = store
+        self.exports_dir = exports_dir
+        self.load_calculation = load_calculation
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._tasks = set()
+
+    async def start(self):
+        """
+        Start the worker pool and resume jobs left unfinished by the previous run
+        """
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        unfinished = await self.store.get_unfinished_report_jobs()
+        for job in unfinished:
+            self._schedule(job, None)
+        if unfinished:
+            logger.info(f"Resumed {len(unfinished)} unfinished report jobs")
+
+    @property
+    def depth(self) -> int:
+        """
+        Jobs waiting for a worker or being rendered
+        """
+        return len(self._tasks)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, calculation: dict, filename: str) -> dict:
+        """
+        Record a report job rendering a saved calculation to filename and start it
+        """
+        input_data = calculation["input_data"]
+        now = datetime.now().isoformat()
+        job = {
+            "id": ids.new_id(),
+            "kind": "pdf_report",
+            "calculation_id": calculation["id"],
+            "batch_id": input_data["batch_id"],
+            "filename": filename,
+            "status": PENDING,
+            "attempts": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.store.insert_report_job(job)
+        self._schedule(job, calculation)
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.store.find_report_job(job_id)
+
+    async def find_by_filename(self, filename: str) -> Optional[dict]:
+        return await self.store.find_report_job_by_filename(filename)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """
+        Wait up to timeout seconds for a job to finish and return its current record
+        """
+        finished = self._finished.get(job_id)
+        if finished is not None:
+            try:
+                await asyncio.wait_for(finished.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return await self.store.find_report_job(job_id)
+
+    def _schedule(self, job: dict, calculation: Optional[dict]):
+        self._finished[job["id"]] = asyncio.Event()
+        task = asyncio.create_task(self._run(job, calculation))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _update(self, job: dict, **fields):
+        fields["updated_at"] = datetime.now().isoformat()
+        job.update(fields)
+        await self.store.update_report_job(job["id"], fields)
+
+    async def _render(self, calculation: dict, filepath: Path):
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.timed("pdf_render", "render_pdf_report"):
+                await loop.run_in_executor(self._executor, _render_pdf_report, calculation, str(filepath))
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OS); replace the pool so later jobs can run
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            raise
+
+    async def _run(self, job: dict, calculation: Optional[dict]):
+        try:
+            attempts = job["attempts"]
+            while True:
+                attempts += 1
+                await self._update(job, status=RUNNING, attempts=attempts)
+                try:
+                    if calculation is None:
+                        calculation = await self.load_calculation(job["calculation_id"])
+                    if calculation is None:
+                        await self._update(job, status=FAILED, error="Calculation no longer exists")
+                        return
+                    await self._render(calculation, self.exports_dir / job["filename"])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if attempts >= self.max_attempts:
+                        logger.error(f"Report job {job['id']} failed after {attempts} attempts: {e}")
+                        await self._update(job, status=FAILED, error=str(e))
+                        return
+                    logger.warning(f"Report job {job['id']} attempt {attempts} failed, retrying: {e}")
+                    await self._update(job, status=PENDING, error=str(e))
+                    await asyncio.sleep(self.retry_delay * attempts)
+                else:
+                    await self._update(job, status=DONE, error=None)
+                    return
+        finally:
+            self._finished.pop(job["id"]).set()
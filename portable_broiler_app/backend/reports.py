@@ -0,0 +1,170 @@
+"""
+PDF batch closure reports.
+
+Rendering runs in report job worker processes (see report_jobs.py), so this
+module only depends on reportlab and takes plain calculation dicts, never the
+server's models or database.
+"""
+from datetime import datetime
+from types import SimpleNamespace
+import os
+import uuid
+
+# PDF generation imports
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER
+
+
+def _as_attributes(value):
+    """Give a calculation dict the attribute access the report layout uses"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _as_attributes(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_as_attributes(item) for item in value]
+    return value
+
+
+def render_pdf_report(calculation: dict, filepath: str) -> str:
+    """
+    Worker entry point: render the report for a calculation dict to filepath.
+    The file only appears under its final name once it is complete.
+    """
+    partial_path = f"{filepath}.{uuid.uuid4().hex}.part"
+    generate_pdf_report(_as_attributes(calculation), partial_path)
+    os.replace(partial_path, filepath)
+    return filepath
+
+
+def generate_pdf_report(calculation, filepath: str):
+    """
+    Generate a professional PDF report for batch closure
+    """
+    # Create PDF document
+    doc = SimpleDocTemplate(str(filepath), pagesize=A4)
+    story = []
+    styles = getSampleStyleSheet()
+    
+    # Custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        textColor=colors.darkblue
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        textColor=colors.darkgreen
+    )
+    
+    # Title and Header
+    story.append(Paragraph("BROILER BATCH CLOSURE REPORT", title_style))
+    story.append(Spacer(1, 10))
+    story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Batch Information
+    story.append(Paragraph("BATCH IDENTIFICATION", heading_style))
+    batch_data = [
+        ['Batch ID:', calculation.input_data.batch_id],
+        ['Shed Number:', calculation.input_data.shed_number],
+        ['Handler:', calculation.input_data.handler_name],
+        ['Report Generated:', datetime.now().strftime('%Y-%m-%d %H:%M')],
+    ]
+    
+    # Add dates if available
+    if hasattr(calculation.input_data, 'entry_date') and calculation.input_data.entry_date:
+        if isinstance(calculation.input_data.entry_date, datetime):
+            batch_data.insert(-1, ['Entry Date:', calculation.input_data.entry_date.strftime('%Y-%m-%d')])
+        else:
+            batch_data.insert(-1, ['Entry Date:', str(calculation.input_data.entry_date)])
+    
+    if hasattr(calculation.input_data, 'exit_date') and calculation.input_data.exit_date:
+        if isinstance(calculation.input_data.exit_date, datetime):
+            batch_data.insert(-1, ['Exit Date:', calculation.input_data.exit_date.strftime('%Y-%m-%d')])
+        else:
+            batch_data.insert(-1, ['Exit Date:', str(calculation.input_data.exit_date)])
+    
+    batch_table = Table(batch_data, colWidths=[2*inch, 3*inch])
+    batch_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+    ]))
+    story.append(batch_table)
+    story.append(Spacer(1, 20))
+    
+    # Performance Summary
+    story.append(Paragraph("PERFORMANCE SUMMARY", heading_style))
+    performance_data = [
+        ['Metric', 'Value', 'Status'],
+        ['Feed Conversion Ratio', f"{calculation.feed_conversion_ratio}", 
+         'Excellent' if calculation.feed_conversion_ratio <= 1.8 else 'Good' if calculation.feed_conversion_ratio <= 2.2 else 'Average'],
+        ['Mortality Rate', f"{calculation.mortality_rate_percent}%",
+         'Excellent' if calculation.mortality_rate_percent <= 3 else 'Good' if calculation.mortality_rate_percent <= 7 else 'Needs Attention'],
+        ['Weighted Average Age', f"{calculation.weighted_average_age} days", 'Optimal'],
+        ['Daily Weight Gain', f"{calculation.daily_weight_gain} kg", 
+         'Excellent' if calculation.daily_weight_gain >= 0.065 else 'Good' if calculation.daily_weight_gain >= 0.055 else 'Average'],
+        ['Net Cost per kg', f"${calculation.net_cost_per_kg:.2f}", 'Calculated']
+    ]
+    
+    perf_table = Table(performance_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch])
+    perf_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
+    ]))
+    story.append(perf_table)
+    story.append(Spacer(1, 20))
+    
+    # Production Data
+    story.append(Paragraph("PRODUCTION DATA", heading_style))
+    production_data = [
+        ['Parameter', 'Count/Amount'],
+        ['Initial Chicks', f"{calculation.input_data.initial_chicks:,}"],
+        ['Chicks Died', f"{calculation.input_data.chicks_died:,}"],
+        ['Surviving Chicks', f"{calculation.surviving_chicks:,}"],
+        ['Viability (Caught)', f"{calculation.viability:,}"],
+        ['Missing Chicks', f"{calculation.missing_chicks:,}"],
+        ['Total Weight Produced', f"{calculation.total_weight_produced_kg:,} kg"],
+        ['Total Feed Consumed', f"{calculation.total_feed_consumed_kg:,} kg"],
+        ['Average Weight per Chick', f"{calculation.average_weight_per_chick:.2f} kg"],
+        ['Viability Rate', f"{(calculation.viability / calculation.input_data.initial_chicks * 100):.1f}%"],
+    ]
+    
+    prod_table = Table(production_data, colWidths=[3*inch, 2*inch])
+    prod_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
+    ]))
+    story.append(prod_table)
+    
+    # Generate PDF
+    doc.build(story)
@@ -0,0 +1,84 @@
+"""
+JSON encoding for API responses, JSON exports and stored JSON.
+
+Uses orjson when it is installed and the standard library json module
+otherwise; both produce the same documents, orjson several times faster.
+
+- dumps: compact response bodies. Datetimes are ISO 8601, as FastAPI's own
+  encoder writes them.
+- dumps_text / dump_file: stored JSON and export files. Values JSON has no
+  type for, datetimes included, are written as str(value), exactly like
+  json.dumps(..., default=str) did.
+"""
+from pathlib import Path
+from typing import Any, Union
+import json
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        # numpy scalars
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _default_str(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if hasattr(value, "item") and not hasattr(value, "isoformat"):
+        return value.item()
+    return str(value)
+
+
+if orjson is not None:
+    _TEXT_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def dumps_text(obj: Any) -> str:
+        return orjson.dumps(obj, default=_default_str, option=_TEXT_OPTIONS).decode()
+
+    def _dumps_file(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default_str, option=_TEXT_OPTIONS | orjson.OPT_INDENT_2)
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def dumps_text(obj: Any) -> str:
+        return json.dumps(obj, default=_default_str)
+
+    def _dumps_file(obj: Any) -> bytes:
+        return json.dumps(obj, default=_default_str, indent=2, ensure_ascii=False).encode()
+
+    loads = json.loads
+
+
+def dump_file(obj: Any, path: Union[str, Path]):
+    """
+    Write obj to path as indented JSON
+    """
+    with open(path, "wb") as f:
+        f.write(_dumps_file(obj))
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with dumps; the app's default response class
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,36 +1,45 @@
-from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi import FastAPI, HTTPException, APIRouter, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import Response, JSONResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional, Dict, Any
 import asyncio
-import statistics
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import uuid
 import json
+import base64
+import hashlib
 from pathlib import Path
 import os
 import logging
 
-# PDF generation imports
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER
-
 # Import our SQLite database
-from database import db
+from database import db, DuplicateBatchError
+import documents
+import ids
+import serialization
+import loop_watchdog
+import metrics
+import profiling
+
+# Background PDF rendering
+import report_jobs
+from export_cache import ExportCache
+from events import ChangeFeed
+from read_cache import ReadCache
 
 # Create FastAPI app
-app = FastAPI(title="Offline Broiler Farm Management System")
+app = FastAPI(title="Offline Broiler Farm Management System", default_response_class=serialization.FastJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # Create directories for exports
 EXPORTS_DIR = Path("exports")
 EXPORTS_DIR.mkdir(exist_ok=True)
 
+# Reports of requests profiled on demand (see profiling.py)
+profile_store = profiling.ProfileStore(Path("profiles"))
+
 # Pydantic Models (same as original)
 class RemovalBatch(BaseModel):
     quantity: int
@@ -122,6 +131,20 @@ class CalculationResult(BaseModel):
     calculation: BroilerCalculation
     insights: List[str]
 
+class ReportJob(BaseModel):
+    id: str
+    kind: str
+    batch_id: str
+    filename: str
+    status: str  # pending, running, done or failed
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+class BulkCalculationResult(BaseModel):
+    calculations: List[BroilerCalculation]
+
 class BatchSummary(BaseModel):
     batch_id: str
     shed_number: str
@@ -142,6 +165,23 @@ class HandlerPerformance(BaseModel):
     total_chicks_processed: int
     performance_score: float
 
+class ShedPerformance(BaseModel):
+    shed_number: str
+    total_batches: int
+    avg_feed_conversion_ratio: float
+    avg_mortality_rate: float
+    avg_daily_weight_gain: float
+    avg_cost_per_kg: float
+    total_chicks_processed: int
+    total_weight_produced_kg: float
+    total_cost: float
+    total_revenue: float
+
+class CostBreakdownTotals(CostBreakdown):
+    group: Optional[str] = None
+    total_batches: int
+    total_cost: float
+
 class Handler(BaseModel):
     id: str
     name: str
@@ -188,11 +228,10 @@ class ShedUpdate(BaseModel):
     notes: Optional[str] = None
 
 # Business Logic Functions (same as original)
-def calculate_enhanced_broiler_metrics(input_data: BroilerCalculationInput) -> BroilerCalculation:
+def _parse_input_dates(input_data: BroilerCalculationInput):
     """
-    Calculate comprehensive broiler production metrics
+    Replace ISO date strings on the input with parsed datetimes
     """
-    # Parse dates if provided
     entry_date = None
     exit_date = None
     if input_data.entry_date:
@@ -211,6 +250,13 @@ def calculate_enhanced_broiler_metrics(input_data: BroilerCalculationInput) -> B
         input_data.entry_date = entry_date
     if exit_date:
         input_data.exit_date = exit_date
+
+@metrics.timed_function("calculation")
+def calculate_enhanced_broiler_metrics(input_data: BroilerCalculationInput) -> BroilerCalculation:
+    """
+    Calculate comprehensive broiler production metrics
+    """
+    _parse_input_dates(input_data)
     
     # Basic calculations
     surviving_chicks = input_data.initial_chicks - input_data.chicks_died
@@ -282,7 +328,7 @@ def calculate_enhanced_broiler_metrics(input_data: BroilerCalculationInput) -> B
     )
     
     return BroilerCalculation(
-        id=str(uuid.uuid4()),
+        id=ids.new_id(),
         input_data=input_data,
         feed_conversion_ratio=round(feed_conversion_ratio, 2),
         mortality_rate_percent=round(mortality_rate_percent, 2),
@@ -303,6 +349,25 @@ def calculate_enhanced_broiler_metrics(input_data: BroilerCalculationInput) -> B
         updated_at=None
     )
 
+_calculation_inputs_adapter = TypeAdapter(List[BroilerCalculationInput])
+
+@metrics.timed_function("calculation")
+def calculate_enhanced_broiler_metrics_bulk(inputs: List[BroilerCalculationInput]) -> List[dict]:
+    """
+    Vectorized calculate_enhanced_broiler_metrics for many batches at once, returning
+    calculation dicts. Every operation is applied in the same order as the scalar path,
+    so the values are identical to calculate_enhanced_broiler_metrics(...).dict().
+    """
+    if not inputs:
+        return []
+    
+    # Imported on first use, which keeps numpy off startup
+    import bulk_metrics
+    
+    for input_data in inputs:
+        _parse_input_dates(input_data)
+    return bulk_metrics.calculate(inputs, _calculation_inputs_adapter.dump_python(inputs, warnings=False))
+
 def generate_enhanced_insights(calculation: BroilerCalculation) -> List[str]:
     """
     Generate enhanced business insights from calculation results
@@ -365,26 +430,13 @@ def generate_enhanced_insights(calculation: BroilerCalculation) -> List[str]:
     
     return insights
 
-async def calculate_handler_performance(handler_name: str) -> Optional[HandlerPerformance]:
+def _handler_performance_from_totals(totals: Dict[str, Any]) -> HandlerPerformance:
     """
-    Calculate performance metrics for a specific handler
+    Build a HandlerPerformance (including the performance score) from aggregated totals
     """
-    calculations = await db.get_calculations_by_handler(handler_name)
-    
-    if not calculations:
-        return None
-    
-    # Extract metrics
-    fcr_values = [calc["feed_conversion_ratio"] for calc in calculations]
-    mortality_values = [calc["mortality_rate_percent"] for calc in calculations]
-    daily_gain_values = [calc["daily_weight_gain"] for calc in calculations]
-    cost_per_kg_values = [calc["net_cost_per_kg"] for calc in calculations]
-    total_chicks = sum(calc["input_data"]["initial_chicks"] for calc in calculations)
-    
-    avg_fcr = statistics.mean(fcr_values)
-    avg_mortality = statistics.mean(mortality_values)
-    avg_daily_gain = statistics.mean(daily_gain_values)
-    avg_cost_per_kg = statistics.mean(cost_per_kg_values)
+    avg_fcr = totals["avg_fcr"]
+    avg_mortality = totals["avg_mortality"]
+    avg_daily_gain = totals["avg_daily_gain"]
     
     # Calculate performance score (0-100, higher is better)
     fcr_score = max(0, min(100, (2.8 - avg_fcr) / (2.8 - 1.6) * 100))
@@ -393,21 +445,56 @@ async def calculate_handler_performance(handler_name: str) -> Optional[HandlerPe
     performance_score = (fcr_score * 0.35 + mortality_score * 0.35 + gain_score * 0.30)
     
     return HandlerPerformance(
-        handler_name=handler_name,
-        total_batches=len(calculations),
+        handler_name=totals["handler_name"],
+        total_batches=totals["total_batches"],
         avg_feed_conversion_ratio=round(avg_fcr, 2),
         avg_mortality_rate=round(avg_mortality, 2),
         avg_daily_weight_gain=round(avg_daily_gain, 3),
-        avg_cost_per_kg=round(avg_cost_per_kg, 2),
-        total_chicks_processed=total_chicks,
+        avg_cost_per_kg=round(totals["avg_cost_per_kg"], 2),
+        total_chicks_processed=totals["total_chicks"],
         performance_score=round(performance_score, 1)
     )
 
-async def export_batch_report(calculation: BroilerCalculation) -> str:
+def _shed_performance_from_aggregates(aggregates: Dict[str, Any]) -> ShedPerformance:
+    """
+    Build a ShedPerformance from a row of db.get_performance_aggregates("shed_number")
+    """
+    return ShedPerformance(
+        shed_number=aggregates["shed_number"],
+        total_batches=aggregates["total_batches"],
+        avg_feed_conversion_ratio=round(aggregates["avg_fcr"] or 0, 2),
+        avg_mortality_rate=round(aggregates["avg_mortality"] or 0, 2),
+        avg_daily_weight_gain=round(aggregates["avg_daily_gain"] or 0, 3),
+        avg_cost_per_kg=round(aggregates["avg_cost_per_kg"] or 0, 2),
+        total_chicks_processed=aggregates["total_chicks"] or 0,
+        total_weight_produced_kg=round(aggregates["total_weight_kg"] or 0, 1),
+        total_cost=round(aggregates["total_cost"] or 0, 2),
+        total_revenue=round(aggregates["total_revenue"] or 0, 2)
+    )
+
+async def calculate_handler_performance(handler_name: str) -> Optional[HandlerPerformance]:
+    """
+    Calculate performance metrics for a specific handler
+    """
+    results = await db.get_handler_performance_totals(handler_name)
+    
+    if not results:
+        return None
+    
+    return _handler_performance_from_totals(results[0])
+
+async def calculate_all_handlers_performance() -> List[HandlerPerformance]:
+    """
+    Calculate performance metrics for every registered handler in a single query
+    """
+    results = await db.get_handler_performance_totals()
+    return [_handler_performance_from_totals(totals) for totals in results]
+
+@metrics.timed_function("json_export")
+async def export_batch_report(calculation: BroilerCalculation, filename: str) -> str:
     """
     Export batch calculation to a JSON file
     """
-    filename = f"batch_{calculation.input_data.batch_id}_{calculation.input_data.shed_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     filepath = EXPORTS_DIR / filename
     
     # Create export data
@@ -442,180 +529,127 @@ async def export_batch_report(calculation: BroilerCalculation) -> str:
         "removal_batches": [batch.dict() for batch in calculation.input_data.removal_batches]
     }
     
-    # Write to file
-    with open(filepath, 'w') as f:
-        json.dump(export_data, f, indent=2, default=str)
+    # Write to file, replacing it only once complete
+    partial_path = EXPORTS_DIR / f"{filename}.{uuid.uuid4().hex}.part"
+    serialization.dump_file(export_data, partial_path)
+    os.replace(partial_path, filepath)
     
     return filename
 
-def generate_pdf_report(calculation: BroilerCalculation) -> str:
+async def _load_report_calculation(calculation_id: str) -> Optional[dict]:
+    calculation = await db.find_calculation_by_id(calculation_id)
+    return documents.response_dict(BroilerCalculation, calculation) if calculation else None
+
+# PDF reports render in worker processes; downloads wait this long for a pending render
+report_queue = report_jobs.ReportJobQueue(db, EXPORTS_DIR, _load_report_calculation)
+EXPORT_WAIT_SECONDS = 30
+
+# Export filenames per batch; the files themselves are generated on first download
+export_cache = ExportCache(EXPORTS_DIR)
+
+# Serialized read responses, valid until the database is next committed to
+response_cache = ReadCache(db.data_version)
+
+# Change events for clients connected to /api/events
+change_feed = ChangeFeed()
+
+# Figures read from their owners only when /metrics is scraped
+metrics.registry.counter("broiler_read_cache_lookups_total", "Read cache lookups by result",
+                         lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses}, ("result",))
+metrics.registry.counter("broiler_read_cache_evictions_total", "Read cache entries evicted to stay within its limits",
+                         lambda: response_cache.evictions)
+metrics.registry.counter("broiler_read_cache_invalidations_total", "Times a data change emptied the read cache",
+                         lambda: response_cache.invalidations)
+metrics.registry.gauge("broiler_read_cache_bytes", "Size of the cached response bodies",
+                       lambda: response_cache.stats()["bytes"])
+metrics.registry.gauge("broiler_report_jobs_queued", "PDF report jobs waiting for or being rendered",
+                       lambda: report_queue.depth)
+metrics.registry.gauge("broiler_event_subscribers", "Clients connected to /api/events",
+                       lambda: change_feed.subscriber_count)
+
+def _batch_summary(calculation_dict: dict) -> dict:
+    """A saved calculation as /api/calculations lists it"""
+    input_data = calculation_dict["input_data"]
+    return {
+        "batch_id": input_data["batch_id"],
+        "shed_number": input_data["shed_number"],
+        "handler_name": input_data["handler_name"],
+        "date": calculation_dict["created_at"],
+        "initial_chicks": input_data["initial_chicks"],
+        "fcr": calculation_dict["feed_conversion_ratio"],
+        "mortality_percent": calculation_dict["mortality_rate_percent"],
+        "cost_per_kg": calculation_dict["net_cost_per_kg"],
+    }
+
+async def _publish_batch_change(kind: str, batch_id: str, handler_names: List[str],
+                                calculation_dict: Optional[dict] = None):
+    """Publish a batch event, then the new performance of each handler it affects"""
+    if not change_feed.has_subscribers:
+        # Nobody is listening: skip building the payload and the handler performance
+        return
+    data = {"batch_id": batch_id}
+    if calculation_dict is not None:
+        data["batch"] = _batch_summary(calculation_dict)
+    change_feed.publish(kind, data)
+    for handler_name in dict.fromkeys(handler_names):
+        performance = await calculate_handler_performance(handler_name)
+        change_feed.publish("handler_performance.updated", {"handler_name": handler_name, "performance": performance})
+
+async def _cached_json(key, render) -> Response:
+    """JSON response for key from the read cache; render() produces the body on a miss"""
+    async def entry():
+        return await render(), {}
+    body, headers = await response_cache.get(key, entry)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _generate_export(filename: str) -> Optional[dict]:
     """
-    Generate a professional PDF report for batch closure
+    Generate a batch's current export that has not been downloaded yet. JSON is
+    written straight away; a PDF is rendered by a report job, which is returned.
     """
-    filename = f"batch_report_{calculation.input_data.batch_id}_{calculation.input_data.shed_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    filepath = EXPORTS_DIR / filename
-    
-    # Create PDF document
-    doc = SimpleDocTemplate(str(filepath), pagesize=A4)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.darkblue
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.darkgreen
-    )
-    
-    # Title and Header
-    story.append(Paragraph("BROILER BATCH CLOSURE REPORT", title_style))
-    story.append(Spacer(1, 10))
-    story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Batch Information
-    story.append(Paragraph("BATCH IDENTIFICATION", heading_style))
-    batch_data = [
-        ['Batch ID:', calculation.input_data.batch_id],
-        ['Shed Number:', calculation.input_data.shed_number],
-        ['Handler:', calculation.input_data.handler_name],
-        ['Report Generated:', datetime.now().strftime('%Y-%m-%d %H:%M')],
-    ]
-    
-    # Add dates if available
-    if hasattr(calculation.input_data, 'entry_date') and calculation.input_data.entry_date:
-        if isinstance(calculation.input_data.entry_date, datetime):
-            batch_data.insert(-1, ['Entry Date:', calculation.input_data.entry_date.strftime('%Y-%m-%d')])
-        else:
-            batch_data.insert(-1, ['Entry Date:', str(calculation.input_data.entry_date)])
-    
-    if hasattr(calculation.input_data, 'exit_date') and calculation.input_data.exit_date:
-        if isinstance(calculation.input_data.exit_date, datetime):
-            batch_data.insert(-1, ['Exit Date:', calculation.input_data.exit_date.strftime('%Y-%m-%d')])
-        else:
-            batch_data.insert(-1, ['Exit Date:', str(calculation.input_data.exit_date)])
-    
-    batch_table = Table(batch_data, colWidths=[2*inch, 3*inch])
-    batch_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-    ]))
-    story.append(batch_table)
-    story.append(Spacer(1, 20))
-    
-    # Performance Summary
-    story.append(Paragraph("PERFORMANCE SUMMARY", heading_style))
-    performance_data = [
-        ['Metric', 'Value', 'Status'],
-        ['Feed Conversion Ratio', f"{calculation.feed_conversion_ratio}", 
-         'Excellent' if calculation.feed_conversion_ratio <= 1.8 else 'Good' if calculation.feed_conversion_ratio <= 2.2 else 'Average'],
-        ['Mortality Rate', f"{calculation.mortality_rate_percent}%",
-         'Excellent' if calculation.mortality_rate_percent <= 3 else 'Good' if calculation.mortality_rate_percent <= 7 else 'Needs Attention'],
-        ['Weighted Average Age', f"{calculation.weighted_average_age} days", 'Optimal'],
-        ['Daily Weight Gain', f"{calculation.daily_weight_gain} kg", 
-         'Excellent' if calculation.daily_weight_gain >= 0.065 else 'Good' if calculation.daily_weight_gain >= 0.055 else 'Average'],
-        ['Net Cost per kg', f"${calculation.net_cost_per_kg:.2f}", 'Calculated']
-    ]
-    
-    perf_table = Table(performance_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch])
-    perf_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
-    ]))
-    story.append(perf_table)
-    story.append(Spacer(1, 20))
-    
-    # Production Data
-    story.append(Paragraph("PRODUCTION DATA", heading_style))
-    production_data = [
-        ['Parameter', 'Count/Amount'],
-        ['Initial Chicks', f"{calculation.input_data.initial_chicks:,}"],
-        ['Chicks Died', f"{calculation.input_data.chicks_died:,}"],
-        ['Surviving Chicks', f"{calculation.surviving_chicks:,}"],
-        ['Viability (Caught)', f"{calculation.viability:,}"],
-        ['Missing Chicks', f"{calculation.missing_chicks:,}"],
-        ['Total Weight Produced', f"{calculation.total_weight_produced_kg:,} kg"],
-        ['Total Feed Consumed', f"{calculation.total_feed_consumed_kg:,} kg"],
-        ['Average Weight per Chick', f"{calculation.average_weight_per_chick:.2f} kg"],
-        ['Viability Rate', f"{(calculation.viability / calculation.input_data.initial_chicks * 100):.1f}%"],
-    ]
-    
-    prod_table = Table(production_data, colWidths=[3*inch, 2*inch])
-    prod_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
-    ]))
-    story.append(prod_table)
-    
-    # Generate PDF
-    doc.build(story)
-    
-    return filename
+    found = export_cache.lookup(filename)
+    if not found:
+        return None
+    entry, kind = found
+    calculation = await db.find_calculation_by_id(entry["calculation_id"])
+    if not calculation:
+        return None
+    calculation = BroilerCalculation(**calculation)
+    if kind == "json":
+        await export_batch_report(calculation, filename)
+        return None
+    return await report_queue.submit(calculation.dict(), filename)
 
 # API Routes
 @api_router.get("/")
 async def root():
     return {"message": "Offline Broiler Farm Management System API", "status": "running"}
 
-@api_router.post("/calculate", response_model=CalculationResult)
-async def calculate_broiler_costs(input_data: BroilerCalculationInput):
-    """Calculate enhanced broiler chicken production costs and metrics"""
-    # Validate input
+def _input_validation_error(input_data: BroilerCalculationInput) -> Optional[str]:
+    """Return the validation message for an invalid calculation input, or None"""
     if input_data.initial_chicks <= 0:
-        raise HTTPException(status_code=400, detail="Initial chicks must be greater than 0")
+        return "Initial chicks must be greater than 0"
     if input_data.chicks_died > input_data.initial_chicks:
-        raise HTTPException(status_code=400, detail="Chicks died cannot be more than initial chicks")
+        return "Chicks died cannot be more than initial chicks"
     if not input_data.removal_batches:
-        raise HTTPException(status_code=400, detail="At least one removal batch is required")
-    
-    # Check if batch ID already exists
-    existing_batch = await db.find_calculation_by_batch_id(input_data.batch_id)
-    if existing_batch:
-        raise HTTPException(status_code=400, detail=f"Batch ID '{input_data.batch_id}' already exists")
-    
-    # Validate removal batches
+        return "At least one removal batch is required"
     total_removed = sum(batch.quantity for batch in input_data.removal_batches)
-    surviving_chicks = input_data.initial_chicks - input_data.chicks_died
-    if total_removed > surviving_chicks:
-        raise HTTPException(status_code=400, detail="Total removed chicks cannot exceed surviving chicks")
-    
-    # Validate removal batches
+    if total_removed > input_data.initial_chicks - input_data.chicks_died:
+        return "Total removed chicks cannot exceed surviving chicks"
     for i, batch in enumerate(input_data.removal_batches):
         if batch.quantity <= 0:
-            raise HTTPException(status_code=400, detail=f"Batch {i+1}: Quantity must be greater than 0")
+            return f"Batch {i+1}: Quantity must be greater than 0"
         if batch.total_weight_kg <= 0:
-            raise HTTPException(status_code=400, detail=f"Batch {i+1}: Weight must be greater than 0")
+            return f"Batch {i+1}: Weight must be greater than 0"
+    return None
+
+@api_router.post("/calculate", response_model=CalculationResult)
+async def calculate_broiler_costs(input_data: BroilerCalculationInput):
+    """Calculate enhanced broiler chicken production costs and metrics"""
+    # Validate input
+    error = _input_validation_error(input_data)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
     try:
         # Calculate metrics
@@ -624,74 +658,247 @@ async def calculate_broiler_costs(input_data: BroilerCalculationInput):
         # Generate insights
         insights = generate_enhanced_insights(calculation)
         
-        # Add handler to database if not exists
-        existing_handler = await db.find_handler_by_name(input_data.handler_name)
-        if not existing_handler:
-            handler_data = {"name": input_data.handler_name}
-            await db.insert_handler(handler_data)
-        
-        # Save calculation to database
+        # Save calculation to database, adding its handler if not exists; the
+        # UNIQUE batch_id column rejects a batch ID that is already saved
         calculation_dict = calculation.dict()
         await db.insert_calculation(calculation_dict)
         
-        # Export batch report (JSON and PDF)
-        json_filename = await export_batch_report(calculation)
-        pdf_filename = generate_pdf_report(calculation)
+        # Name the batch reports; they are generated on first download
+        export = export_cache.register(calculation_dict)
+        await _publish_batch_change("batch.created", input_data.batch_id, [input_data.handler_name], calculation_dict)
         
         # Add export info to insights
-        insights.append(f"📄 JSON report exported as: {json_filename}")
-        insights.append(f"📄 PDF report exported as: {pdf_filename}")
+        insights.append(f"📄 JSON report exported as: {export['json']}")
+        insights.append(f"📄 PDF report exported as: {export['pdf']}")
         
         return CalculationResult(calculation=calculation, insights=insights)
         
+    except DuplicateBatchError:
+        raise HTTPException(status_code=400, detail=f"Batch ID '{input_data.batch_id}' already exists")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
 
-@api_router.get("/calculations", response_model=List[BatchSummary])
-async def get_calculations():
-    """Get all saved calculations summary"""
-    calculations = await db.get_all_calculations()
+@api_router.post("/calculate/bulk", response_model=BulkCalculationResult)
+async def calculate_broiler_costs_bulk(inputs: List[BroilerCalculationInput]):
+    """Calculate metrics for many batches in one request (results are not saved)"""
+    for index, input_data in enumerate(inputs, 1):
+        error = _input_validation_error(input_data)
+        if error:
+            raise HTTPException(status_code=400, detail=f"Input {index} ('{input_data.batch_id}'): {error}")
+    
+    try:
+        calculations = calculate_enhanced_broiler_metrics_bulk(inputs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+    
+    # Serialize the rows in one pass; the response_model path would re-validate every row
+    content = serialization.dumps({"calculations": calculations})
+    return Response(content=content, media_type="application/json")
+
+def _encode_cursor(created_at: str, calculation_id: str) -> str:
+    key = json.dumps([created_at, calculation_id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, calculation_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(calculation_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, calculation_id
+
+async def _calculation_summaries_page(limit: int, after=None, **filters):
+    """One newest-first page of BatchSummary rows and the cursor of the next page (None on the last)"""
+    # Fetch one extra row to know whether another page follows
+    calculations = await db.get_calculation_summaries(limit=limit + 1, after=after, **filters)
+    next_cursor = None
+    if len(calculations) > limit:
+        calculations = calculations[:limit]
+        last = calculations[-1]
+        next_cursor = _encode_cursor(last["created_at"], last["id"])
     summaries = []
     
     for calc in calculations:
         try:
-            summary = BatchSummary(
-                batch_id=calc["input_data"]["batch_id"],
-                shed_number=calc["input_data"]["shed_number"],
-                handler_name=calc["input_data"]["handler_name"],
-                date=datetime.fromisoformat(calc["created_at"]),
-                initial_chicks=calc["input_data"]["initial_chicks"],
-                fcr=calc["feed_conversion_ratio"],
-                mortality_percent=calc["mortality_rate_percent"],
-                cost_per_kg=calc["net_cost_per_kg"]
-            )
-            summaries.append(summary)
+            summary = {
+                "batch_id": calc["batch_id"],
+                "shed_number": calc["shed_number"],
+                "handler_name": calc["handler_name"],
+                "date": datetime.fromisoformat(calc["created_at"]),
+                "initial_chicks": calc["initial_chicks"],
+                "fcr": calc["feed_conversion_ratio"],
+                "mortality_percent": calc["mortality_rate_percent"],
+                "cost_per_kg": calc["net_cost_per_kg"]
+            }
         except (KeyError, TypeError, ValueError):
             continue
+        if None not in summary.values():
+            summaries.append(summary)
+    
+    return summaries, next_cursor
+
+@api_router.get("/calculations", response_model=List[BatchSummary])
+async def get_calculations(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    shed_number: Optional[str] = None,
+    handler_name: Optional[str] = None,
+    entry_from: Optional[date] = None,
+    entry_to: Optional[date] = None,
+    exit_from: Optional[date] = None,
+    exit_to: Optional[date] = None,
+):
+    """Get saved calculation summaries, newest first
+    
+    Pass the X-Next-Cursor header of one page as cursor to get the next one.
+    """
+    async def render():
+        summaries, next_cursor = await _calculation_summaries_page(
+            limit,
+            after=_decode_cursor(cursor) if cursor else None,
+            shed_number=shed_number,
+            handler_name=handler_name,
+            entry_from=entry_from,
+            entry_to=entry_to,
+            exit_from=exit_from,
+            exit_to=exit_to,
+        )
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        # The typed columns already match BatchSummary, so serialize the rows directly
+        return serialization.dumps(summaries), headers
     
-    return summaries
+    key = ("calculations", limit, cursor, shed_number, handler_name, entry_from, entry_to, exit_from, exit_to)
+    body, headers = await response_cache.get(key, render)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @api_router.get("/handlers/names")
 async def get_handler_names():
     """Get all handler names for dropdown"""
-    return await db.get_handler_names()
+    async def render():
+        return serialization.dumps(await db.get_handler_names())
+    return await _cached_json("handler_names", render)
 
-@api_router.get("/handlers/performance")
-async def get_handlers_performance():
-    """Get performance analysis for all handlers"""
-    handlers = await db.get_all_handlers()
-    performances = []
-    
-    for handler in handlers:
-        performance = await calculate_handler_performance(handler["name"])
-        if performance:
-            performances.append(performance)
+async def _ranked_handler_performance() -> List[HandlerPerformance]:
+    """Performance of every handler, best score first"""
+    performances = await calculate_all_handlers_performance()
     
     # Sort by performance score (descending)
     performances.sort(key=lambda x: x.performance_score, reverse=True)
     
     return performances
 
+@api_router.get("/handlers/performance")
+async def get_handlers_performance():
+    """Get performance analysis for all handlers"""
+    async def render():
+        return serialization.dumps(await _ranked_handler_performance())
+    return await _cached_json("handler_performance", render)
+
+@api_router.get("/sheds/performance", response_model=List[ShedPerformance])
+async def get_sheds_performance():
+    """Batch averages and totals per shed, aggregated in SQL"""
+    async def render():
+        aggregates = await db.get_performance_aggregates("shed_number")
+        return serialization.dumps([_shed_performance_from_aggregates(row) for row in aggregates])
+    return await _cached_json("shed_performance", render)
+
+@api_router.get("/analytics/cost-breakdown", response_model=List[CostBreakdownTotals])
+async def get_cost_breakdown_totals(
+    group_by: Optional[str] = Query(None, pattern="^(handler_name|shed_number)$"),
+    entry_from: Optional[date] = None,
+    entry_to: Optional[date] = None,
+):
+    """Cost components and their share of total cost, for all batches or per handler or shed"""
+    async def render():
+        rows = await db.get_cost_breakdown_totals(group_by, entry_from, entry_to)
+        totals = []
+        for row in rows:
+            values = {
+                field: round(row[field] or 0, 1 if field.endswith("_percent") else 2)
+                for field in CostBreakdown.model_fields
+            }
+            totals.append(CostBreakdownTotals(
+                group=row[group_by] if group_by else None,
+                total_batches=row["total_batches"],
+                total_cost=round(row["total_cost"] or 0, 2),
+                **values
+            ))
+        return serialization.dumps(totals)
+    return await _cached_json(("cost_breakdown", group_by, entry_from, entry_to), render)
+
+# First page of calculations in the dashboard bootstrap
+DASHBOARD_PAGE_SIZE = 50
+
+def _etag_headers(body: bytes) -> Dict[str, str]:
+    """Headers letting clients revalidate body by a hash of its content"""
+    return {"ETag": f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', "Cache-Control": "no-cache"}
+
+def _etag_response(request: Request, body: bytes, headers: Dict[str, str]) -> Response:
+    """JSON response for body, or a 304 when If-None-Match names its ETag"""
+    etag = headers["ETag"]
+    known = {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}
+    if etag in known or f"W/{etag}" in known:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/dashboard")
+async def get_dashboard(request: Request):
+    """Everything the dashboard loads at start in one response, queried concurrently
+    
+    An unchanged dashboard costs the client a 304.
+    """
+    async def render():
+        (summaries, next_cursor), handlers, sheds, shed_numbers, performances = await asyncio.gather(
+            _calculation_summaries_page(DASHBOARD_PAGE_SIZE),
+            db.get_all_handlers(),
+            db.get_all_sheds(),
+            db.get_shed_numbers(),
+            _ranked_handler_performance(),
+        )
+        handlers = [documents.response_dict(Handler, handler) for handler in handlers]
+        body = serialization.dumps({
+            "calculations": summaries,
+            "calculations_next_cursor": next_cursor,
+            "handlers": handlers,
+            "handler_names": [handler["name"] for handler in handlers],
+            "sheds": [documents.response_dict(Shed, shed) for shed in sheds],
+            "shed_numbers": shed_numbers,
+            "handler_performance": performances,
+        })
+        return body, _etag_headers(body)
+    
+    body, headers = await response_cache.get("dashboard", render)
+    return _etag_response(request, body, headers)
+
+@api_router.get("/admin/cache")
+async def get_cache_stats():
+    """Size and hit/miss counts of the read response cache"""
+    return response_cache.stats()
+
+@api_router.get("/admin/profiles")
+async def get_profiles():
+    """Request profiles recorded with PROFILING_ENABLED, newest first"""
+    return profile_store.list()
+
+@api_router.get("/admin/profiles/{filename}")
+async def download_profile(filename: str):
+    """Download a profile's text report (.txt) or pstats data (.prof)"""
+    path = profile_store.path(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/plain" if filename.endswith(".txt") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=filename)
+
+@api_router.get("/events")
+async def stream_events(request: Request):
+    """Server-Sent Events feed of batch, handler, shed and handler performance changes (see events.py)"""
+    return StreamingResponse(
+        change_feed.stream(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @api_router.get("/handlers/{handler_name}/performance")
 async def get_handler_performance_endpoint(handler_name: str):
     """Get performance analysis for a specific handler"""
@@ -704,8 +911,10 @@ async def get_handler_performance_endpoint(handler_name: str):
 @api_router.get("/handlers")
 async def get_handlers():
     """Get all handlers"""
-    handlers_data = await db.get_all_handlers()
-    return [Handler(**handler) for handler in handlers_data]
+    async def render():
+        handlers_data = await db.get_all_handlers()
+        return documents.to_json_list_bytes(Handler, handlers_data)
+    return await _cached_json("handlers", render)
 
 @api_router.post("/handlers", response_model=Handler)
 async def create_handler(handler_data: HandlerCreate):
@@ -721,7 +930,9 @@ async def create_handler(handler_data: HandlerCreate):
     handler_dict['created_at'] = datetime.now()
     handler_dict['updated_at'] = datetime.now()
     
-    return Handler(**handler_dict)
+    handler = Handler(**handler_dict)
+    change_feed.publish("handler.created", {"handler": handler})
+    return handler
 
 @api_router.get("/handlers/{handler_id}", response_model=Handler)
 async def get_handler(handler_id: str):
@@ -729,7 +940,7 @@ async def get_handler(handler_id: str):
     handler = await db.find_handler_by_id(handler_id)
     if not handler:
         raise HTTPException(status_code=404, detail="Handler not found")
-    return Handler(**handler)
+    return Response(content=documents.to_json_bytes(Handler, handler), media_type="application/json")
 
 @api_router.put("/handlers/{handler_id}", response_model=Handler)
 async def update_handler(handler_id: str, handler_data: HandlerUpdate):
@@ -752,8 +963,9 @@ async def update_handler(handler_id: str, handler_data: HandlerUpdate):
     await db.update_handler(handler_id, update_data)
     
     # Return updated handler
-    updated_handler = await db.find_handler_by_id(handler_id)
-    return Handler(**updated_handler)
+    updated_handler = Handler(**await db.find_handler_by_id(handler_id))
+    change_feed.publish("handler.updated", {"handler": updated_handler})
+    return updated_handler
 
 @api_router.delete("/handlers/{handler_id}")
 async def delete_handler(handler_id: str):
@@ -774,14 +986,17 @@ async def delete_handler(handler_id: str):
     if not deleted:
         raise HTTPException(status_code=404, detail="Handler not found")
     
+    change_feed.publish("handler.deleted", {"id": handler_id})
     return {"message": "Handler deleted successfully"}
 
 # Shed Management Endpoints
 @api_router.get("/admin/sheds", response_model=List[Shed])
 async def get_all_sheds():
     """Get all sheds with full details"""
-    sheds_data = await db.get_all_sheds()
-    return [Shed(**shed) for shed in sheds_data]
+    async def render():
+        sheds_data = await db.get_all_sheds()
+        return documents.to_json_list_bytes(Shed, sheds_data)
+    return await _cached_json("admin_sheds", render)
 
 @api_router.post("/admin/sheds", response_model=Shed)
 async def create_shed(shed_data: ShedCreate):
@@ -797,7 +1012,9 @@ async def create_shed(shed_data: ShedCreate):
     shed_dict['created_at'] = datetime.now()
     shed_dict['updated_at'] = datetime.now()
     
-    return Shed(**shed_dict)
+    shed = Shed(**shed_dict)
+    change_feed.publish("shed.created", {"shed": shed})
+    return shed
 
 @api_router.get("/admin/sheds/{shed_id}", response_model=Shed)
 async def get_shed(shed_id: str):
@@ -805,7 +1022,7 @@ async def get_shed(shed_id: str):
     shed = await db.find_shed_by_id(shed_id)
     if not shed:
         raise HTTPException(status_code=404, detail="Shed not found")
-    return Shed(**shed)
+    return Response(content=documents.to_json_bytes(Shed, shed), media_type="application/json")
 
 @api_router.put("/admin/sheds/{shed_id}", response_model=Shed)
 async def update_shed(shed_id: str, shed_data: ShedUpdate):
@@ -828,8 +1045,9 @@ async def update_shed(shed_id: str, shed_data: ShedUpdate):
     await db.update_shed(shed_id, update_data)
     
     # Return updated shed
-    updated_shed = await db.find_shed_by_id(shed_id)
-    return Shed(**updated_shed)
+    updated_shed = Shed(**await db.find_shed_by_id(shed_id))
+    change_feed.publish("shed.updated", {"shed": updated_shed})
+    return updated_shed
 
 @api_router.delete("/admin/sheds/{shed_id}")
 async def delete_shed(shed_id: str):
@@ -843,6 +1061,7 @@ async def delete_shed(shed_id: str):
     if not deleted:
         raise HTTPException(status_code=404, detail="Shed not found")
     
+    change_feed.publish("shed.deleted", {"id": shed_id})
     return {"message": "Shed deleted successfully"}
 
 @api_router.put("/batches/{batch_id}")
@@ -853,26 +1072,10 @@ async def update_batch(batch_id: str, input_data: BroilerCalculationInput):
     if not existing_batch:
         raise HTTPException(status_code=404, detail=f"Batch ID '{batch_id}' not found")
     
-    # Validate input (same as create)
-    if input_data.initial_chicks <= 0:
-        raise HTTPException(status_code=400, detail="Initial chicks must be greater than 0")
-    if input_data.chicks_died > input_data.initial_chicks:
-        raise HTTPException(status_code=400, detail="Chicks died cannot be more than initial chicks")
-    if not input_data.removal_batches:
-        raise HTTPException(status_code=400, detail="At least one removal batch is required")
-    
-    # Validate removal batches
-    total_removed = sum(batch.quantity for batch in input_data.removal_batches)
-    surviving_chicks = input_data.initial_chicks - input_data.chicks_died
-    if total_removed > surviving_chicks:
-        raise HTTPException(status_code=400, detail="Total removed chicks cannot exceed surviving chicks")
-    
-    # Validate removal batches
-    for i, batch in enumerate(input_data.removal_batches):
-        if batch.quantity <= 0:
-            raise HTTPException(status_code=400, detail=f"Batch {i+1}: Quantity must be greater than 0")
-        if batch.total_weight_kg <= 0:
-            raise HTTPException(status_code=400, detail=f"Batch {i+1}: Weight must be greater than 0")
+    # Validate input
+    error = _input_validation_error(input_data)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
     try:
         # Calculate metrics
@@ -883,24 +1086,21 @@ async def update_batch(batch_id: str, input_data: BroilerCalculationInput):
         # Generate insights
         insights = generate_enhanced_insights(calculation)
         
-        # Update handler if name changed
-        if input_data.handler_name != existing_batch["input_data"]["handler_name"]:
-            existing_handler = await db.find_handler_by_name(input_data.handler_name)
-            if not existing_handler:
-                handler_data = {"name": input_data.handler_name}
-                await db.insert_handler(handler_data)
-        
-        # Update the batch in database
+        # Update the batch in database, adding its handler if not exists
         calculation_dict = calculation.dict()
         await db.update_calculation(batch_id, calculation_dict)
         
-        # Export updated batch report
-        json_filename = await export_batch_report(calculation)
-        pdf_filename = generate_pdf_report(calculation)
+        # Unchanged batches keep their existing reports
+        export = export_cache.register(calculation_dict)
+        await _publish_batch_change(
+            "batch.updated", batch_id,
+            [existing_batch["input_data"]["handler_name"], input_data.handler_name],
+            calculation_dict,
+        )
         
         # Add export info to insights
-        insights.append(f"📄 Updated JSON report exported as: {json_filename}")
-        insights.append(f"📄 Updated PDF report exported as: {pdf_filename}")
+        insights.append(f"📄 Updated JSON report exported as: {export['json']}")
+        insights.append(f"📄 Updated PDF report exported as: {export['pdf']}")
         
         return CalculationResult(calculation=calculation, insights=insights)
         
@@ -914,7 +1114,8 @@ async def get_batch_details(batch_id: str):
     if not calculation:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    return BroilerCalculation(**calculation)
+    # Stored batches are served as written unless they predate the current schema
+    return Response(content=documents.to_json_bytes(BroilerCalculation, calculation), media_type="application/json")
 
 @api_router.get("/batches/{batch_id}/export-pdf")
 async def regenerate_batch_pdf(batch_id: str):
@@ -923,20 +1124,43 @@ async def regenerate_batch_pdf(batch_id: str):
     if not calculation:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    # Convert back to calculation object
-    calc_obj = BroilerCalculation(**calculation)
-    
-    # Generate new PDF
-    pdf_filename = generate_pdf_report(calc_obj)
+    # Reuse the batch's current report; it is rendered on first download
+    export = export_cache.entry_for(batch_id) or export_cache.register(documents.response_dict(BroilerCalculation, calculation))
     
-    return {"message": "PDF regenerated successfully", "filename": pdf_filename}
+    return {"message": "PDF report ready", "filename": export["pdf"]}
+
+@api_router.get("/jobs/{job_id}", response_model=ReportJob)
+async def get_report_job(job_id: str):
+    """Get the status of a background report job"""
+    job = await report_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @api_router.get("/export/{filename}")
 async def download_export(filename: str):
     """Download exported batch report (JSON or PDF)"""
+    if filename == export_cache.index_path.name:
+        raise HTTPException(status_code=404, detail="Export file not found")
     filepath = EXPORTS_DIR / filename
     if not filepath.exists():
-        raise HTTPException(status_code=404, detail="Export file not found")
+        # Generate the export on first download; wait for a PDF render, or
+        # report the job if it takes too long
+        job = await report_queue.find_by_filename(filename)
+        if not (job and job["status"] in report_jobs.UNFINISHED):
+            job = await _generate_export(filename) or job
+        if job and job["status"] in report_jobs.UNFINISHED:
+            job = await report_queue.wait(job["id"], EXPORT_WAIT_SECONDS)
+        if job and job["status"] in report_jobs.UNFINISHED:
+            return JSONResponse(
+                status_code=202,
+                content={"detail": "Report is still being generated", "job": ReportJob(**job).model_dump(mode="json")},
+                headers={"Retry-After": "5"}
+            )
+        if not filepath.exists():
+            if job and job["status"] == report_jobs.FAILED:
+                raise HTTPException(status_code=500, detail=f"Report generation failed: {job['error']}")
+            raise HTTPException(status_code=404, detail="Export file not found")
     
     # Determine content type based on file extension
     if filename.endswith('.pdf'):
@@ -949,27 +1173,41 @@ async def download_export(filename: str):
 @api_router.get("/sheds")
 async def get_sheds():
     """Get all shed numbers"""
-    return await db.get_shed_numbers()
+    async def render():
+        return serialization.dumps(await db.get_shed_numbers())
+    return await _cached_json("shed_numbers", render)
 
 @api_router.delete("/batches/{batch_id}")
 async def delete_batch_by_id(batch_id: str):
     """Delete a batch by batch ID"""
+    calculation = await db.find_calculation_by_batch_id(batch_id)
     deleted = await db.delete_calculation_by_batch_id(batch_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Batch not found")
+    export_cache.forget(batch_id)
+    await _publish_batch_change("batch.deleted", batch_id, [calculation["input_data"]["handler_name"]] if calculation else [])
     return {"message": "Batch deleted successfully"}
 
 @api_router.delete("/calculations/{calculation_id}")
 async def delete_calculation(calculation_id: str):
     """Delete a specific calculation"""
+    calculation = await db.find_calculation_by_id(calculation_id)
     deleted = await db.delete_calculation_by_id(calculation_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Calculation not found")
+    if calculation:
+        export_cache.forget(calculation["input_data"]["batch_id"])
+        await _publish_batch_change("batch.deleted", calculation["input_data"]["batch_id"], [calculation["input_data"]["handler_name"]])
     return {"message": "Calculation deleted successfully"}
 
 # Include the API router
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request latencies, subsystem timings and cache and queue figures in Prometheus text format"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -977,8 +1215,21 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Logs and counts callbacks that block the event loop (see loop_watchdog.py)
+loop_block_threshold = loop_watchdog.threshold_from_environment()
+watchdog = loop_watchdog.LoopWatchdog(loop_block_threshold) if loop_block_threshold else None
+if watchdog:
+    app.add_middleware(loop_watchdog.WatchdogMiddleware, watchdog=watchdog)
+
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware, store=profile_store)
+
+# Outermost, so request latency includes the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -986,6 +1237,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_report_jobs():
+    await report_queue.start()
+
+@app.on_event("startup")
+async def start_watchdog():
+    if watchdog:
+        await watchdog.start()
+
+@app.on_event("shutdown")
+async def shutdown_db():
+    if watchdog:
+        await watchdog.stop()
+    await report_queue.stop()
+    db.close()
+
 if __name__ == "__main__":
+    # Report workers re-launch this executable when frozen with PyInstaller
+    import multiprocessing
+    multiprocessing.freeze_support()
+    
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8001)
\ No newline at end of file
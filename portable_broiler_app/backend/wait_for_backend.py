@@ -0,0 +1,36 @@
+"""
+Wait until the backend answers GET /api/ (used by the start scripts instead of
+a fixed delay). Exits with status 1 if it has not answered within the timeout.
+
+Usage:
+    python wait_for_backend.py [--url http://127.0.0.1:8001/api/] [--timeout 30]
+"""
+import argparse
+import sys
+import time
+import urllib.request
+
+POLL_INTERVAL = 0.05
+
+
+def wait(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8001/api/")
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+    if not wait(args.url, args.timeout):
+        print(f"Backend did not answer at {args.url} within {args.timeout:g} seconds")
+        sys.exit(1)
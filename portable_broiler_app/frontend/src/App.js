@@ -1,10 +1,24 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import "./App.css";
 import axios from "axios";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Event kinds published on /api/events
+const CHANGE_EVENTS = [
+  'batch.created', 'batch.updated', 'batch.deleted',
+  'handler.created', 'handler.updated', 'handler.deleted',
+  'shed.created', 'shed.updated', 'shed.deleted',
+  'handler_performance.updated', 'resync'
+];
+
+// Replace the item with the same id (or add it), keeping the list sorted by key
+const upsertSorted = (items, item, key) => (
+  [...items.filter(existing => existing.id !== item.id), item]
+    .sort((a, b) => (a[key] < b[key] ? -1 : a[key] > b[key] ? 1 : 0))
+);
+
 console.log('Frontend starting with API URL:', API);
 
 function App() {
@@ -49,10 +63,11 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [history, setHistory] = useState([]);
-  const [handlers, setHandlers] = useState([]);
   const [handlerPerformance, setHandlerPerformance] = useState([]);
   const [sheds, setSheds] = useState([]);
   const [allHandlers, setAllHandlers] = useState([]);
+  // Handler names for the dropdowns, in the handler list's (name) order
+  const handlers = allHandlers.map(handler => handler.name);
   const [allSheds, setAllSheds] = useState([]);
   const [activeTab, setActiveTab] = useState('basic');
   const [showPerformanceTab, setShowPerformanceTab] = useState(false);
@@ -61,31 +76,104 @@ function App() {
   const [selectedBatch, setSelectedBatch] = useState(null);
   const [editingBatch, setEditingBatch] = useState(false);
 
-  // Load calculation history on component mount
+  // Whether the change feed is connected; while it is, changes (ours included)
+  // arrive as events and lists are patched instead of reloaded
+  const liveUpdates = useRef(false);
+  const knownHandlers = useRef([]);
+  knownHandlers.current = handlers;
+
+  // Load calculation history on component mount, then follow changes
   useEffect(() => {
-    loadHistory();
-    loadHandlers();
-    loadSheds();
-    loadHandlerPerformance();
-    loadAllHandlers();
-    loadAllSheds();
+    loadDashboard();
+
+    const source = new EventSource(`${API}/events`);
+    source.onopen = () => { liveUpdates.current = true; };
+    source.onerror = () => { liveUpdates.current = false; };
+    CHANGE_EVENTS.forEach(kind => {
+      source.addEventListener(kind, (event) => applyChange(kind, JSON.parse(event.data)));
+    });
+    return () => source.close();
   }, []);
 
-  const loadHistory = async () => {
+  // Patch the loaded lists with a change event from the server
+  const applyChange = (kind, data) => {
+    switch (kind) {
+      case 'batch.created':
+      case 'batch.updated': {
+        const batch = data.batch;
+        setHistory(prev => {
+          const index = prev.findIndex(item => item.batch_id === data.batch_id);
+          if (index === -1) return [batch, ...prev];
+          return prev.map((item, i) => (i === index ? batch : item));
+        });
+        setSheds(prev => (prev.includes(batch.shed_number) ? prev : [...prev, batch.shed_number].sort()));
+        if (!knownHandlers.current.includes(batch.handler_name)) {
+          // Saving the batch registered a new handler
+          loadAllHandlers();
+        }
+        break;
+      }
+      case 'batch.deleted':
+        setHistory(prev => prev.filter(item => item.batch_id !== data.batch_id));
+        // The deleted batch may have been its shed's last one
+        loadSheds();
+        break;
+      case 'handler.created':
+      case 'handler.updated':
+        setAllHandlers(prev => upsertSorted(prev, data.handler, 'name'));
+        break;
+      case 'handler.deleted':
+        setAllHandlers(prev => prev.filter(item => item.id !== data.id));
+        break;
+      case 'shed.created':
+      case 'shed.updated':
+        setAllSheds(prev => upsertSorted(prev, data.shed, 'number'));
+        break;
+      case 'shed.deleted':
+        setAllSheds(prev => prev.filter(item => item.id !== data.id));
+        break;
+      case 'handler_performance.updated':
+        setHandlerPerformance(prev => {
+          const others = prev.filter(item => item.handler_name !== data.handler_name);
+          if (!data.performance) return others;
+          return [...others, data.performance].sort((a, b) => b.performance_score - a.performance_score);
+        });
+        break;
+      default:
+        // resync: too many changes were missed to patch
+        loadDashboard();
+    }
+  };
+
+  // Reload with the given loaders unless the change will arrive as an event
+  const refreshUnlessLive = (...loaders) => {
+    if (!liveUpdates.current) {
+      loaders.forEach(load => load());
+    }
+  };
+
+  // Everything shown on start comes from one request. The server sends an
+  // ETag, so the browser revalidates an unchanged dashboard with a 304.
+  const loadDashboard = async () => {
     try {
-      const response = await axios.get(`${API}/calculations`);
-      setHistory(response.data);
+      const response = await axios.get(`${API}/dashboard`);
+      const dashboard = response.data;
+      setHistory(dashboard.calculations);
+      setAllHandlers(dashboard.handlers);
+      setSheds(dashboard.shed_numbers);
+      setAllSheds(dashboard.sheds);
+      setHandlerPerformance(dashboard.handler_performance);
     } catch (err) {
-      console.error('Error loading history:', err);
+      console.error('Error loading dashboard:', err);
     }
   };
 
-  const loadHandlers = async () => {
+  const loadHistory = async () => {
     try {
-      const response = await axios.get(`${API}/handlers/names`);
-      setHandlers(response.data);
+      const response = await axios.get(`${API}/calculations`);
+      setHistory(response.data);
     } catch (err) {
-      console.error('Error loading handlers:', err);
+      console.error('Error loading history:', err);
     }
   };
 
@@ -116,16 +204,6 @@ function App() {
     }
   };
 
-  const loadHandlerPerformance = async () => {
-    try {
-      const response = await axios.get(`${API}/handlers/performance`);
-      setHandlerPerformance(response.data);
-    } catch (err) {
-      console.error('Error loading handler performance:', err);
-      setHandlerPerformance([]); // Set empty array on error
-    }
-  };
-
   const handleInputChange = (e) => {
     const { name, value } = e.target;
     setFormData(prev => ({
@@ -265,12 +343,7 @@ function App() {
       setResult(response.data);
       
       // Reload history and performance data
-      loadHistory();
-      loadHandlers();
-      loadSheds();
-      loadHandlerPerformance();
-      loadAllHandlers();
-      loadAllSheds();
+      refreshUnlessLive(loadDashboard);
       
     } catch (err) {
       setError(err.response?.data?.detail || 'An error occurred during calculation');
@@ -314,8 +387,7 @@ function App() {
   const createHandler = async (handlerData) => {
     try {
       await axios.post(`${API}/handlers`, handlerData);
-      loadAllHandlers();
-      loadHandlers();
+      refreshUnlessLive(loadAllHandlers);
     } catch (err) {
       alert(err.response?.data?.detail || 'Error creating handler');
     }
@@ -324,8 +396,7 @@ function App() {
   const updateHandler = async (handlerId, handlerData) => {
     try {
       await axios.put(`${API}/handlers/${handlerId}`, handlerData);
-      loadAllHandlers();
-      loadHandlers();
+      refreshUnlessLive(loadAllHandlers);
     } catch (err) {
       alert(err.response?.data?.detail || 'Error updating handler');
     }
@@ -343,8 +414,7 @@ function App() {
       const response = await axios.delete(`${API}/handlers/${handlerId}`);
       console.log('Delete response:', response);
       alert('Handler deleted successfully');
-      await loadAllHandlers();
-      await loadHandlers();
+      refreshUnlessLive(loadAllHandlers);
     } catch (err) {
       console.error('Delete error details:', err);
       console.error('Error response:', err.response);
@@ -356,8 +426,7 @@ function App() {
   const createShed = async (shedData) => {
     try {
       await axios.post(`${API}/admin/sheds`, shedData);
-      loadAllSheds();
-      loadSheds();
+      refreshUnlessLive(loadAllSheds, loadSheds);
     } catch (err) {
       alert(err.response?.data?.detail || 'Error creating shed');
     }
@@ -366,8 +435,7 @@ function App() {
   const updateShed = async (shedId, shedData) => {
     try {
       await axios.put(`${API}/admin/sheds/${shedId}`, shedData);
-      loadAllSheds();
-      loadSheds();
+      refreshUnlessLive(loadAllSheds, loadSheds);
     } catch (err) {
       alert(err.response?.data?.detail || 'Error updating shed');
     }
@@ -385,8 +453,7 @@ function App() {
       const response = await axios.delete(`${API}/admin/sheds/${shedId}`);
       console.log('Delete response:', response);
       alert('Shed deleted successfully');
-      await loadAllSheds();
-      await loadSheds();
+      refreshUnlessLive(loadAllSheds, loadSheds);
     } catch (err) {
       console.error('Delete error details:', err);
       console.error('Error response:', err.response);
@@ -479,7 +546,7 @@ function App() {
       const response = await axios.delete(`${API}/batches/${batchId}`);
       console.log('Delete response:', response);
       alert('Batch deleted successfully');
-      await loadHistory();
+      refreshUnlessLive(loadHistory);
     } catch (err) {
       console.error('Delete error details:', err);
       console.error('Error response:', err.response);
@@ -6,10 +6,10 @@ REM Start Python backend
 echo Starting backend server...
 cd backend
 start /B python server.py
-cd ..
 
 REM Wait for backend to start
-timeout /t 5 /nobreak > nul
+python wait_for_backend.py
+cd ..
 
 REM Start frontend (simple HTTP server)
 echo Starting frontend...
@@ -8,10 +8,10 @@ echo "Starting backend server..."
 cd backend
 python3 server.py &
 BACKEND_PID=$!
-cd ..
 
 # Wait for backend to start
-sleep 5
+python3 wait_for_backend.py
+cd ..
 
 # Start frontend (simple HTTP server)
 echo "Starting frontend..."
@@ -0,0 +1,168 @@
+"""
+Insert throughput and id index size with random (UUID v4) versus time-ordered
+(UUID v7, ids.py) record ids.
+
+sqlite: saves synthetic batches through the offline SQLiteDatabase's own
+insert_calculation, in transactions of --batch rows, into a fresh copy of the
+bundled offline_backend/broiler_data.db per id kind (the shipped database is
+never modified). Reports the unique id index's size and page fill from dbstat.
+
+mongo: inserts the same batches into a scratch database on MONGO_URL (dropped
+afterwards) with the indexes from backend/indexes.py, and reports the id_1
+index size from collStats.
+
+Usage:
+    python primary_key_benchmark.py [--backend sqlite|mongo] [--rows 1000000] [--batch 10000] [--workdir DIR]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from calculation_row_benchmark import make_full_calculation
+from sqlite_pool_benchmark import OFFLINE_BACKEND
+
+MONGO_BACKEND = Path(__file__).parent / "backend"
+SQLITE_ID_INDEX = "sqlite_autoindex_broiler_calculations_1"
+LOOKUPS = 10000
+
+
+def id_kinds():
+    import ids
+    return {
+        "uuid4": lambda count: [str(uuid.uuid4()) for _ in range(count)],
+        "uuid7": ids.new_ids,
+    }
+
+
+def run_batches(rows, batch, new_ids, insert_batch):
+    """
+    Insert rows in batches, returning inserts per second overall and over the
+    batches reaching into the last tenth
+    """
+    total = tail = 0.0
+    tail_rows = 0
+    for start in range(0, rows, batch):
+        count = min(batch, rows - start)
+        calculations = [make_full_calculation(start + index) for index in range(count)]
+        for calculation, calculation_id in zip(calculations, new_ids(count)):
+            calculation["id"] = calculation_id
+        started = time.perf_counter()
+        insert_batch(calculations)
+        elapsed = time.perf_counter() - started
+        total += elapsed
+        if start + count > rows * 0.9:
+            tail += elapsed
+            tail_rows += count
+    return rows / total, tail_rows / tail
+
+
+def sqlite_benchmark(rows, batch, workdir):
+    sys.path.insert(0, str(OFFLINE_BACKEND))
+    workdir = tempfile.mkdtemp(prefix="primary_key_benchmark_", dir=workdir)
+    os.chdir(workdir)  # database.py opens broiler_data.db in the working directory on import
+    try:
+        shutil.copy(OFFLINE_BACKEND / "broiler_data.db", "broiler_data.db")
+        import database
+
+        results = {}
+        for kind, new_ids in id_kinds().items():
+            path = os.path.join(workdir, f"{kind}.db")
+            shutil.copy(OFFLINE_BACKEND / "broiler_data.db", path)
+            db = database.SQLiteDatabase(path)
+            insert = database.SQLiteDatabase.insert_calculation.__wrapped__
+
+            def insert_batch(calculations):
+                # The writer thread's transaction, run inline: one commit per batch
+                with db.get_connection() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    for calculation in calculations:
+                        insert(db, calculation)
+                    conn.commit()
+
+            rate, tail_rate = run_batches(rows, batch, new_ids, insert_batch)
+            with db.get_connection() as conn:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                pages, size, unused = conn.execute(
+                    "SELECT COUNT(*), SUM(pgsize), SUM(unused) FROM dbstat WHERE name = ?", (SQLITE_ID_INDEX,)
+                ).fetchone()
+                sample = [row[0] for row in conn.execute(
+                    "SELECT id FROM broiler_calculations ORDER BY random() LIMIT ?", (LOOKUPS,))]
+                started = time.perf_counter()
+                for calculation_id in sample:
+                    conn.execute("SELECT input_data FROM broiler_calculations WHERE id = ?", (calculation_id,)).fetchone()
+                lookup_us = (time.perf_counter() - started) / len(sample) * 1e6
+            db._write_executor.shutdown()
+            db._read_executor.shutdown()
+            db.close()
+            results[kind] = {
+                "inserts/s": rate,
+                "inserts/s, last 10%": tail_rate,
+                "id index MiB": size / 2**20,
+                "id index pages": pages,
+                "id index fill %": 100 * (1 - unused / size),
+                "database file MiB": os.path.getsize(path) / 2**20,
+                "lookup by id (us)": lookup_us,
+            }
+        database.db.close()
+        return results
+    finally:
+        os.chdir(Path(__file__).parent)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def mongo_benchmark(rows, batch):
+    from pymongo import MongoClient
+    sys.path.insert(0, str(MONGO_BACKEND))
+    import indexes
+
+    client = MongoClient(os.environ["MONGO_URL"])
+    results = {}
+    try:
+        for kind, new_ids in id_kinds().items():
+            name = f"primary_key_benchmark_{kind}_{random.randrange(1 << 32):08x}"
+            db = client[name]
+            try:
+                for keys, options in indexes.REQUIRED_INDEXES["broiler_calculations"]:
+                    db.broiler_calculations.create_index(keys, **options)
+
+                def insert_batch(calculations):
+                    db.broiler_calculations.insert_many(calculations, ordered=False)
+
+                rate, tail_rate = run_batches(rows, batch, new_ids, insert_batch)
+                stats = db.command("collStats", "broiler_calculations")
+                results[kind] = {
+                    "inserts/s": rate,
+                    "inserts/s, last 10%": tail_rate,
+                    "id index MiB": stats["indexSizes"]["id_1"] / 2**20,
+                    "all indexes MiB": stats["totalIndexSize"] / 2**20,
+                }
+            finally:
+                client.drop_database(name)
+    finally:
+        client.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=("sqlite", "mongo"), default="sqlite")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--workdir", help="directory for the scratch databases (default: system temp)")
+    args = parser.parse_args()
+
+    if args.backend == "sqlite":
+        results = sqlite_benchmark(args.rows, args.batch, args.workdir)
+    else:
+        results = mongo_benchmark(args.rows, args.batch)
+
+    print(f"{args.rows} batches inserted into {args.backend}, {args.batch} per transaction")
+    print(f"{'':24} {'uuid4':>12} {'uuid7':>12}")
+    for name in results["uuid4"]:
+        print(f"{name:24} {results['uuid4'][name]:12.1f} {results['uuid7'][name]:12.1f}")
@@ -0,0 +1,158 @@
+"""
+Tail latency of concurrent /api/calculations reads on the offline server while
+batches are being written.
+
+Runs the offline FastAPI app in-process against a copy of the bundled
+broiler_data.db. Each round fires simultaneous GET /api/calculations requests
+while a writer keeps saving batches through the database layer. It compares
+the executor-backed database (reads on the read pool, writes on the writer
+thread) with every sqlite3 call running inline on the event loop, which is
+how the database behaved before. "loop stall" is the worst delay seen by a
+1 ms ticker task, i.e. how long the event loop was unable to serve anyone.
+
+The benefit grows with disk latency (fsync on commit, cold page cache), so run
+it with --workdir on the disk the offline app really uses.
+
+Usage:
+    python sqlite_concurrency_benchmark.py [--readers 50] [--rounds 20] [--workdir DIR]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import Executor, Future
+from pathlib import Path
+
+from sqlite_pool_benchmark import OFFLINE_BACKEND, make_calculation
+
+
+class InlineExecutor(Executor):
+    """Runs submitted work immediately on the calling thread (the event loop)
+
+    Given a database, it also commits each piece of work, as the database's
+    writer would.
+    """
+
+    def __init__(self, db=None):
+        self.db = db
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            result = fn(*args, **kwargs)
+            if self.db is not None:
+                with self.db.get_connection() as conn:
+                    conn.commit()
+            future.set_result(result)
+        except BaseException as exc:
+            if self.db is not None:
+                with self.db.get_connection() as conn:
+                    conn.rollback()
+            future.set_exception(exc)
+        return future
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def scenario(client, db, readers, rounds, first_index):
+    stop = asyncio.Event()
+    writes = 0
+
+    async def writer():
+        nonlocal writes
+        while not stop.is_set():
+            await db.insert_calculation(make_calculation(first_index + writes))
+            writes += 1
+            await asyncio.sleep(0)
+
+    async def read():
+        start = time.perf_counter()
+        response = await client.get("/api/calculations")
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    async def ticker():
+        worst = 0.0
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst = max(worst, time.perf_counter() - start - 0.001)
+        return worst
+
+    writer_task = asyncio.create_task(writer())
+    ticker_task = asyncio.create_task(ticker())
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        latencies += await asyncio.gather(*(read() for _ in range(readers)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await writer_task
+    loop_stall = await ticker_task
+
+    latencies.sort()
+    return {
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'max': latencies[-1] * 1000,
+        'loop_stall': loop_stall * 1000,
+        'reads_per_s': len(latencies) / elapsed,
+        'writes_per_s': writes / elapsed,
+    }, writes
+
+
+async def run(readers, rounds, rows, workdir=None):
+    import httpx
+
+    sys.path.insert(0, str(OFFLINE_BACKEND))
+    workdir = tempfile.mkdtemp(prefix="sqlite_concurrency_benchmark_", dir=workdir)
+    os.chdir(workdir)  # database.py and the exports directory are relative to the working directory
+    try:
+        shutil.copy(OFFLINE_BACKEND / "broiler_data.db", "broiler_data.db")
+        from server import app
+        from database import db
+
+        for index in range(rows):
+            await db.insert_calculation(make_calculation(index))
+        next_index = rows
+
+        executors = (db._read_executor, db._write_executor)
+        modes = [
+            ('inline on event loop', (InlineExecutor(), InlineExecutor(db))),
+            ('read pool + writer thread', executors),
+        ]
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            print(f"{readers} simultaneous GET /api/calculations x {rounds} rounds during continuous writes "
+                  f"({rows} seeded rows, latency in ms)")
+            print(f"{'mode':28} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'loop stall':>11} "
+                  f"{'reads/s':>9} {'writes/s':>9}")
+            for name, (read_executor, write_executor) in modes:
+                db._read_executor, db._write_executor = read_executor, write_executor
+                result, writes = await scenario(client, db, readers, rounds, next_index)
+                next_index += writes
+                print(f"{name:28} {result['p50']:8.1f} {result['p95']:8.1f} {result['p99']:8.1f} "
+                      f"{result['max']:8.1f} {result['loop_stall']:11.1f} "
+                      f"{result['reads_per_s']:9.0f} {result['writes_per_s']:9.0f}")
+        db._read_executor, db._write_executor = executors
+        db.close()
+    finally:
+        os.chdir(Path(__file__).parent)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readers", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--workdir", help="directory for the temporary database copy (default: system temp)")
+    args = parser.parse_args()
+    asyncio.run(run(args.readers, args.rounds, args.rows, args.workdir))
@@ -0,0 +1,112 @@
+"""
+Per-call latency of the offline SQLiteDatabase with and without connection reuse.
+
+Works on a copy of the bundled offline_backend/broiler_data.db seeded with
+synthetic batches, so the shipped database is never modified.
+
+Usage:
+    python sqlite_pool_benchmark.py [--rows 2000] [--calls 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+OFFLINE_BACKEND = Path(__file__).parent / "offline_backend"
+
+
+def make_calculation(index):
+    return {
+        'input_data': {
+            'batch_id': f'BENCH-{index:06d}',
+            'shed_number': f'S{index % 12}',
+            'handler_name': f'Handler {index % 8}',
+            'initial_chicks': 20000,
+            'entry_date': '2024-01-01T00:00:00',
+            'exit_date': '2024-02-12T00:00:00',
+        },
+        'feed_conversion_ratio': random.uniform(1.5, 2.0),
+        'mortality_rate_percent': random.uniform(2, 6),
+        'weighted_average_age': 42.0,
+        'daily_weight_gain': random.uniform(0.05, 0.07),
+        'total_cost': 80000.0,
+        'total_revenue': 1000.0,
+        'net_cost_per_kg': random.uniform(3, 4),
+        'total_weight_produced_kg': 45000.0,
+        'total_feed_consumed_kg': 80000.0,
+        'surviving_chicks': 19000,
+        'removed_chicks': 19000,
+        'missing_chicks': 0,
+        'viability': 95,
+        'average_weight_per_chick': 2.4,
+        'cost_breakdown': {'chick_cost': 10000.0},
+    }
+
+
+async def measure(db, name, operation, calls, reuse):
+    samples = []
+    for i in range(calls):
+        if not reuse:
+            # Drop the pooled connection so every call pays connect + schema parse,
+            # which is what each method did before the pool existed
+            db.close()
+        start = time.perf_counter()
+        await operation(i)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'name': name,
+        'median_us': statistics.median(samples) * 1e6,
+        'p95_us': samples[int(len(samples) * 0.95)] * 1e6,
+    }
+
+
+async def run(rows, calls):
+    sys.path.insert(0, str(OFFLINE_BACKEND))
+    workdir = tempfile.mkdtemp(prefix="sqlite_pool_benchmark_")
+    os.chdir(workdir)  # database.py opens broiler_data.db in the working directory on import
+    try:
+        shutil.copy(OFFLINE_BACKEND / "broiler_data.db", "broiler_data.db")
+        from database import db
+
+        for index in range(rows):
+            await db.insert_calculation(make_calculation(index))
+
+        async def insert_and_delete(i):
+            calculation = make_calculation(rows + i)
+            await db.insert_calculation(calculation)
+            await db.delete_calculation_by_id(calculation['id'])
+
+        operations = [
+            ('find_calculation_by_batch_id', lambda i: db.find_calculation_by_batch_id(f'BENCH-{i % rows:06d}')),
+            ('get_all_calculations(50)', lambda i: db.get_all_calculations()),
+            ('get_handler_performance_totals', lambda i: db.get_handler_performance_totals()),
+            ('insert + delete', insert_and_delete),
+        ]
+
+        print(f"{rows} rows, {calls} calls per operation (latency in microseconds)")
+        print(f"{'operation':34} {'per-call conn':>14} {'pooled':>10} {'speedup':>8}")
+        for name, operation in operations:
+            before = await measure(db, name, operation, calls, reuse=False)
+            after = await measure(db, name, operation, calls, reuse=True)
+            print(f"{name:34} {before['median_us']:14.1f} {after['median_us']:10.1f} "
+                  f"{before['median_us'] / after['median_us']:7.1f}x   "
+                  f"(p95 {before['p95_us']:.1f} -> {after['p95_us']:.1f})")
+        db.close()
+    finally:
+        os.chdir(Path(__file__).parent)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.calls))
@@ -0,0 +1,96 @@
+"""
+Write throughput of the offline SQLiteDatabase with 1, 10 and 50 concurrent writers.
+
+Each writer saves batches through insert_calculation one after another. Three
+setups are compared, each on a fresh copy of the bundled
+offline_backend/broiler_data.db (the shipped database is never modified):
+
+- legacy, commit per write: rollback journal with synchronous=FULL, one
+  transaction per write (how the database behaved before)
+- WAL, commit per write: the "normal" durability profile without group commit
+- WAL, group commit: the "normal" profile as the server runs it
+
+Commit cost is dominated by fsync, so run it with --workdir on the disk the
+offline app really uses.
+
+Usage:
+    python sqlite_write_benchmark.py [--writes 2000] [--writers 1 10 50] [--workdir DIR]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlite_pool_benchmark import OFFLINE_BACKEND, make_calculation
+
+SETUPS = (
+    ('legacy, commit per write', 'legacy', 1),
+    ('WAL, commit per write', 'normal', 1),
+    ('WAL, group commit', 'normal', None),
+)
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def scenario(db, writers, writes):
+    per_writer = writes // writers
+    latencies = []
+
+    async def writer(first_index):
+        for index in range(first_index, first_index + per_writer):
+            start = time.perf_counter()
+            await db.insert_calculation(make_calculation(index))
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(n * per_writer) for n in range(writers)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'writes_per_s': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def run(writes, writer_counts, workdir=None):
+    sys.path.insert(0, str(OFFLINE_BACKEND))
+    workdir = tempfile.mkdtemp(prefix="sqlite_write_benchmark_", dir=workdir)
+    os.chdir(workdir)  # database.py opens broiler_data.db in the working directory on import
+    try:
+        shutil.copy(OFFLINE_BACKEND / "broiler_data.db", "broiler_data.db")
+        import database
+
+        print(f"{writes} insert_calculation calls split across concurrent writers (latency in ms)")
+        print(f"{'setup':26} {'writers':>8} {'writes/s':>10} {'p50':>8} {'p99':>8}")
+        for name, durability, group_size in SETUPS:
+            for writers in writer_counts:
+                path = os.path.join(workdir, f"{durability}-{group_size}-{writers}.db")
+                shutil.copy(OFFLINE_BACKEND / "broiler_data.db", path)
+                db = database.SQLiteDatabase(path, durability=durability,
+                                             max_group_commit=group_size or database.MAX_GROUP_COMMIT)
+                result = await scenario(db, writers, writes)
+                db._write_executor.shutdown()
+                db._read_executor.shutdown()
+                db.close()
+                print(f"{name:26} {writers:8} {result['writes_per_s']:10.0f} "
+                      f"{result['p50']:8.2f} {result['p99']:8.2f}")
+        database.db.close()
+    finally:
+        os.chdir(Path(__file__).parent)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--workdir", help="directory for the scratch databases (default: system temp)")
+    args = parser.parse_args()
+    asyncio.run(run(args.writes, args.writers, args.workdir))
@@ -0,0 +1,85 @@
+"""
+Time from launching the offline (or portable) server to its first 200 on GET /api/.
+
+Starts the server the way the Electron shell does (python -m uvicorn server:app)
+in a scratch directory holding a copy of the bundled broiler_data.db, so the
+shipped database is never modified. The first start migrates the copy; the
+following starts find its schema current, which is what every launch after the
+first looks like on a user's machine.
+
+Usage:
+    python startup_benchmark.py [--backend offline|portable] [--runs 5]
+"""
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKENDS = {
+    "offline": Path(__file__).parent / "offline_backend",
+    "portable": Path(__file__).parent / "portable_broiler_app" / "backend",
+}
+POLL_INTERVAL = 0.005
+TIMEOUT = 60
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_200(backend, workdir):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--app-dir", str(backend),
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - start < TIMEOUT:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}:\n{process.stderr.read().decode()}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(POLL_INTERVAL)
+        raise RuntimeError(f"No 200 from {url} within {TIMEOUT} seconds")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run(backend_name, runs):
+    backend = BACKENDS[backend_name]
+    workdir = tempfile.mkdtemp(prefix="startup_benchmark_")
+    try:
+        shutil.copy(backend / "broiler_data.db", os.path.join(workdir, "broiler_data.db"))
+        first = time_to_first_200(backend, workdir)
+        later = [time_to_first_200(backend, workdir) for _ in range(runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{backend_name} server, time to first 200 on GET /api/ (ms)")
+    print(f"{'first start (migrates the database)':40} {first * 1000:8.0f}")
+    print(f"{f'later starts, median of {runs}':40} {statistics.median(later) * 1000:8.0f}")
+    print(f"{'later starts, fastest':40} {min(later) * 1000:8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="offline")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run(args.backend, args.runs)
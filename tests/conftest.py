@@ -0,0 +1,91 @@
+"""
+Fixtures loading the backends in-process.
+
+backend/ and offline_backend/ import their sibling modules by the same bare
+names (server, database, metrics, ...), so each fixture drops the other
+backend's modules from sys.modules and puts its own directory first on
+sys.path before importing.
+"""
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+MONGO_BACKEND = ROOT / "backend"
+OFFLINE_BACKEND = ROOT / "offline_backend"
+BACKEND_MODULES = {path.stem for directory in (MONGO_BACKEND, OFFLINE_BACKEND) for path in directory.glob("*.py")}
+
+
+def load_backend(directory, *names):
+    """
+    Import the named modules of one backend directory, fresh
+    """
+    for name in BACKEND_MODULES:
+        sys.modules.pop(name, None)
+    for other in (MONGO_BACKEND, OFFLINE_BACKEND):
+        while str(other) in sys.path:
+            sys.path.remove(str(other))
+    sys.path.insert(0, str(directory))
+    return [importlib.import_module(name) for name in names]
+
+
+def close_database(db):
+    """
+    Stop an offline SQLiteDatabase's threads and close its connections
+    """
+    db._write_executor.shutdown()
+    db._read_executor.shutdown()
+    db.close()
+
+
+@pytest.fixture
+def offline_database(tmp_path, monkeypatch):
+    """
+    offline_backend's database module; its global db is a new database in tmp_path
+    """
+    # database.py opens broiler_data.db in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    database, = load_backend(OFFLINE_BACKEND, "database")
+    yield database
+    close_database(database.db)
+
+
+@pytest.fixture
+def offline_server(tmp_path, monkeypatch):
+    """
+    offline_backend's server module, on a new database in tmp_path
+    """
+    monkeypatch.chdir(tmp_path)
+    server, database = load_backend(OFFLINE_BACKEND, "server", "database")
+    yield server
+    close_database(database.db)
+
+
+@pytest.fixture
+def mongo_server(monkeypatch):
+    """
+    backend's server module on an in-memory mongomock database
+    """
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    monkeypatch.setenv("MONGO_URL", os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    monkeypatch.setenv("DB_NAME", "broiler_test")
+    # mongomock_motor returns every document whatever the length; cap it as Motor does
+    async def to_list(cursor, length=None):
+        documents = []
+        async for document in cursor:
+            if length is not None and len(documents) >= length:
+                break
+            documents.append(document)
+        return documents
+    monkeypatch.setattr(mongomock_motor.AsyncCursor, "to_list", to_list)
+    server, handler_stats, report_jobs = load_backend(MONGO_BACKEND, "server", "handler_stats", "report_jobs")
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(server, "client", client)
+    monkeypatch.setattr(server, "db", client["broiler_test"])
+    # mongomock has no multi-document transactions
+    monkeypatch.setattr(handler_stats, "_transactions_supported", False)
+    server.report_queue.store = report_jobs.MongoReportJobStore(server.db)
+    yield server
@@ -0,0 +1,86 @@
+"""
+The vectorized bulk calculation must give exactly what the scalar
+calculate_enhanced_broiler_metrics gives, field by field, in both backends.
+"""
+import random
+
+import pytest
+
+SEED = 20240101
+INPUTS = 500
+# Differ between two runs of the same input
+UNCOMPARED_FIELDS = {"id", "created_at", "updated_at"}
+
+
+def random_feed(rng):
+    return {
+        "consumption_kg": rng.choice([round(rng.uniform(0, 30000), rng.choice([0, 1, 2, 3])), 0.0, 1234.5]),
+        "cost_per_kg": round(rng.uniform(0, 3), rng.choice([1, 2, 3])),
+    }
+
+
+def random_input(rng, index):
+    """
+    A valid calculation input with awkward floats, empty feed phases and
+    zero-cost components mixed in
+    """
+    initial_chicks = rng.randint(1, 20000)
+    chicks_died = rng.randint(0, initial_chicks - 1)
+    surviving = initial_chicks - chicks_died
+    removal_batches = []
+    for _ in range(rng.randint(1, 15)):
+        remaining = surviving - sum(batch["quantity"] for batch in removal_batches)
+        if remaining <= 0:
+            break
+        removal_batches.append({
+            "quantity": rng.randint(1, min(remaining, 5000)),
+            "total_weight_kg": round(rng.uniform(1, 9000), rng.choice([0, 1, 2, 3])),
+            "age_days": rng.randint(30, 55),
+        })
+    return {
+        "batch_id": f"B{index}", "shed_number": str(rng.randint(1, 9)), "handler_name": rng.choice(["Ana", "Bruno"]),
+        "entry_date": "2024-01-01T00:00:00", "exit_date": "2024-02-15T00:00:00",
+        "initial_chicks": initial_chicks,
+        "chick_cost_per_unit": round(rng.uniform(0, 2), rng.choice([2, 3])),
+        "pre_starter_feed": random_feed(rng), "starter_feed": random_feed(rng),
+        "growth_feed": random_feed(rng), "final_feed": random_feed(rng),
+        "medicine_costs": rng.choice([0.0, round(rng.uniform(0, 900), 2)]),
+        "miscellaneous_costs": round(rng.uniform(0, 900), 1),
+        "cost_variations": rng.choice([0.0, -12.5, 100.005]),
+        "sawdust_bedding_cost": round(rng.uniform(0, 500), 2),
+        "chicken_bedding_sale_revenue": round(rng.uniform(0, 700), 2),
+        "chicks_died": chicks_died,
+        "removal_batches": removal_batches,
+    }
+
+
+@pytest.fixture(params=["mongo_server", "offline_server"])
+def server(request):
+    return request.getfixturevalue(request.param)
+
+
+def test_bulk_matches_scalar(server):
+    rng = random.Random(SEED)
+    inputs = [server.BroilerCalculationInput(**random_input(rng, index)) for index in range(INPUTS)]
+    assert all(server._input_validation_error(input_data) is None for input_data in inputs)
+
+    # The scalar path may normalize its input in place; give it copies
+    scalar = [
+        server.calculate_enhanced_broiler_metrics(input_data.model_copy(deep=True)).model_dump(warnings=False)
+        for input_data in inputs
+    ]
+    bulk = server.calculate_enhanced_broiler_metrics_bulk(inputs)
+
+    assert len(bulk) == len(scalar)
+    for index, (expected, actual) in enumerate(zip(scalar, bulk)):
+        assert set(actual) == set(expected), f"input {index}"
+        for field in set(expected) - UNCOMPARED_FIELDS:
+            if field == "cost_breakdown":
+                for cost, value in expected[field].items():
+                    assert actual[field][cost] == value, f"input {index}: cost_breakdown.{cost}"
+            else:
+                assert actual[field] == expected[field], f"input {index}: {field}"
+
+
+def test_bulk_of_nothing(server):
+    assert server.calculate_enhanced_broiler_metrics_bulk([]) == []
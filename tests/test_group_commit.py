@@ -0,0 +1,156 @@
+"""
+GroupCommitExecutor: writes queued together share one transaction, and a write
+that fails is rolled back alone.
+"""
+import asyncio
+import threading
+
+import pytest
+
+TIMEOUT = 5
+
+
+def calculation(batch_id, handler_name="Ana"):
+    """
+    A minimal calculation document, as insert_calculation receives it
+    """
+    return {
+        "input_data": {
+            "batch_id": batch_id, "shed_number": "1", "handler_name": handler_name,
+            "entry_date": "2024-01-01T00:00:00", "exit_date": "2024-02-10T00:00:00",
+            "initial_chicks": 1000, "chicks_died": 20,
+            "removal_batches": [{"quantity": 950, "total_weight_kg": 2000.0, "age_days": 41}],
+        },
+        "feed_conversion_ratio": 1.6, "mortality_rate_percent": 2.0, "weighted_average_age": 41.0,
+        "daily_weight_gain": 0.05, "total_cost": 50000.0, "total_revenue": 0.0, "net_cost_per_kg": 25.0,
+        "total_weight_produced_kg": 2000.0, "total_feed_consumed_kg": 3200.0, "surviving_chicks": 980,
+        "removed_chicks": 950, "missing_chicks": 30, "viability": 95, "average_weight_per_chick": 2.1,
+        "cost_breakdown": {"chick_cost": 10000.0, "chick_cost_percent": 20.0, "total_cost": 50000.0},
+    }
+
+
+@pytest.fixture
+def block_writer(offline_database):
+    """
+    block_writer() holds the writer thread inside a transaction until the
+    release() it returns is called, so every write queued meanwhile is
+    committed together in the next group
+    """
+    executor = offline_database.db._write_executor
+    released = threading.Event()
+
+    def block_writer():
+        started = threading.Event()
+
+        def block():
+            started.set()
+            released.wait(TIMEOUT)
+
+        blocker = executor.submit(block)
+        assert started.wait(TIMEOUT)
+
+        def release():
+            released.set()
+            blocker.result(TIMEOUT)
+        return release
+
+    yield block_writer
+    released.set()
+
+
+def saved(db):
+    with db.get_connection() as conn:
+        batches = {row[0] for row in conn.execute("SELECT batch_id FROM broiler_calculations")}
+        handlers = {row[0] for row in conn.execute("SELECT name FROM handlers")}
+        stats = dict(conn.execute("SELECT handler_name, total_batches FROM handler_stats"))
+    return batches, handlers, stats
+
+
+def test_failed_write_rolls_back_only_its_savepoint(offline_database, block_writer):
+    db = offline_database.db
+    executor = db._write_executor
+    insert = offline_database.SQLiteDatabase.insert_calculation.__wrapped__
+    executor.submit(insert, db, calculation("B0")).result(TIMEOUT)
+
+    def insert_then_fail():
+        insert(db, calculation("G3", handler_name="Carla"))
+        raise RuntimeError("failed after inserting")
+
+    release = block_writer()
+    first = executor.submit(insert, db, calculation("G1"))
+    duplicate = executor.submit(insert, db, calculation("B0", handler_name="Bruno"))
+    failed = executor.submit(insert_then_fail)
+    last = executor.submit(insert, db, calculation("G2"))
+    release()
+
+    assert isinstance(first.result(TIMEOUT), str)
+    assert isinstance(last.result(TIMEOUT), str)
+    error = duplicate.exception(TIMEOUT)
+    assert isinstance(error, offline_database.DuplicateBatchError)
+    assert error.batch_id == "B0"
+    assert str(failed.exception(TIMEOUT)) == "failed after inserting"
+
+    batches, handlers, stats = saved(db)
+    assert batches == {"B0", "G1", "G2"}
+    # G3, its handler and its rollup went with its savepoint
+    assert handlers == {"Ana"}
+    assert stats == {"Ana": 3}
+    assert db.verify_handler_stats() == []
+
+
+def test_error_reaches_its_own_caller(offline_database, block_writer):
+    db = offline_database.db
+
+    async def run():
+        release = block_writer()
+        tasks = [
+            asyncio.ensure_future(db.insert_calculation(calculation(batch_id)))
+            for batch_id in ("A1", "A2", "A1", "A3")
+        ]
+        # Let every task hand its write to the blocked writer, then release it
+        await asyncio.sleep(0)
+        release()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert isinstance(results[2], offline_database.DuplicateBatchError)
+    assert results[2].batch_id == "A1"
+    assert all(isinstance(result, str) for index, result in enumerate(results) if index != 2)
+    batches, _, stats = saved(db)
+    assert batches == {"A1", "A2", "A3"}
+    assert stats == {"Ana": 3}
+
+
+@pytest.mark.parametrize("raises", [False, True])
+def test_broken_transaction_fails_its_group_and_writer_carries_on(offline_database, block_writer, raises):
+    db = offline_database.db
+    executor = db._write_executor
+    insert = offline_database.SQLiteDatabase.insert_calculation.__wrapped__
+
+    def end_transaction():
+        # Leaves no savepoint to release or roll back to
+        with db.get_connection() as conn:
+            conn.rollback()
+        if raises:
+            raise RuntimeError("failed after ending the transaction")
+
+    release = block_writer()
+    first = executor.submit(insert, db, calculation("G1"))
+    broken = executor.submit(end_transaction)
+    queued = executor.submit(insert, db, calculation("G2"))
+    release()
+
+    error = broken.exception(TIMEOUT)
+    if raises:
+        assert str(error) == "failed after ending the transaction"
+    else:
+        assert isinstance(error, offline_database.sqlite3.OperationalError)
+    # The rest of the group was rolled back with it
+    assert isinstance(first.exception(TIMEOUT), offline_database.sqlite3.OperationalError)
+    assert isinstance(queued.exception(TIMEOUT), offline_database.sqlite3.OperationalError)
+
+    assert isinstance(executor.submit(insert, db, calculation("G3")).result(TIMEOUT), str)
+    batches, _, stats = saved(db)
+    assert batches == {"G3"}
+    assert stats == {"Ana": 1}
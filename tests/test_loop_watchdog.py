@@ -0,0 +1,21 @@
+"""
+The event loop watchdog's opt-in threshold setting.
+"""
+import pytest
+
+from tests.conftest import OFFLINE_BACKEND, load_backend
+
+
+@pytest.mark.parametrize("setting, threshold", [
+    (None, 0), ("", 0), ("0", 0), ("-5", 0),
+    ("250", 0.25), ("0.5", 0.0005),
+    # Not milliseconds: logged, watchdog off
+    ("250ms", 0), ("inf", 0), ("nan", 0),
+])
+def test_threshold_from_environment(monkeypatch, setting, threshold):
+    loop_watchdog, = load_backend(OFFLINE_BACKEND, "loop_watchdog")
+    if setting is None:
+        monkeypatch.delenv(loop_watchdog.THRESHOLD_SETTING, raising=False)
+    else:
+        monkeypatch.setenv(loop_watchdog.THRESHOLD_SETTING, setting)
+    assert loop_watchdog.threshold_from_environment() == threshold
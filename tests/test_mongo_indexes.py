@@ -0,0 +1,38 @@
+"""
+Startup index creation in the Mongo backend.
+"""
+import asyncio
+
+import pytest
+
+from tests.conftest import MONGO_BACKEND, load_backend
+
+
+def test_unique_index_failure_is_fatal():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    indexes, = load_backend(MONGO_BACKEND, "indexes")
+    db = mongomock_motor.AsyncMongoMockClient()["broiler_test"]
+
+    async def run():
+        await db.broiler_calculations.insert_many([
+            {"id": "1", "input_data": {"batch_id": "B1"}},
+            {"id": "2", "input_data": {"batch_id": "B1"}},
+        ])
+        await indexes.ensure_indexes(db)
+
+    with pytest.raises(RuntimeError, match="input_data.batch_id"):
+        asyncio.run(run())
+
+
+def test_creates_required_indexes():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    indexes, = load_backend(MONGO_BACKEND, "indexes")
+    db = mongomock_motor.AsyncMongoMockClient()["broiler_test"]
+
+    async def run():
+        await indexes.ensure_indexes(db)
+        return await db.broiler_calculations.index_information()
+
+    created = [info["key"] for info in asyncio.run(run()).values()]
+    for keys, _ in indexes.REQUIRED_INDEXES["broiler_calculations"]:
+        assert keys in created
@@ -0,0 +1,36 @@
+"""
+Handler and shed listings in the Mongo backend return every document.
+"""
+import asyncio
+from datetime import datetime
+
+import httpx
+
+COUNT = 150
+
+
+def test_listings_are_not_truncated(mongo_server):
+    server = mongo_server
+    now = datetime.utcnow()
+
+    async def run():
+        await server.db.handlers.insert_many(
+            [{"id": f"h{index}", "name": f"Handler {index:03}", "created_at": now} for index in range(COUNT)])
+        await server.db.sheds.insert_many(
+            [{"id": f"s{index}", "number": f"{index:03}", "created_at": now} for index in range(COUNT)])
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                (await client.get(path)).json()
+                for path in ("/api/dashboard", "/api/handlers", "/api/handlers/names", "/api/admin/sheds")
+            ]
+
+    dashboard, handlers, names, sheds = asyncio.run(run())
+
+    expected_names = [f"Handler {index:03}" for index in range(COUNT)]
+    assert dashboard["handler_names"] == expected_names
+    assert [handler["name"] for handler in dashboard["handlers"]] == expected_names
+    assert len(dashboard["sheds"]) == COUNT
+    assert [handler["name"] for handler in handlers] == expected_names
+    assert names == expected_names
+    assert [shed["number"] for shed in sheds] == [f"{index:03}" for index in range(COUNT)]
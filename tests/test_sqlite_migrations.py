@@ -0,0 +1,143 @@
+"""
+Upgrading an offline database created before the schema was versioned.
+"""
+import calendar
+import json
+import sqlite3
+from datetime import datetime
+
+from tests.conftest import close_database
+
+# The schema every offline database had at user_version 0
+BASELINE_SCHEMA = '''
+    CREATE TABLE broiler_calculations (
+        id TEXT PRIMARY KEY,
+        batch_id TEXT UNIQUE NOT NULL,
+        input_data TEXT NOT NULL,
+        feed_conversion_ratio REAL,
+        mortality_rate_percent REAL,
+        weighted_average_age REAL,
+        daily_weight_gain REAL,
+        total_cost REAL,
+        total_revenue REAL,
+        net_cost_per_kg REAL,
+        total_weight_produced_kg REAL,
+        total_feed_consumed_kg REAL,
+        surviving_chicks INTEGER,
+        removed_chicks INTEGER,
+        missing_chicks INTEGER,
+        viability INTEGER,
+        average_weight_per_chick REAL,
+        cost_breakdown TEXT,
+        created_at TEXT,
+        updated_at TEXT
+    );
+    CREATE TABLE handlers (
+        id TEXT PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL,
+        email TEXT,
+        phone TEXT,
+        notes TEXT,
+        created_at TEXT,
+        updated_at TEXT
+    );
+    CREATE TABLE sheds (
+        id TEXT PRIMARY KEY,
+        number TEXT UNIQUE NOT NULL,
+        capacity INTEGER,
+        location TEXT,
+        status TEXT DEFAULT 'active',
+        notes TEXT,
+        created_at TEXT,
+        updated_at TEXT
+    );
+    CREATE INDEX idx_batch_id ON broiler_calculations(batch_id);
+    CREATE INDEX idx_handler_name ON handlers(name);
+    CREATE INDEX idx_shed_number ON sheds(number);
+    CREATE INDEX idx_created_at ON broiler_calculations(created_at);
+'''
+
+
+def epoch(text):
+    return calendar.timegm(datetime.fromisoformat(text).timetuple())
+
+
+def baseline_row(calculation_id, batch_id, handler_name, entry_date, removal_batches, chick_cost):
+    """
+    A broiler_calculations row as the baseline insert_calculation wrote it:
+    datetimes went through json.dumps(default=str), hence '2024-01-01 00:00:00+00:00'
+    """
+    input_data = {
+        "batch_id": batch_id, "shed_number": "1", "handler_name": handler_name,
+        "entry_date": entry_date, "exit_date": "2024-02-10 00:00:00+00:00",
+        "initial_chicks": 1000, "chicks_died": 20, "removal_batches": removal_batches,
+    }
+    cost_breakdown = {
+        "chick_cost": chick_cost, "chick_cost_percent": 20.0,
+        "starter_cost": 4400.0, "starter_cost_percent": 8.8,
+        "total_cost": 50000.0,
+    }
+    return (
+        calculation_id, batch_id, json.dumps(input_data),
+        1.6, 2.0, 40.5, 0.06, 50000.0, 0.0, 25.0, 2000.0, 3200.0,
+        980, 950, 30, 95, 2.1, json.dumps(cost_breakdown),
+        "2024-03-01T12:30:00.123456", "2024-03-02T08:00:00.654321",
+    )
+
+
+def test_migrates_baseline_database(offline_database, tmp_path):
+    path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany(
+        f"INSERT INTO broiler_calculations VALUES ({', '.join('?' * 20)})",
+        [
+            baseline_row("c1", "B1", "Ana", None, [
+                {"quantity": 500, "total_weight_kg": 1000.0, "age_days": 40},
+                {"quantity": 450, "total_weight_kg": 1000.0, "age_days": 42},
+            ], 10000.0),
+            baseline_row("c2", "B2", "Ana", "2024-01-01 00:00:00+00:00", [
+                {"quantity": 950, "total_weight_kg": 2000.0, "age_days": 41},
+            ], 12000.0),
+            baseline_row("c3", "B3", "Bruno", "2024-01-05 00:00:00+02:00", [
+                {"quantity": 950, "total_weight_kg": 2000.0, "age_days": 41},
+            ], 9000.0),
+        ],
+    )
+    conn.commit()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+
+    db = offline_database.SQLiteDatabase(path)
+    try:
+        with db.get_connection() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == offline_database.SCHEMA_VERSION
+            rows = {row["batch_id"]: row for row in conn.execute("SELECT * FROM broiler_calculations")}
+            removal_counts = dict(conn.execute(
+                "SELECT calculation_id, COUNT(*) FROM removal_batches GROUP BY calculation_id"))
+
+        assert rows["B1"]["chick_cost"] == 10000.0
+        assert rows["B2"]["chick_cost"] == 12000.0
+        assert rows["B2"]["chick_cost_percent"] == 20.0
+        assert rows["B2"]["starter_cost"] == 4400.0
+        assert rows["B2"]["growth_cost"] is None
+
+        # Naive wall-clock seconds: the stored offset is dropped
+        assert rows["B1"]["entry_epoch"] is None
+        assert rows["B2"]["entry_epoch"] == epoch("2024-01-01T00:00:00")
+        assert rows["B3"]["entry_epoch"] == epoch("2024-01-05T00:00:00")
+        assert rows["B2"]["exit_epoch"] == epoch("2024-02-10T00:00:00")
+        assert rows["B2"]["created_epoch"] == epoch("2024-03-01T12:30:00")
+        assert rows["B2"]["updated_epoch"] == epoch("2024-03-02T08:00:00")
+        assert rows["B2"]["entry_epoch"] == offline_database._epoch_seconds("2024-01-01 00:00:00+00:00")
+
+        assert rows["B2"]["handler_name"] == "Ana"
+        assert rows["B2"]["initial_chicks"] == 1000
+        assert removal_counts == {"c1": 2, "c2": 1, "c3": 1}
+
+        assert db.verify_handler_stats() == []
+        with db.get_connection() as conn:
+            stats = {row["handler_name"]: row["total_batches"] for row in conn.execute("SELECT * FROM handler_stats")}
+        assert stats == {"Ana": 2, "Bruno": 1}
+    finally:
+        close_database(db)
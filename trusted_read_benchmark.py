@@ -0,0 +1,139 @@
+"""
+Cost of serving stored batches, handlers and sheds with and without the trusted
+read path (documents.py).
+
+Seeds a copy of the bundled offline_backend/broiler_data.db with 1,000 batches
+(plus handlers and sheds) saved through the offline server's own calculation
+code, then times each endpoint twice: with rows carrying the current
+schema_version (served as stored) and with the marker cleared, which makes
+every row go through full pydantic validation the way all reads did before.
+The "1,000 batches" rows serialize every stored batch in one go, the work a
+list of full calculations costs.
+
+Usage:
+    python trusted_read_benchmark.py [--batches 1000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlite_pool_benchmark import OFFLINE_BACKEND
+
+
+def make_input(index):
+    return {
+        'batch_id': f'TRUST-{index:06d}',
+        'shed_number': f'S{index % 40}',
+        'handler_name': f'Handler {index % 60}',
+        'entry_date': '2024-01-01T00:00:00',
+        'exit_date': '2024-02-12T00:00:00',
+        'initial_chicks': 20000,
+        'chick_cost_per_unit': 0.5,
+        'pre_starter_feed': {'consumption_kg': 1000, 'cost_per_kg': 1.2},
+        'starter_feed': {'consumption_kg': 4000, 'cost_per_kg': 1.1},
+        'growth_feed': {'consumption_kg': 20000, 'cost_per_kg': 1.0},
+        'final_feed': {'consumption_kg': 30000, 'cost_per_kg': 0.9},
+        'chicks_died': 400 + index % 200,
+        'removal_batches': [
+            {'quantity': 9000, 'total_weight_kg': 21000 + index % 500, 'age_days': 40},
+            {'quantity': 9500, 'total_weight_kg': 24000 + index % 700, 'age_days': 44},
+        ],
+    }
+
+
+def timed(operation, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+async def timed_async(operation, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await operation()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+async def run(batches, repeat):
+    import httpx
+    from fastapi.encoders import jsonable_encoder
+
+    sys.path.insert(0, str(OFFLINE_BACKEND))
+    workdir = tempfile.mkdtemp(prefix="trusted_read_benchmark_")
+    os.chdir(workdir)  # database.py and the exports directory are relative to the working directory
+    try:
+        shutil.copy(OFFLINE_BACKEND / "broiler_data.db", "broiler_data.db")
+        import documents
+        import server
+        from database import db
+
+        for index in range(batches):
+            input_data = server.BroilerCalculationInput(**make_input(index))
+            await db.insert_calculation(server.calculate_enhanced_broiler_metrics(input_data).dict())
+        for index in range(40):
+            await db.insert_shed({'number': f'S{index}', 'capacity': 20000, 'location': f'Row {index // 10}'})
+        rows = await db.get_all_calculations(limit=batches)
+        batch_ids = [row['input_data']['batch_id'] for row in rows]
+
+        def validated(model, documents_):
+            # What the endpoints did before: a model per row, then FastAPI's encoder
+            return json.dumps(jsonable_encoder([model(**document) for document in documents_])).encode()
+
+        def set_markers(value):
+            conn = db._connect()
+            for table in ('broiler_calculations', 'handlers', 'sheds'):
+                conn.execute(f'UPDATE {table} SET schema_version = ?', (value,))
+            conn.commit()
+            conn.close()
+
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            async def all_batch_details():
+                for batch_id in batch_ids:
+                    (await client.get(f"/api/batches/{batch_id}")).raise_for_status()
+
+            async def get(path):
+                (await client.get(path)).raise_for_status()
+
+            results = {}
+            for mode, marker in (('validated', None), ('trusted', documents.SCHEMA_VERSION)):
+                set_markers(marker)
+                rows = await db.get_all_calculations(limit=batches)
+                serialize = (lambda: validated(server.BroilerCalculation, rows)) if marker is None else \
+                    (lambda: documents.to_json_list_bytes(server.BroilerCalculation, rows))
+                results[mode] = {
+                    f'serialize {batches} batches': timed(serialize, repeat),
+                    f'GET /api/batches/{{id}} x {batches}': await timed_async(all_batch_details, 1),
+                    'GET /api/handlers': await timed_async(lambda: get("/api/handlers"), repeat * 20),
+                    'GET /api/admin/sheds': await timed_async(lambda: get("/api/admin/sheds"), repeat * 20),
+                }
+
+        print(f"{batches} stored batches, 60 handlers, 40 sheds (median ms)")
+        print(f"{'operation':36} {'validated':>10} {'trusted':>10} {'speedup':>8}")
+        for name in results['validated']:
+            before, after = results['validated'][name], results['trusted'][name]
+            print(f"{name:36} {before:10.2f} {after:10.2f} {before / after:7.1f}x")
+        db.close()
+    finally:
+        os.chdir(Path(__file__).parent)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batches", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.batches, args.repeat))